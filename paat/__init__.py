@@ -21,13 +21,15 @@ import os
 import sys
 import platform
 
-from . import estimates, features, io, preprocessing, sleep, wear_time
+from . import estimates, features, inference, io, pipeline, preprocessing, quality, sleep, wear_time
 
 # Expose API functions
 from .estimates import calculate_pa_levels, create_activity_column
 from .features import calculate_actigraph_counts, calculate_vector_magnitude, calculate_brond_counts, calculate_enmo
-from .io import read_gt3x, read_metadata
+from .io import read_gt3x, read_gt3x_many, iter_gt3x, read_metadata, write_hdf5, read_hdf5, build_catalog, read_catalog, Recording, TimeIndex, fill_gaps
 from .calibration import calibrate
+from .pipeline import process_files, process_files_async
+from .quality import check_quality, check_quality_many
 from .sleep import detect_time_in_bed_weitz2024
 from .wear_time import detect_non_wear_time_naive, detect_non_wear_time_hees2011, detect_non_wear_time_syed2021
 
@@ -8,6 +8,8 @@ Sensor Calibration Module
 """
 import pandas as pd
 
+from .io import Recording, _acceleration_values
+
 
 def estimate_calibration_coefficents(acc):
     """
@@ -48,8 +50,8 @@ def calibrate(acc, scale, offset):
     
     Parameters
     ----------
-    acc : array_like
-        numpy array with acceleration data
+    acc : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     scale : array_like
         numpy array with the scale factors
     offset : array_like
@@ -62,8 +64,8 @@ def calibrate(acc, scale, offset):
 
     """
     columns = ["Y", "X", "Z"]
-    index = acc.index.copy()
-    acc = (scale * acc[columns].values) + offset
+    index = acc.time.to_pandas() if isinstance(acc, Recording) else acc.index.copy()
+    acc = (scale * _acceleration_values(acc, columns)) + offset
     
     acc = pd.DataFrame(acc.astype(float), 
                        columns=columns, 
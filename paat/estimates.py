@@ -10,6 +10,7 @@ import pandas as pd
 import numpy as np
 
 from . import features
+from .io import Recording, _acceleration_values
 
 
 def calculate_pa_levels(data, sample_freq, mvpa_cutpoint, sb_cutpoint, interval="1s"):
@@ -24,8 +25,9 @@ def calculate_pa_levels(data, sample_freq, mvpa_cutpoint, sb_cutpoint, interval=
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording. The ENMO is
+        added to the DataFrame as column EMNO.
     sample_freq : int
         the sampling frequency in which the data was recorded
     mvpa_cutpoint : float
@@ -45,9 +47,15 @@ def calculate_pa_levels(data, sample_freq, mvpa_cutpoint, sb_cutpoint, interval=
         behavior (second column)
 
     """
-    data.loc[:, "EMNO"] = features.calculate_vector_magnitude(data[["Y", "X", "Z"]].values,
-                                                              minus_one=True,
-                                                              round_negative_to_zero=True)
+    enmo = features.calculate_vector_magnitude(_acceleration_values(data, ("Y", "X", "Z")),
+                                               minus_one=True,
+                                               round_negative_to_zero=True)
+
+    if isinstance(data, Recording):
+        # only the ENMO is needed further on, so the recording is not converted to a DataFrame
+        data = pd.DataFrame({"EMNO": enmo[:, 0]}, index=data.time.to_pandas())
+    else:
+        data.loc[:, "EMNO"] = enmo
 
     if interval:
         tmp = data.resample(interval).mean()
@@ -14,6 +14,8 @@ from scipy import signal
 import resampy
 from agcounts.extract import get_counts
 
+from .io import Recording, _acceleration_values
+
 
 BROND_COEFF_A = np.array([1, -4.1637, 7.5712, -7.9805, 5.385, -2.4636, 0.89238, 0.06361,
                           -1.3481, 2.4734, -2.9257, 2.9298, -2.7816, 2.4777, -1.6847,
@@ -96,8 +98,8 @@ def calculate_enmo(data, dtype=np.float32):
        numpy array with the Eucledian Norm Minus One (ENMO) of the acceleration
 
     """
-    if isinstance(data, pd.DataFrame):
-        data = data[["Y", "X", "Z"]].values
+    if isinstance(data, (pd.DataFrame, Recording)):
+        data = _acceleration_values(data, ("Y", "X", "Z"))
 
     return calculate_vector_magnitude(data, minus_one=True, round_negative_to_zero=True)
 
@@ -108,8 +110,8 @@ def calculate_frequency_features(data, win_len=60, win_step=60, sample_rate=100,
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     win_len : int (optional)
         an int indicating the window length in seconds
     win_step : int (optional)
@@ -130,7 +132,7 @@ def calculate_frequency_features(data, win_len=60, win_step=60, sample_rate=100,
 
     """
 
-    acceleration = data[["Y", "X", "Z"]].values
+    acceleration = _acceleration_values(data, ("Y", "X", "Z"))
 
     # Calculate Euclidian Norm Minus One for the three axis
     emno = calculate_vector_magnitude(acceleration, minus_one=True).squeeze()
@@ -268,8 +270,8 @@ def calculate_brond_counts(data, sample_freq, epoch_length):
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     sample_freq : int
         an int indicating at which sampling frequency the data was recorded
     epoch_length: int
@@ -281,6 +283,9 @@ def calculate_brond_counts(data, sample_freq, epoch_length):
         a DataFrame containg the Brønd counts
     """
 
+    if isinstance(data, Recording):
+        data = data.to_pandas(dtype=np.float32)
+
     timestamps = data.resample(epoch_length).mean().index
 
     if isinstance(epoch_length, str):
@@ -361,8 +366,8 @@ def calculate_mad(data, freq="6s"):
 
     Parameters
     ----------
-    data : array_like
-        numpy array with acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     freq : str
         the sampling frequency on which the MAD values should be calculated
     
@@ -372,5 +377,8 @@ def calculate_mad(data, freq="6s"):
        numpy array with the Mean Amplitude Deviation (MAD) of the acceleration
        
     """
+    if isinstance(data, Recording):
+        data = data.to_pandas(dtype=np.float32)
+
     mad = mad_data = data.resample(freq).apply(_mad)
     return mad
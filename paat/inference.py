@@ -0,0 +1,672 @@
+"""
+Inference Module
+----------------
+
+*paat.inference* loads the models bundled with paat once per process and keeps
+them in a cache, so that analysing many recordings does not load the models
+again for every recording.
+
+The models can be run with TensorFlow or with a forward pass in NumPy. The NumPy
+engine reads the weights of a model from a .npz file written by export_model,
+so worker processes using it do not need to import TensorFlow at all. The
+weights of the bundled models are shipped in this format next to the
+SavedModels.
+
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MODEL_DIRECTORY = os.path.join(os.path.dirname(__file__), 'models')
+
+# the bundled models, the CNN models of Syed et al. (2021) classify windows of 2 to 10
+# seconds at 100 Hz and the time in bed model of Weitz et al. (2025) classifies minutes
+MODELS = {f'cnn_v2_{seconds}': f'cnn_v2_{seconds}.pb' for seconds in range(2, 11)}
+MODELS['TIB_model'] = 'TIB_model.pb'
+
+ENGINES = ("tensorflow", "numpy")
+WEIGHT_DTYPES = ("float32", "float16", "int8")
+
+_models = OrderedDict()
+_lock = threading.Lock()
+_loading = {}
+_max_models = None
+
+
+def load_model(model, engine="tensorflow"):
+    """
+    Loads a model or returns it from the cache if it was loaded before in this process
+
+    The cache can be used from several threads at the same time. A model that is
+    requested by several threads while it is loaded is only loaded once.
+
+    Parameters
+    ----------
+    model : str
+        the name of a bundled model, e.g. cnn_v2_7 or TIB_model (see MODELS), or the
+        path of a SavedModel directory (tensorflow) or of an exported .npz file (numpy)
+    engine : str (optional)
+        'tensorflow' to load the SavedModel with keras, 'numpy' to load the exported
+        weights into a NumpyModel
+
+    Returns
+    -------
+    model : keras.layers.TFSMLayer or NumpyModel
+        the loaded model. Both are called with a batch of inputs and return a dict
+        with the predictions as 'output_0'.
+
+    """
+    path = _model_path(model, engine)
+
+    with _lock:
+        if path in _models:
+            _models.move_to_end(path)
+            return _models[path]
+        path_lock = _loading.setdefault(path, threading.Lock())
+
+    # only one thread loads a model, the others wait for it and take it from the cache
+    with path_lock:
+        with _lock:
+            if path in _models:
+                _models.move_to_end(path)
+                return _models[path]
+
+        logging.debug('Loading model %s', path)
+        if engine == "numpy":
+            layer = NumpyModel(path)
+        else:
+            # TensorFlow is only imported when it is needed
+            import keras
+            layer = keras.layers.TFSMLayer(path, call_endpoint='serving_default')
+
+        with _lock:
+            _models[path] = layer
+            _loading.pop(path, None)
+            _evict_models()
+
+    return layer
+
+
+def warm_up(models=None, engine="tensorflow"):
+    """
+    Loads models into the cache and runs them once on zeros
+
+    The first call of a model is much slower than the following ones, so this
+    function is meant for the initializer of worker processes, e.g.
+    ProcessPoolExecutor(initializer=paat.inference.warm_up), to keep the loading
+    out of the analysis of the first recording.
+
+    Parameters
+    ----------
+    models : str or iterable of str (optional)
+        the names of bundled models or paths of SavedModel directories or .npz files.
+        Defaults to all bundled models.
+    engine : str (optional)
+        the engine of the models, 'tensorflow' or 'numpy'
+
+    """
+    if models is None:
+        models = list(MODELS)
+    elif isinstance(models, str):
+        models = [models]
+
+    for model in models:
+        layer = load_model(model, engine=engine)
+        layer(np.zeros((1,) + _input_shape(layer), dtype=np.float32))
+
+
+def clear_models(models=None):
+    """
+    Removes models from the cache
+
+    Parameters
+    ----------
+    models : str or iterable of str (optional)
+        the names of bundled models or paths of SavedModel directories or .npz files
+        that are removed for both engines. Defaults to all models.
+
+    """
+    with _lock:
+        if models is None:
+            _models.clear()
+            return
+
+        for model in [models] if isinstance(models, str) else models:
+            for engine in ENGINES:
+                _models.pop(_model_path(model, engine), None)
+
+
+def set_max_models(max_models):
+    """
+    Limits the number of models in the cache
+
+    When a new model is loaded into a full cache, the least recently used model is
+    removed from it.
+
+    Parameters
+    ----------
+    max_models : int or None
+        the maximum number of cached models, None for no limit
+
+    """
+    global _max_models
+
+    if max_models is not None and max_models < 1:
+        raise ValueError(f"max_models has to be at least 1, got {max_models}")
+
+    with _lock:
+        _max_models = max_models
+        _evict_models()
+
+
+def cached_models():
+    """
+    Lists the models in the cache
+
+    Returns
+    -------
+    paths : list of str
+        the paths of the cached models from the least to the most recently used one
+
+    """
+    with _lock:
+        return list(_models)
+
+
+def export_model(model, file=None, dtype="float32"):
+    """
+    Exports the weights of a SavedModel to a .npz file that the NumPy engine can run
+
+    The configuration of the layers is read from the Keras metadata of the SavedModel.
+    Sequential models of Masking, Conv1D, Flatten, Dense and Bidirectional LSTM layers
+    are supported, which covers the bundled models. Exporting needs TensorFlow 2.16 or
+    2.17, running the exported model does not.
+
+    Parameters
+    ----------
+    model : str
+        the name of a bundled model or the path of a SavedModel directory
+    file : str (optional)
+        the location of the .npz file. Defaults to the location of the SavedModel with
+        the extension .npz, which is where load_model(engine='numpy') looks for it.
+    dtype : str (optional)
+        the data type the weights are stored in, 'float32', 'float16' or 'int8'. int8
+        weights are scaled for each output unit. The smaller types reduce the size of
+        the file at the cost of a less exact output, the computation is done in float32.
+
+    Returns
+    -------
+    file : str
+        the location of the .npz file
+
+    """
+    if dtype not in WEIGHT_DTYPES:
+        raise ValueError(f"dtype has to be one of {WEIGHT_DTYPES}, got {dtype}")
+
+    import tensorflow as tf
+
+    # Keras 3 cannot load the SavedModels of Keras 2 and hands out no layer
+    # configurations for them, so they are read from the Keras metadata with the
+    # protobuf definition of TensorFlow
+    try:
+        from tensorflow.python.keras.protobuf import saved_metadata_pb2
+    except ImportError as error:
+        raise ImportError(f"export_model reads the Keras metadata of SavedModels with "
+                          f"TensorFlow 2.16 and 2.17, which is not available in "
+                          f"TensorFlow {tf.__version__}") from error
+
+    path = _model_path(model, "tensorflow")
+    if file is None:
+        file = os.path.splitext(path)[0] + '.npz'
+
+    metadata = saved_metadata_pb2.SavedMetadata()
+    with open(os.path.join(path, 'keras_metadata.pb'), 'rb') as f:
+        metadata.ParseFromString(f.read())
+
+    root = json.loads(next(node.metadata for node in metadata.nodes
+                           if node.node_path == 'root'))
+    if root['class_name'] != 'Sequential':
+        raise ValueError(f"Only Sequential models can be exported, "
+                         f"got {root['class_name']}")
+
+    variables = {variable.name: variable.numpy()
+                 for variable in tf.saved_model.load(path).variables}
+
+    input_shape, layers, weights = None, [], {}
+    for layer in root['config']['layers']:
+        config = layer['config']
+        if 'batch_input_shape' in config and input_shape is None:
+            input_shape = config['batch_input_shape']['items']
+        if layer['class_name'] == 'InputLayer':
+            continue
+
+        key = str(len(layers))
+        layers.append(_layer_config(layer['class_name'], config))
+
+        # the variables of a layer are named after the layer, e.g. dense_2/kernel:0 or
+        # bidirectional_1/forward_lstm_1/lstm_cell/kernel:0
+        for name, value in variables.items():
+            parts = name[:-len(':0')].split('/')
+            if parts[0] != config['name']:
+                continue
+            direction = [part.split('_')[0] for part in parts[1:-1]
+                         if part.startswith(('forward_', 'backward_'))]
+            weight_name = '/'.join([key] + direction + [parts[-1]])
+            weights.update(_quantize(weight_name, value, dtype))
+
+    config = {'layers': layers, 'input_shape': input_shape, 'dtype': dtype}
+    np.savez(file, config=json.dumps(config), **weights)
+
+    return file
+
+
+class NumpyModel:
+    """
+    Forward pass of a model exported by export_model in NumPy
+
+    The model is called like the TensorFlow model with a batch of inputs and returns a
+    dict with the predictions as 'output_0'. The batch is processed in chunks of
+    batch_size inputs, which bounds the memory of the convolutions.
+
+    Parameters
+    ----------
+    file : str
+        the location of the .npz file
+    batch_size : int (optional)
+        the number of inputs that are processed at once
+
+    """
+    def __init__(self, file, batch_size=64):
+        if os.path.isdir(file):
+            raise ValueError(f"{file} is a SavedModel directory, export it with "
+                             f"export_model to run it with the numpy engine")
+
+        with np.load(file, allow_pickle=False) as data:
+            config = json.loads(str(data['config']))
+            arrays = {key: data[key] for key in data.files if key != 'config'}
+
+        self.layers = config['layers']
+        self.input_shape = tuple(config['input_shape'])
+        self.dtype = config['dtype']
+        self.batch_size = batch_size
+
+        # the weights of each layer in float32, int8 weights are scaled back
+        self.weights = [{} for _ in self.layers]
+        for key, value in arrays.items():
+            if not key.endswith('/scale'):
+                index, name = key.split('/', 1)
+                scale = arrays.get(f'{key}/scale', np.float32(1))
+                self.weights[int(index)][name] = value.astype(np.float32) * scale
+
+    def __call__(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float32)
+
+        outputs = [self._forward(inputs[first:first + self.batch_size])
+                   for first in range(0, len(inputs), self.batch_size)]
+
+        if len(outputs) == 0:
+            empty = np.zeros((1,) + inputs.shape[1:], dtype=np.float32)
+            outputs = [self._forward(empty)[:0]]
+
+        return {'output_0': np.concatenate(outputs)}
+
+    def _forward(self, x):
+        """
+        Runs the layers on a chunk of inputs
+
+        Parameters
+        ----------
+        x : np.array (n_inputs, ...)
+            the inputs
+
+        Returns
+        -------
+        outputs : np.array (n_inputs, ...)
+            the outputs of the last layer
+        """
+        mask = None
+        for layer, weights in zip(self.layers, self.weights):
+            if layer['type'] == 'Masking':
+                # time steps with all features equal to the mask value are skipped
+                # by the recurrent layers
+                mask = ~np.all(x == layer['mask_value'], axis=-1)
+                x = x * mask[..., None]
+            elif layer['type'] == 'Conv1D':
+                x = _conv1d(x, weights['kernel'], weights['bias'])
+                x = _ACTIVATIONS[layer['activation']](x)
+            elif layer['type'] == 'Flatten':
+                x = x.reshape(len(x), -1)
+            elif layer['type'] == 'Dense':
+                x = x @ weights['kernel'] + weights['bias']
+                x = _ACTIVATIONS[layer['activation']](x)
+            elif layer['type'] == 'BidirectionalLSTM':
+                x = _bidirectional_lstm(x, mask, weights)
+
+        return x
+
+
+def benchmark_engines(models=None, batch_size=256, sequence_length=7 * 24 * 60,
+                      repeats=3):
+    """
+    Compares the speed and the output of the TensorFlow and the NumPy engine
+
+    The models are run on random inputs after a warm up call, the CNN models on a batch
+    of windows and the time in bed model on a single sequence of minutes.
+
+    Parameters
+    ----------
+    models : iterable of str (optional)
+        the names of the bundled models. Defaults to all bundled models.
+    batch_size : int (optional)
+        the number of inputs of models with a fixed input length
+    sequence_length : int (optional)
+        the number of time steps of models with inputs of any length. Defaults to a
+        week of minutes.
+    repeats : int (optional)
+        the number of runs the fastest time is taken from
+
+    Returns
+    -------
+    benchmark : DataFrame
+        a DataFrame with one row per model containing the input shape, the fastest time
+        of each engine in seconds, the speedup of the NumPy engine and the largest
+        absolute difference of the outputs
+
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for model in models if models is not None else MODELS:
+        engines = {engine: load_model(model, engine=engine) for engine in ENGINES}
+
+        input_shape = _input_shape(engines['numpy'])
+        if engines['numpy'].input_shape[1] is None:
+            inputs = rng.normal(size=(1, sequence_length) + input_shape[1:])
+            inputs = inputs.astype(np.float32)
+        else:
+            inputs = rng.normal(size=(batch_size,) + input_shape).astype(np.float32)
+
+        row = {'model': model, 'input_shape': inputs.shape}
+        outputs = {}
+        for engine, layer in engines.items():
+            layer(inputs[:1])
+            durations = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outputs[engine] = np.asarray(layer(inputs)['output_0'])
+                durations.append(time.perf_counter() - start)
+            row[engine] = min(durations)
+
+        row['speedup'] = row['tensorflow'] / row['numpy']
+        difference = np.abs(outputs['tensorflow'] - outputs['numpy'])
+        row['max_difference'] = float(difference.max())
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('model')
+
+
+def _model_path(model, engine="tensorflow"):
+    """
+    Resolves the name of a bundled model or the path of a SavedModel directory or a
+    .npz file
+
+    Parameters
+    ----------
+    model : str
+        the name of a bundled model or the path of a SavedModel directory or .npz file
+    engine : str (optional)
+        the engine, the exported .npz file is used for bundled models with the numpy
+        engine
+
+    Returns
+    -------
+    path : str
+        the absolute path of the SavedModel directory or .npz file
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine has to be one of {ENGINES}, got {engine}")
+
+    if model in MODELS:
+        path = os.path.join(MODEL_DIRECTORY, MODELS[model])
+        return os.path.splitext(path)[0] + '.npz' if engine == "numpy" else path
+
+    return os.path.abspath(model)
+
+
+def _evict_models():
+    """
+    Removes the least recently used models until the cache is not larger than the limit,
+    has to be called with the lock held
+    """
+    while _max_models is not None and len(_models) > _max_models:
+        path, _ = _models.popitem(last=False)
+        logging.debug('Removed model %s from the cache', path)
+
+
+def _input_shape(layer):
+    """
+    Finds the shape of a single input of a model from its serving signature
+
+    Parameters
+    ----------
+    layer : keras.layers.TFSMLayer or NumpyModel
+        the loaded model
+
+    Returns
+    -------
+    input_shape : tuple
+        the shape without the batch dimension, dimensions of any size are set to 1
+    """
+    if isinstance(layer, NumpyModel):
+        shape = layer.input_shape[1:]
+    else:
+        _, inputs = layer.call_endpoint_fn.structured_input_signature
+        shape = next(iter(inputs.values())).shape[1:]
+
+    return tuple(size if size is not None else 1 for size in shape)
+
+
+def _layer_config(class_name, config):
+    """
+    Extracts the configuration of a Keras layer that the NumPy engine needs
+
+    Parameters
+    ----------
+    class_name : str
+        the class of the Keras layer
+    config : dict
+        the configuration of the Keras layer
+
+    Returns
+    -------
+    layer : dict
+        the type of the layer and its parameters
+    """
+    if class_name == 'Masking':
+        return {'type': 'Masking', 'mask_value': config['mask_value']}
+
+    if class_name == 'Conv1D':
+        if (config['padding'] != 'valid' or config['strides']['items'] != [1]
+                or config['dilation_rate']['items'] != [1]
+                or config['data_format'] != 'channels_last'):
+            raise ValueError(f"Only valid Conv1D layers with strides and dilation of 1 "
+                             f"are supported, got {config}")
+        return {'type': 'Conv1D', 'activation': _activation(config)}
+
+    if class_name == 'Flatten':
+        return {'type': 'Flatten'}
+
+    if class_name == 'Dense':
+        return {'type': 'Dense', 'activation': _activation(config)}
+
+    if class_name == 'Bidirectional':
+        lstm = config['layer']
+        if (lstm['class_name'] != 'LSTM' or config['merge_mode'] != 'concat'
+                or not lstm['config']['return_sequences']
+                or lstm['config']['activation'] != 'tanh'
+                or lstm['config']['recurrent_activation'] != 'sigmoid'):
+            raise ValueError(f"Only Bidirectional LSTM layers returning sequences are "
+                             f"supported, got {config}")
+        return {'type': 'BidirectionalLSTM', 'units': lstm['config']['units']}
+
+    raise ValueError(f"Layers of type {class_name} are not supported by the numpy "
+                     f"engine")
+
+
+def _activation(config):
+    """
+    Checks that the activation of a layer is supported by the NumPy engine
+    """
+    if not config.get('use_bias', True) or config['activation'] not in _ACTIVATIONS:
+        raise ValueError(f"Only layers with bias and one of the activations "
+                         f"{list(_ACTIVATIONS)} are supported, got {config}")
+
+    return config['activation']
+
+
+def _quantize(key, value, dtype):
+    """
+    Converts weights to the data type they are stored in
+
+    Parameters
+    ----------
+    key : str
+        the name of the weights in the .npz file
+    value : np.array
+        the weights
+    dtype : str
+        'float32', 'float16' or 'int8'
+
+    Returns
+    -------
+    arrays : dict
+        the converted weights and, for int8, the scale of each output unit as key/scale
+    """
+    if dtype != 'int8':
+        return {key: value.astype(dtype)}
+
+    # symmetric scaling of each output unit (the last axis) to the range of int8
+    scale = np.abs(value.reshape(-1, value.shape[-1])).max(axis=0) / 127
+    scale[scale == 0] = 1
+
+    return {key: np.round(value / scale).astype(np.int8),
+            f'{key}/scale': scale.astype(np.float32)}
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)
+
+
+_ACTIVATIONS = {'relu': lambda x: np.maximum(x, 0),
+                'sigmoid': _sigmoid,
+                'tanh': np.tanh,
+                'linear': lambda x: x}
+
+
+def _conv1d(x, kernel, bias):
+    """
+    Valid 1D convolution of a batch of sequences as a single matrix product
+
+    Parameters
+    ----------
+    x : np.array (n_inputs, n_steps, n_channels)
+        the inputs
+    kernel : np.array (kernel_size, n_channels, n_filters)
+        the kernel
+    bias : np.array (n_filters,)
+        the bias
+
+    Returns
+    -------
+    outputs : np.array (n_inputs, n_steps - kernel_size + 1, n_filters)
+        the outputs
+    """
+    kernel_size, n_channels, n_filters = kernel.shape
+
+    # all windows of the inputs with the time steps and the channels of a window as
+    # the last axes like in the kernel
+    windows = sliding_window_view(x, kernel_size, axis=1).transpose(0, 1, 3, 2)
+    n_inputs, n_steps = windows.shape[:2]
+
+    windows = windows.reshape(n_inputs * n_steps, kernel_size * n_channels)
+    outputs = windows @ kernel.reshape(-1, n_filters)
+
+    return outputs.reshape(n_inputs, n_steps, n_filters) + bias
+
+
+def _bidirectional_lstm(x, mask, weights):
+    """
+    Bidirectional LSTM layer returning the concatenated sequences of both directions
+
+    Both directions are computed in the same loop over the time steps with a block
+    diagonal recurrent kernel, the backward direction runs over the reversed sequence.
+    Masked time steps keep the states and have zero outputs like in Keras.
+
+    Parameters
+    ----------
+    x : np.array (n_inputs, n_steps, n_features)
+        the inputs
+    mask : np.array (n_inputs, n_steps) or None
+        False for the time steps that are skipped
+    weights : dict
+        the kernel, recurrent_kernel and bias of the forward and backward direction
+
+    Returns
+    -------
+    outputs : np.array (n_inputs, n_steps, 2 * units)
+        the outputs of the forward and the backward direction
+    """
+    n_inputs, n_steps, _ = x.shape
+    units = weights['forward/recurrent_kernel'].shape[0]
+
+    if mask is None:
+        mask = np.ones((n_inputs, n_steps), dtype=bool)
+
+    # the input part of the gates of all time steps at once, the backward direction
+    # in reversed order
+    forward = x @ weights['forward/kernel'] + weights['forward/bias']
+    backward = x[:, ::-1] @ weights['backward/kernel'] + weights['backward/bias']
+    inputs = np.stack([forward, backward], axis=2)
+    masks = np.stack([mask, mask[:, ::-1]], axis=2)
+
+    recurrent_kernel = np.zeros((2 * units, 2 * 4 * units), dtype=np.float32)
+    recurrent_kernel[:units, :4 * units] = weights['forward/recurrent_kernel']
+    recurrent_kernel[units:, 4 * units:] = weights['backward/recurrent_kernel']
+
+    h = np.zeros((n_inputs, 2, units), dtype=np.float32)
+    c = np.zeros((n_inputs, 2, units), dtype=np.float32)
+    outputs = np.zeros((n_inputs, n_steps, 2, units), dtype=np.float32)
+
+    is_masked = not masks.all()
+
+    for step in range(n_steps):
+        recurrent = h.reshape(n_inputs, -1) @ recurrent_kernel
+        z = inputs[:, step] + recurrent.reshape(n_inputs, 2, 4 * units)
+
+        # the gates in the order of Keras: input, forget, cell and output, the cell
+        # gate uses tanh instead of the sigmoid
+        gates = _sigmoid(z)
+        cell = np.tanh(z[..., 2 * units:3 * units])
+        c_new = gates[..., units:2 * units] * c + gates[..., :units] * cell
+        h_new = gates[..., 3 * units:] * np.tanh(c_new)
+
+        if is_masked:
+            keep = masks[:, step, :, None]
+            c = np.where(keep, c_new, c)
+            h = np.where(keep, h_new, h)
+            outputs[:, step] = np.where(keep, h_new, 0)
+        else:
+            c, h = c_new, h_new
+            outputs[:, step] = h_new
+
+    # the outputs of the backward direction in the original order of the time steps
+    return np.concatenate([outputs[:, :, 0], outputs[:, ::-1, 1]], axis=2)
@@ -7,91 +7,329 @@ acceleration signals.
 
 """
 
-import os
+import fnmatch
+import hashlib
+import json
 import logging
-import zipfile
-from struct import unpack
+import mmap
+import os
+import re
+import shutil
+import sqlite3
 import tempfile
-import sys
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import closing, contextmanager
+from functools import partial
+from io import BytesIO, TextIOWrapper, UnsupportedOperation
+from multiprocessing import cpu_count
+from multiprocessing.shared_memory import SharedMemory
+from struct import unpack_from
 
 import numpy as np
 import pandas as pd
-from bitstring import Bits
+import tables
+from numpy.lib.stride_tricks import sliding_window_view
+from pygt3x.activity_payload import NHANES_SCALE
 from pygt3x.reader import FileReader
 
 from . import preprocessing
 
 
-def _unzip_gt3x_file(file, save_location=None, delete_source_file=False, metadata_only=False):
+# every log record starts with an ASCII record separator
+RECORD_SEPARATOR = 0x1E
+# separator, type, timestamp and payload size
+HEADER_SIZE = 8
+# record types of the log.bin file
+ACTIVITY = 0x00
+BATTERY = 0x02
+EVENT = 0x03
+PARAMETERS = 0x15
+ACTIVITY2 = 0x1A
+ACTIVITY3 = 0x1B
+
+# record types containing acceleration samples
+ACTIVITY_TYPES = frozenset((ACTIVITY, ACTIVITY2, ACTIVITY3))
+
+# event codes written when the device enters and leaves the idle sleep mode
+IDLE_SLEEP_MODE_STARTED = 0x08
+IDLE_SLEEP_MODE_ENDED = 0x09
+
+# compact representation of the record headers of a log.bin file
+RECORD_INDEX_DTYPE = np.dtype([('offset', np.int64),
+                               ('type', np.uint8),
+                               ('timestamp', np.uint32),
+                               ('size', np.uint16)])
+
+# battery voltage in mV, events and device parameters collected while reading the activity records
+BATTERY_DTYPE = np.dtype([('timestamp', np.uint32), ('voltage', np.uint16)])
+EVENT_DTYPE = np.dtype([('timestamp', np.uint32), ('event', np.uint8)])
+PARAMETER_DTYPE = np.dtype([('timestamp', np.uint32),
+                            ('address', np.uint16),
+                            ('identifier', np.uint16),
+                            ('value', np.uint32)])
+# records whose checksum does not match, record is the position of the record in log.bin
+CORRUPTED_RECORD_DTYPE = np.dtype([('timestamp', np.uint32), ('record', np.int64), ('type', np.uint8)])
+# byte ranges [start, stop) of log.bin that do not contain valid records, timestamp is the time of the last record before
+DAMAGED_SPAN_DTYPE = np.dtype([('timestamp', np.uint32), ('start', np.int64), ('stop', np.int64)])
+
+# contiguous segments of samples without gaps, the samples of a segment are in [first, stop)
+SEGMENT_DTYPE = np.dtype([('start', 'datetime64[ns]'),
+                          ('sample_rate', np.int64),
+                          ('first', np.int64),
+                          ('stop', np.int64)])
+
+# ways to fill the gaps between the segments of a recording, see fill_gaps
+FILL_METHODS = ("last", "zeros")
+
+# axes of the raw data arrays in the HDF5 store and the duration of the data in one compressed chunk in seconds
+HDF5_AXES = ("Y", "X", "Z")
+HDF5_CHUNK_SECONDS = 60
+
+# columns of the catalog of .gt3x files, see build_catalog
+CATALOG_COLUMNS = {'path': 'TEXT PRIMARY KEY',
+                   'mtime_ns': 'INTEGER',
+                   'file_size': 'INTEGER',
+                   'serial_number': 'TEXT',
+                   'device_type': 'TEXT',
+                   'firmware': 'TEXT',
+                   'battery_voltage': 'TEXT',
+                   'sample_rate': 'INTEGER',
+                   'start_date': 'TEXT',
+                   'stop_date': 'TEXT',
+                   'last_sample_time': 'TEXT',
+                   'timezone': 'TEXT',
+                   'download_date': 'TEXT',
+                   'board_revision': 'INTEGER',
+                   'unexpected_resets': 'INTEGER',
+                   'acceleration_scale': 'REAL',
+                   'acceleration_min': 'REAL',
+                   'acceleration_max': 'REAL',
+                   'subject_name': 'TEXT',
+                   'log_bin_size': 'INTEGER',
+                   'first_record_time': 'TEXT',
+                   'last_record_time': 'TEXT',
+                   'n_records': 'INTEGER',
+                   'n_activity_records': 'INTEGER',
+                   'duration': 'REAL',
+                   'expected_samples': 'INTEGER',
+                   'expected_decoded_size': 'INTEGER',
+                   'error': 'TEXT'}
+
+# reader backends of read_gt3x by name, see register_backend
+BACKENDS = {}
+
+# default maximum size of the cache for decoded files in bytes
+CACHE_MAX_SIZE = 20 * 2 ** 30
+# version of the decoded data in the cache, has to be increased when the decoded data changes
+CACHE_VERSION = 6
+
+
+@contextmanager
+def _open_gt3x(file):
     """
-    Unzip the .gt3x file
+    Open the .gt3x file, which is a zip archive containing the log.bin and info.txt files
 
     Parameters
-    ---------
-    file : string
-        file location of the .gt3x file
-    save_location : string (optional)
-        location where the unzipped files should be saved, if not given, files are saved within the same folder as f
-    delete_source_file : Boolean (Optional)
-        if True, then the original .gt3x file will be deleted after it is unzipped
-    metadata_only : Boolean (optional)
-        if True, only the metadata info.txt file is unzipped. This saves a lot of time if only the metadata should loaded
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
 
-    Returns
-    -------
-    log_bin : string
-        location where the log.bin file is stored
-    info_txt : string
-        location where the info.txt file is stored
+    Yields
+    ------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
     """
 
-    # if save location is not given, then save in the same folder
-    # as where the file resides with the folder name equal the name of the file
-    if save_location is None:
-        save_location = os.path.splitext(file)[0]
+    # recordings that are already in memory are read without touching the filesystem
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        file = BytesIO(file)
 
-    # if folder does not exist, create it
-    if not os.path.exists(save_location):
-        os.makedirs(save_location)
+    with zipfile.ZipFile(file, 'r') as archive:
+        yield archive
 
-    # create the path locations where the log.bin and info.txt files are stored
-    log_bin = os.path.join(save_location, 'log.bin')
-    info_txt = os.path.join(save_location, 'info.txt')
 
-    if metadata_only:
-        with zipfile.ZipFile(file, 'r') as myzip:
-            myzip.extract("info.txt", path=save_location)
+@contextmanager
+def _open_log_bin(archive):
+    """
+    Provide the content of the log.bin file without extracting it to disk
 
-        return info_txt
+    If log.bin is stored uncompressed within an archive on disk, the archive is memory mapped and the
+    content of log.bin is handed out as a view on that memory map. Otherwise, log.bin is decompressed
+    into one preallocated buffer.
 
-    # check if file already exists
-    if not os.path.exists(log_bin) and not os.path.exists(info_txt):
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
 
-        try:
-            # unzip the file
-            with zipfile.ZipFile(file, 'r') as myzip:
+    Yields
+    ------
+    log_bin : buffer
+        the content of the log.bin file
+    """
 
-                myzip.extractall(save_location)
+    if 'log.bin' not in archive.namelist():
+        raise ValueError("The file has no log.bin. Files of the V1 format (activity.bin and log.txt) can only be read "
+                         "with the pygt3x backend and have no records.")
 
-        except Exception as msg:
-            logging.error('Error unpacked file: %s', msg)
-            return None, None
+    info = archive.getinfo('log.bin')
 
-        finally:
-            # delete source file if delete_source_file parameter is set to True
-            if delete_source_file:
-                os.remove(file)
+    try:
+        fileno = archive.fp.fileno() if info.compress_type == zipfile.ZIP_STORED else None
+    except (AttributeError, OSError, UnsupportedOperation):
+        fileno = None
+
+    if fileno is not None:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as buffer:
+            start = _stored_member_offset(buffer, info)
+
+            with memoryview(buffer)[start:start + info.file_size] as log_bin:
+                yield log_bin
+        return
+
+    # decompress log.bin into a buffer that has the final size from the start
+    log_bin = bytearray(info.file_size)
+    with memoryview(log_bin) as view:
+        num_bytes = _decompress_member(archive, info, view)
+
+    del log_bin[num_bytes:]
+
+    yield log_bin
+
+
+@contextmanager
+def _share_log_bin(archive):
+    """
+    Provide the content of the log.bin file in a way that other processes can access it as well
+
+    If log.bin is stored uncompressed within an archive on disk, other processes can memory map
+    the archive themselves. Otherwise, log.bin is decompressed into a shared memory block.
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+
+    Yields
+    ------
+    log_bin : buffer
+        the content of the log.bin file
+    source : tuple
+        the location of log.bin for other processes, see _attach_log_bin
+    """
+    info = archive.getinfo('log.bin')
+    path = getattr(archive.fp, 'name', None)
+
+    if info.compress_type == zipfile.ZIP_STORED and isinstance(path, str) and os.path.isfile(path):
+        with _open_log_bin(archive) as log_bin:
+            with open(path, 'rb') as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                start = _stored_member_offset(buffer, info)
+            yield log_bin, ('file', os.path.abspath(path), start, info.file_size)
+        return
+
+    shared_memory = SharedMemory(create=True, size=max(info.file_size, 1))
+    try:
+        with shared_memory.buf[:info.file_size] as view:
+            num_bytes = _decompress_member(archive, info, view)
+
+        with shared_memory.buf[:num_bytes] as log_bin:
+            yield log_bin, ('shared_memory', shared_memory.name, num_bytes)
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+
+@contextmanager
+def _attach_log_bin(source):
+    """
+    Provide the content of the log.bin file shared by another process with _share_log_bin
+
+    Parameters
+    ----------
+    source : tuple
+        the location of log.bin as given by _share_log_bin
+
+    Yields
+    ------
+    log_bin : buffer
+        the content of the log.bin file
+    """
+    kind, location, *extent = source
+
+    if kind == 'file':
+        start, size = extent
+        with open(location, 'rb') as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with memoryview(buffer)[start:start + size] as log_bin:
+                yield log_bin
     else:
-        logging.debug('file already unpacked: %s', file)
+        size, = extent
+        shared_memory = SharedMemory(name=location)
+        try:
+            with shared_memory.buf[:size] as log_bin:
+                yield log_bin
+        finally:
+            shared_memory.close()
+
+
+def _stored_member_offset(buffer, info):
+    """
+    Find the offset of the content of an uncompressed member within a zip archive
+
+    Parameters
+    ----------
+    buffer : buffer
+        the content of the zip archive
+    info : zipfile.ZipInfo
+        the member
+
+    Returns
+    -------
+    offset : int
+        the offset of the first byte of the content of the member
+    """
+    # the local file header has a fixed size of 30 bytes and is followed by the file name and the extra field
+    name_length, extra_length = unpack_from('<HH', buffer, info.header_offset + 26)
+    return info.header_offset + 30 + name_length + extra_length
+
+
+def _decompress_member(archive, info, view):
+    """
+    Decompress a member of a zip archive into a preallocated buffer
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened archive
+    info : zipfile.ZipInfo
+        the member
+    view : memoryview
+        the buffer with space for the uncompressed content of the member
+
+    Returns
+    -------
+    num_bytes : int
+        the number of bytes that were decompressed
+    """
+    num_bytes = 0
+    with archive.open(info) as member:
+        while num_bytes < info.file_size:
+            chunk_size = member.readinto(view[num_bytes:])
+            if not chunk_size:
+                break
+            num_bytes += chunk_size
+
+    if num_bytes < info.file_size:
+        logging.warning('%s is shorter than expected: %s of %s bytes', info.filename, num_bytes, info.file_size)
 
-    # return location of the files
-    return log_bin, info_txt
+    return num_bytes
 
 
-def _extract_info(info_txt):
+def _extract_info(archive):
 
     """
-    Extract the content from the info.txt file that was unzipped from the raw .gt3x file
+    Extract the content from the info.txt file within the raw .gt3x file
     Example:
     {'Battery_Voltage': '3,83', 'Acceleration_Scale': '256.0', 'Download_Date': '635672143370000000', 'Unexpected_Resets': '0', 'Stop_Date': '635664672000000000',
     'Firmware': '1.3.0', 'Acceleration_Min': '-8.0', 'Subject_Name': '90046928', 'Last_Sample_Time': '635664672000000000', 'Sample_Rate': '100',
@@ -100,8 +338,8 @@ def _extract_info(info_txt):
 
     Parameters
     ----------
-    info_txt : string
-        location of the info.txt file on disk
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
 
     Returns
     -------
@@ -114,7 +352,7 @@ def _extract_info(info_txt):
 
     try:
         # open the file
-        with open(info_txt, 'r') as file:
+        with TextIOWrapper(archive.open('info.txt', 'r'), encoding='utf-8-sig') as file:
             # loop trough each of the lines
             for line in file.readlines():
                 # strip away the new lines
@@ -130,442 +368,2930 @@ def _extract_info(info_txt):
     return info_data
 
 
-def _extract_log(log_bin, acceleration_scale, sample_rate, use_scaling=False):
+def _read_uint(data, offsets, dtype):
     """
-    Extract acceleration data from log.bin file that was unzipped from the raw .gt3x file
-    One second of raw activity samples packed into 12-bit values in YXZ order.
+    Read little-endian unsigned integers at arbitrary (unaligned) byte offsets
 
     Parameters
     ----------
-    log_bin : string
-        location of the log.bin file on disk
-    acceleration_scale : float
-        Scale the resultant by the scale factor (this gives us an acceleration value in g's).
-        Device serial numbers starting with NEO and CLE use a scale factor of 341 LSB/g (±6g).
-        MOS devices use a 256 LSB/g scale factor (±8g). If a LOG_PARAMETER record is preset,
-        then the ACCEL_SCALE value should be used.
-    sample_rate : int
-        sample rate, i.e. the number of Hz (how many values we obtain per second)
-        This value can also be inferred from the payload size when you know how many axis data you have.
-        So payload size of 450 bytes = 300 (12 bit sized ints). And when we have 3 axis, we have 300/3 = 100 values per 3-axis per second
-    use_scaling: Boolean (optional)
-        acceleration data is originally stored as a signed integer. To obtain the acceleration value we need to scale it with the acceleration_scale
-        this will give us the decimal numbers. However, this would also increase memory size of the array in which we store the values. We might not want to
-        scale if we only want to store the data in a smaller memory size format. Scaling can then be done at a later stage, for instance, when we want to pre-process the data
+    data : np.array
+        uint8 buffer
+    offsets : np.array
+        byte offsets of the integers
+    dtype : str
+        little-endian numpy dtype of the integers, e.g. '<u2' or '<u4'
 
     Returns
     -------
-    log_data : numpy array (time steps * sample_rate, num axes)
-        log data contains the raw acceleration values in YXZ order
-    log_time : numpy array (time steps, 1)
-        log time contains the timestamps of measurements
+    values : np.array
+        the integers at the given offsets
     """
+    dtype = np.dtype(dtype)
+    return np.ascontiguousarray(sliding_window_view(data, dtype.itemsize)[offsets]).view(dtype).ravel()
 
-    # define the size of the payload. This is necessary because we need to define the size of the numpy array before we populate it.
-    SIZE = _count_payload_size(log_bin)
-    # raw data values are stored in ints, to obtain values in G, we need to scale them by a factor found in the acceleration_scale parameter within the info.txt file. For example, 256.0
-    SCALING = 1. / acceleration_scale
-    # counter so we can keep track of how many acceleration values we have processed
-    COUNTER = 0
-    # number of axes, the GTX3 is tri-axial, so we hard code it here.
-    NUM_AXES = 3
-
-    # empty dictionary where we can store the 12bit to signed integer values; this saves calculating them all the time
-    bit12_to_int = {}
 
+def _index_records(log_bin):
     """
-        create empty numpy array where we can store the acceleration data to: dimensions (sample_rate x SIZE,number of axis)
-        if we want to scale the values to floats, we need a bigger datatype, it would take more memory. If no scaling is necessary, because we can scale later during preprocessing or so, we can
-        proceed with just an int8 datatype array.
-        For example, without scaling, 7 days of data equals around 180MB, with scaling the numpy array equals around 1.5GB
-    """
+    Index the complete records at the start of a buffer with the content of a log.bin file
+
+    Log Record Format
+    Offset (bytes)    Size (bytes)    Name    Description    Part of Record
+    0    1    Seperator    An ASCII record separator byte (1Eh) marks the beginning of each log record.    Header
+    1    1    Type    A type identifier is used to interpret the payload of the record.    Header
+    2    4    Timestamp    The date and time of the data contained in the record are marked to the nearest second in Unix time format.    Header
+    6    2    Size    The size of the payload is given in bytes as an little-endian unsigned integer.    Header
+    8    Size    Payload    The payload of the record.    Payload
+    8+Size    1    Checksum    A 1's complement, exclusive-or (XOR) of the log header and payload.    Checksum
+
+    Instead of reading the headers one after another, every separator byte in the buffer is treated
+    as a candidate record. The offset of the following record is computed for all candidates at once
+    and the chain of records starting at the first byte is then followed by pointer jumping, which only
+    needs a logarithmic number of array operations.
 
-    # use int16 as datatype to store the signed integer values, this saves memory when saving the array
-    acc_data_type = np.int16
-    if use_scaling:
-        # use float when we want to store the acceleration data in G, meaning that we the scaling factor to recalculate the signed int into decimal values
-        acc_data_type = float
-    # create empty array for the acceleration data
-    log_data = np.empty((sample_rate * SIZE, NUM_AXES), dtype=acc_data_type)
-    # empty numpy array to store the timestamps
-    time_data = np.empty((SIZE, 1), dtype=np.uint32)
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file (or a part of it starting at a record), e.g. as bytes or a memory map
 
-    # open the log.bin file in binary mode
-    with open(log_bin, mode='rb') as file:
+    Returns
+    -------
+    index : np.array (n_records,)
+        structured numpy array with the fields offset, type, timestamp and size for every record
+    end_of_records : int
+        the offset of the first byte after the last complete record
+    """
 
-        try:
+    data = np.frombuffer(log_bin, dtype=np.uint8)
+    candidates, next_offsets, jump = _link_records(data)
 
-            # keep reading byte by byte
-            while True:
+    if candidates.size == 0 or candidates[0] != 0:
+        return np.empty(0, dtype=RECORD_INDEX_DTYPE), 0
 
-                """
-                Log Record Format
-                Offset (bytes)    Size (bytes)    Name    Description    Part of Record
-                0    1    Seperator    An ASCII record separator byte (1Eh) marks the beginning of each log record.    Header
-                1    1    Type    A type identifier is used to interpret the payload of the record.    Header
-                2    4    Timestamp    The date and time of the data contained in the record are marked to the nearest second in Unix time format.    Header
-                6    2    Size    The size of the payload is given in bytes as an little-endian unsigned integer.    Header
-                """
-                _, payload_type, timestamp, size = unpack("<cbLH", file.read(8))
+    records = _follow_records(jump, 0)
+    end = next_offsets[records[-1]]
 
-                # acceleration type 0 is the activity data, we skip all other data but can easily be read with an if statement
-                if payload_type == 0:
+    # the last record is incomplete if it reaches beyond the end of the buffer
+    if end > data.size:
+        records = records[:-1]
+    # the chain is broken if it is not followed by another record, the following record may only be cut off at the end of the buffer
+    elif end < data.size - HEADER_SIZE:
+        records = _drop_damaged_records(data, records, candidates, next_offsets)
 
-                    """
-                        This is the actual data that varies based on the record *Type* field. It's size is provided in the *Size* field. Please refer to the appropriate section for the record type for the indiviual payload formats.
+    index = _create_index(data, candidates[records], next_offsets[records])
 
-                        read the payload in bits (the reason we are converting the bytes to bits is that 1 acceleration value is encoded in 12bit, so we can cut out 12 bits at a time from the full payload represented as individual bits)
-                        basically the YXZ (3 axis) is 12 bit + 12 bit + 12 bit = 36 bits. When we have 100hz, we have a total of 36 * 100 = 3600 bits. When you look at the size of the payload in bytes, that is for instance 450 bytes, you can
-                        see that this is also 450 * 8 = 3600 bits
-                    """
+    return index, int(next_offsets[records[-1]]) if records.size > 0 else 0
 
-                    # read the bytes as bits as a large string
-                    payload_bits = Bits(bytes=file.read(size)).bin
 
-                    # extract 12 bits as 1 acceleration value and add them to a list
-                    bits_list = []
-                    for ii in range(0, len(payload_bits), 12):
+def _link_records(data):
+    """
+    Treat every separator byte as a candidate record and link each candidate to the following record
+
+    Parameters
+    ----------
+    data : np.array (n_bytes,)
+        the content of the log.bin file as uint8 array
 
-                        # extract the 12 bit as a string
-                        bitstring = payload_bits[ii:ii + 12]
+    Returns
+    -------
+    candidates : np.array (n_candidates,)
+        the offsets of all separator bytes that can start a record
+    next_offsets : np.array (n_candidates,)
+        the offset of the byte after each candidate record
+    jump : np.array (n_candidates + 1,)
+        the position of the following record within the candidates. Candidates that do not
+        point to another candidate point to the last position, which points to itself.
+    """
 
-                        # convert to 12bit two's complement to signed integer value: also store values in dictionary for faster reading if not already present (the Bits function is not as fast as reading it from a dictionary)
-                        if bitstring not in bit12_to_int:
-                            # convert 12bit to signed integer
-                            acc_value = Bits(bin=bitstring).int
-                            # add to dictionary so we can read it faster next time we have the same value
-                            bit12_to_int[bitstring] = acc_value
-                        else:
-                            # bitstring previously already converted to signed int, so we can obtain it from the dictionary
-                            acc_value = bit12_to_int[bitstring]
+    # every record consists of at least a header and a checksum
+    candidates = np.flatnonzero(data[:max(data.size - HEADER_SIZE, 0)] == RECORD_SEPARATOR)
 
-                        # add to list
-                        bits_list.append(acc_value)
+    if candidates.size == 0:
+        return candidates, candidates.copy(), np.zeros(1, dtype=np.int64)
 
-                    # convert list to numpy array and perform scaling if it was set to True: no scaling allows for a smaller numpy array because we can use int8 and not need the float
-                    if use_scaling:
-                        payload_bits_array = np.array(bits_list).reshape(sample_rate, NUM_AXES) * SCALING
-                    else:
-                        payload_bits_array = np.array(bits_list).reshape(sample_rate, NUM_AXES)
+    # offset of the following record for every candidate
+    sizes = _read_uint(data, candidates + 6, '<u2').astype(np.int64)
+    next_offsets = candidates + HEADER_SIZE + sizes + 1
 
-                    # add payload bits array to overall numpy array
-                    np_start = COUNTER * sample_rate
-                    np_end = np_start + sample_rate
-                    log_data[np_start:np_end] = payload_bits_array
+    # position of the following record within the candidates, everything that does not point to a separator points to the end
+    num_candidates = candidates.size
+    jump = np.searchsorted(candidates, next_offsets)
+    jump[jump == num_candidates] = num_candidates - 1
+    jump[candidates[jump] != next_offsets] = num_candidates
+    jump = np.append(jump, num_candidates)
 
-                    # add the time component
-                    time_data[COUNTER] = timestamp
+    return candidates, next_offsets, jump
 
-                    # increase the counter
-                    COUNTER += 1
 
-                else:
-                    # skip whatever is not acceleration data
-                    # there are different payload types and can easily be read by adding a different payload_type in this section
-                    file.seek(size, 1)
+def _follow_records(jump, first):
+    """
+    Follow the chain of records starting at a candidate by pointer jumping, which only needs a
+    logarithmic number of array operations
 
-                """
-                A 1-byte checksum immediately follows the record payload. It is a 1's complement, exclusive-or (XOR) of the log header and payload with an initial value of zero.
-                TODO: calculate checksum from payload and header and see if it matches the checksum that we read from the last byte
-                """
-                _ = unpack("B", file.read(1))
+    Parameters
+    ----------
+    jump : np.array (n_candidates + 1,)
+        the links between the candidates as returned by _link_records
+    first : int
+        the position of the first record of the chain within the candidates
 
-                # stop when all records have been read
-                if COUNTER == SIZE:
+    Returns
+    -------
+    records : np.array (n_records,)
+        the positions of the records of the chain within the candidates
+    """
 
-                    logging.info('Finished processing activity data')
-                    break
+    # the following record always comes after a record, so only the candidates from the first one on are needed
+    jump = jump[first:] - first
 
-        except Exception as msg:
-            logging.error('Unpacking GTX3 exception: %s', msg)
-            return None, None
+    # double the distance covered by a jump in every iteration
+    is_record = np.zeros(jump.size, dtype=bool)
+    is_record[0] = True
+    while not is_record[-1]:
+        is_record[jump[is_record]] = True
+        jump = jump[jump]
 
-        # return acceleration data + time data
-        return log_data, time_data
+    return np.flatnonzero(is_record[:-1]) + first
 
 
-def _count_payload_size(log_bin, count_payload=0):
+def _drop_damaged_records(data, records, candidates, next_offsets, max_records=64):
     """
-    Count the payload size of the log.bin file. The size of the payload is necessary to know how large
-    the numpy array needs to be that will be populated while reading the log.bin file byte by byte. The reasons why
-    is that populating an array is much faster than appending new array values to it
+    Drop the records with a wrong checksum at the end of a broken chain of records
+
+    A chain of records breaks if a record is damaged, e.g. if its size was corrupted
+    or random bytes were written into the file. The chain may have been continued by
+    such records before it breaks, so the records at the end of the chain are
+    verified and cut off after the last valid record.
 
     Parameters
     ----------
-    log_bin : string
-        location of the log.bin file on disk
-    count_payload : int (optional)
-        the payload type that we want to count. default is 0, which is the acceleration data.
+    data : np.array (n_bytes,)
+        the content of the log.bin file as uint8 array
+    records : np.array (n_records,)
+        the positions of the records of the chain within the candidates
+    candidates : np.array (n_candidates,)
+        the offsets of the candidate records
+    next_offsets : np.array (n_candidates,)
+        the offset of the byte after each candidate record
+    max_records : int (optional)
+        the number of records at the end of the chain that are verified
 
     Returns
     -------
-    SIZE : int
-        the size (as in count) of the payload
+    records : np.array (n_valid_records,)
+        the positions of the records of the chain without the damaged records at the end
     """
+    tail = records[-max_records:]
+    valid = np.flatnonzero(_xor_records(data, candidates[tail], next_offsets[tail]) == 0xFF)
 
-    # define size variable
-    SIZE = 0
+    return records[:records.size - tail.size + (valid[-1] + 1 if valid.size > 0 else 0)]
 
-    # open the log.bin file in binary mode
-    with open(log_bin, mode='rb') as file:
 
-        try:
-            # keep reading byte by byte
-            while True:
-
-                # extract header information
-                _, payload_type, _, size = unpack("<cbLH", file.read(8))
-
-                # count payload
-                if payload_type == count_payload:
-
-                    # skip the byte content, we don't need to process it here
-                    file.seek(size, 1)
-                    # increment counter
-                    SIZE += 1
-                else:
-                    # skip other payload types, we don't need to read it here
-                    file.seek(size, 1)
+def _create_index(data, offsets, next_offsets):
+    """
+    Create the record index from the offsets of the records
 
-                # skip the 1-byte checksum value
-                file.seek(1, 1)
+    Parameters
+    ----------
+    data : np.array (n_bytes,)
+        the content of the log.bin file as uint8 array
+    offsets : np.array (n_records,)
+        the offsets of the records
+    next_offsets : np.array (n_records,)
+        the offset of the byte after each record
 
-        except Exception:
-            logging.info('Counted payload size: %s', SIZE)
+    Returns
+    -------
+    index : np.array (n_records,)
+        structured numpy array with the fields offset, type, timestamp and size for every record
+    """
+    index = np.empty(offsets.size, dtype=RECORD_INDEX_DTYPE)
+    index['offset'] = offsets
+    index['type'] = data[offsets + 1]
+    index['timestamp'] = _read_uint(data, offsets + 2, '<u4')
+    index['size'] = next_offsets - offsets - HEADER_SIZE - 1
 
-            # return the value
-            return SIZE
+    return index
 
 
-def _create_time_array(time_data, hz=100):
+def _find_valid_record(data, start, stop=None, chunk_size=2 ** 16):
     """
-    Create a time array by adding the miliseconds range of the sampling frequency
-    the standard time array only accounts for full seconds. However, when the sampling
-    frequency is 100 hertz for instance, we need to add 100 microseconds to the data
+    Find the first valid record that starts within [start, stop)
+
+    A record is valid if it is complete, its checksum matches and it is followed by
+    another separator or the end of the data. The data is searched chunk by chunk, so
+    only the bytes up to the next valid record are scanned.
 
     Parameters
     ----------
-    time_data : np.array
-        numpy array containing unix timestamps (obtained by reading the raw .gt3x data)
-    hz : int (optional)
-        sampling frequency of the acceleration data (this is to know how many miliseconds we need to add to the time series)
+    data : np.array (n_bytes,)
+        the content of the log.bin file as uint8 array
+    start : int
+        the offset from which on the data is searched
+    stop : int (optional)
+        the offset before which the valid record has to start, defaults to the end of the data
+    chunk_size : int (optional)
+        the number of bytes that are searched for separators at once
 
     Returns
     -------
-    time_data : np.array
-        numpy array with correct number of time series (so now the sampling frequency is added within the original data which only contained seconds and not miliseconds)
-
-    Raises
-    ------
-    NotImplementedError
-        If the sampling frequency does not fit on milisecond precision
+    offset : int or None
+        the offset of the first valid record, None if there is none
     """
+    stop = data.size if stop is None else min(stop, data.size)
 
-    # check if the sampling frequenzy can fit into equal parts within a 1000ms window
-    if 1000 % hz != 0:
-        raise NotImplementedError("Creating time array does not support sampling frequencies other than 100hz yet. See https://github.com/Trybnetic/paat/issues/10")
+    for chunk_start in range(start, stop, chunk_size):
+        chunk = data[chunk_start:min(chunk_start + chunk_size, stop)]
 
-    # calculate the step size of hz in 1s (so 100hz means 100 measurements in 1sec, so if we need to fill 1000ms then we need use a step size of 10)
-    step_size = 1000 / hz
-    # convert time_data of unix timestamps to numpy array of 64 bit seconds
-    time_data = np.asarray(time_data, dtype='datetime64[s]')
-    # convert the array to 64 bit milliseconds and add a time delta of a range of ms within a 1000ms window
-    time_data = np.asarray(time_data, dtype='datetime64[ms]') + np.asarray(np.arange(0, 1000, step_size), dtype='timedelta64[ms]')
-    # flatten the array
-    time_data = time_data.flatten()
+        for offset in np.flatnonzero(chunk == RECORD_SEPARATOR) + chunk_start:
+            if offset + HEADER_SIZE >= data.size:
+                return None
 
-    return time_data
+            end = offset + HEADER_SIZE + int(data[offset + 6]) + (int(data[offset + 7]) << 8) + 1
+            if end > data.size or (end < data.size and data[end] != RECORD_SEPARATOR):
+                continue
 
+            if np.bitwise_xor.reduce(data[offset:end]) == 0xFF:
+                return int(offset)
 
-def _format_time(tstamp):
-    dt = np.datetime64('0001-01-01T00:00:00') + np.timedelta64(int(tstamp) // 10000000, 's')
-    return str(dt)
+    return None
 
 
-def _format_meta_data(meta):
+def _build_record_index(log_bin):
     """
-    Formats the meta data dict that is extracted from the gt3x file
+    Build an index of all records within the log.bin file in a single pass
+
+    Damaged parts of log.bin are skipped, see _index_damaged_log_bin.
 
     Parameters
     ----------
-    meta : dict
-        the meta data dict from the gt3x file
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
 
     Returns
     -------
-    new_meta : dict
-        an updated meta data dict having the fields of meta in the correct format
+    index : np.array (n_records,)
+        structured numpy array with the fields offset, type, timestamp and size for every record
     """
-    new_meta = {}
-
-    # standard meta data fields of ActiGraph and their conversion functions
-    fields_and_formats = {'Serial_Number': str,
-                          'Device_Type': str,
-                          'Firmware': str,
-                          'Battery_Voltage': str,
-                          'Sample_Rate': int,
-                          'Start_Date': _format_time,
-                          'Stop_Date': _format_time,
-                          'Last_Sample_Time': _format_time,
-                          'TimeZone': str,
-                          'Download_Date': _format_time,
-                          'Board_Revision': int,
-                          'Unexpected_Resets': int,
-                          'Acceleration_Scale': float,
-                          'Acceleration_Min': float,
-                          'Acceleration_Max': float,
-                          'Subject_Name': str}
 
-    for field, dtype in fields_and_formats.items():
-        try:
-            new_meta[field] = dtype(meta[field])
-        except KeyError as msg:
-            logging.info(msg)
+    index, _ = _index_damaged_log_bin(log_bin)
 
-    return new_meta
+    return index
 
 
-def _create_time_vector(start, n_samples, hz):
+def _index_damaged_log_bin(log_bin):
     """
-    Creates a time vector starting at point start until start + n_samples/hz
-    with a sampling frequency of hz
+    Build an index of all records within the log.bin file and find the damaged spans of the file
+
+    The records are followed from the start of the file. If the chain of records breaks,
+    e.g. because of a corrupted or truncated record, the index is continued at the next
+    separator that starts a valid record, see _find_valid_record. The candidate records
+    are only linked once, so resynchronizing does not scan the file again. The records
+    at the end of a broken chain are only kept if their checksums match.
 
     Parameters
     ----------
-    start : int or np.datetime64
-        start point of the time vector at second precision level.
-    n_samples : int
-        number of samples
-    hz : int
-        sampling frequency
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
 
     Returns
     -------
-    time_data : np.array
-        a numpy array of np.datetime64 at nanosecond precision
-
-    Raises
-    ------
-    NotImplementedError
-        If the sampling frequency does not fit on milisecond precision
+    index : np.array (n_records,)
+        structured numpy array with the fields offset, type, timestamp and size for every record
+    damaged : np.array (n_damaged,)
+        structured numpy array with the fields start and stop (byte offsets of the damaged
+        span) and timestamp (of the last record before the span or 0)
     """
 
-    n_sec = n_samples / hz
+    data = np.frombuffer(log_bin, dtype=np.uint8)
+    candidates, next_offsets, jump = _link_records(data)
+
+    chains, spans = [], []
+    # the end of the valid records so far and the offset from which on the next record is searched
+    position = search = 0
+    while position < data.size:
+        # the first record of the file is trusted like all records of a chain
+        if search == 0 and candidates.size > 0 and candidates[0] == 0:
+            first = 0
+        else:
+            first = _find_valid_record(data, search)
+
+        if first is None:
+            spans.append((position, data.size))
+            break
+
+        chain = _follow_records(jump, int(np.searchsorted(candidates, first)))
+        end = next_offsets[chain[-1]]
+
+        # the last record is incomplete at the end of a truncated file, otherwise the chain breaks at a damaged record
+        if end > data.size:
+            chain = chain[:-1]
+        elif end < data.size:
+            chain = _drop_damaged_records(data, chain, candidates, next_offsets)
+
+        if chain.size == 0:
+            search = first + 1
+            continue
 
-    if not n_sec.is_integer():
-        logging.error('Actiwave time in seconds not a whole number: %s', n_sec)
-        sys.exit()
+        if first > position:
+            spans.append((position, first))
 
-    # declare how many nanoseconds in one second
-    ms_in_sec = 1e3
+        chains.append(chain)
+        position = search = int(next_offsets[chain[-1]])
 
-    # check if the sampling frequenzy can fit into equal parts within a nanosecond window
-    if ms_in_sec % hz != 0:
-        raise NotImplementedError("Creating time vector does not support sampling frequencies other than 100hz yet. See https://github.com/Trybnetic/paat/issues/10")
+    records = np.concatenate(chains) if chains else np.empty(0, dtype=np.int64)
+    index = _create_index(data, candidates[records], next_offsets[records])
 
-    step_size = ms_in_sec / hz
+    damaged = np.empty(len(spans), dtype=DAMAGED_SPAN_DTYPE)
+    damaged['start'] = [span[0] for span in spans]
+    damaged['stop'] = [span[1] for span in spans]
+    damaged['timestamp'] = 0
+    if index.size > 0:
+        previous = np.searchsorted(index['offset'], damaged['start']) - 1
+        damaged['timestamp'] = np.where(previous >= 0, index['timestamp'][previous.clip(0)], 0)
 
-    # convert the array to 64 bit nanoseconds (necessary to fit 128hz for instance) and add a time delta of a range nanoseconds in seconds * lenght_sec, with corresponding stepsize
-    time_data = np.asarray(start, dtype='datetime64[ms]') + np.asarray(np.arange(0, ms_in_sec * n_sec, step_size), dtype='timedelta64[ms]')
+    if damaged.size > 0:
+        logging.warning('Skipped %s damaged spans of log.bin with %s of %s bytes', damaged.size,
+                        int((damaged['stop'] - damaged['start']).sum()), data.size)
 
-    return time_data.flatten()
+    return index, damaged
 
 
-def read_gt3x(file, rescale=True, pandas=True, metadata=False, use_pygt3x=False):
+def _iter_log_bin(archive, block_size=2 ** 24):
     """
-    Reads a .gt3x file and returns the tri-axial acceleration values together
-    with the corresponding time stamps and all meta data.
+    Read the log.bin file block by block without holding the whole file in memory
 
     Parameters
     ----------
-    file : string
-        file location of the .gt3x file
-    rescale : boolean (optional)
-        boolean indicating whether raw acceleration data should be rescaled to g values
-    pandas : boolean (optional)
-        boolean indicating whether the data should be returned as a pandas DataFrame
-    metadata : boolean (optional)
-        boolean indicating whether the full metadata should be returned
-    use_pygt3x : boolean (optional)
-        boolean indicating whether to use ActiGraph's Pygt3x library to read the file.
-
-    Returns
-    -------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
-    sample_freq : int
-        the sampling frequency in which the data was recorded
-    time : np.array (n_samples x 1)
-        a numpy array with time stamps for the observations in values
-    values : np.array (n_samples x 3)
-        a numpy array with the tri-axial acceleration values. If rescale is true, data
-        is rescaled to units of g. Note, that this function returns the values in
-        the default order of ActiGraph which is ['Y','X','Z']. Depending on further
-        use, you might want to adjust that order.
-    meta : dict
-        a dict containing all meta data produced by ActiGraph
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    block_size : int (optional)
+        the number of bytes that are read from log.bin at once
 
+    Yields
+    ------
+    log_bin : bytes
+        a part of log.bin consisting of complete records
+    index : np.array (n_records,)
+        the record index of this part of log.bin
     """
-    if use_pygt3x:
-        with FileReader(file) as reader:
-            values = reader.to_pandas()
-    
-        time = pd.to_datetime(values.index, unit="s").values
-        values = values[["Y", "X", "Z"]].values
 
-        meta = read_metadata(file)
-    else:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            # unzip .gt3x file and get the file location of the binary log.bin (which contains the raw data) and the info.txt which contains the meta-data
-            log_bin, info_txt = _unzip_gt3x_file(file=file, save_location=tmpdirname)
+    # a record can not be longer than its header, the largest payload and the checksum
+    max_record_size = HEADER_SIZE + 0xFFFF + 1
 
-            # get meta data from info.txt file
-            meta = _extract_info(info_txt)
-            meta = _format_meta_data(meta)
+    info = archive.getinfo('log.bin')
 
-            # extract acceleration data from the log file
-            values, time_data = _extract_log(log_bin, meta['Acceleration_Scale'], meta['Sample_Rate'], use_scaling=rescale)
+    with archive.open(info) as member:
 
-            # create time array
-            time = _create_time_array(time_data, hz=meta['Sample_Rate'])
+        remainder = b''
+        num_bytes = 0
+        while True:
+            block = member.read(block_size)
 
-    # Add additional keys to meta (Note: they are important to later reconstruct the time vector)
-    meta["Number_Of_Samples"] = values.shape[0]
-    meta["Start_Time"] = time[0].astype(int)
+            # incomplete records from the previous block are continued in this block
+            log_bin = remainder + block if remainder else block
+            index, end_of_records = _index_records(log_bin)
 
-    if pandas:
-        data = pd.DataFrame(values, columns=["Y", "X", "Z"], index=time)
-        data = data[["X", "Y", "Z"]]
-        if metadata:
-            return data, meta['Sample_Rate'], meta
-        else:
-            return data, meta['Sample_Rate']
-    else:
-        return time, values, meta
+            if index.size > 0:
+                yield log_bin, index
 
+            num_bytes += end_of_records
+            remainder = log_bin[end_of_records:]
 
-def read_metadata(file):
+            # the records continue in the next block unless the remainder is damaged, as it is longer than any record or the file ends
+            if remainder and (not block or len(remainder) > max_record_size):
+                # a record that starts close to the end of the remainder may still be completed by the next block
+                stop = len(remainder) if not block else len(remainder) - max_record_size
+                first = _find_valid_record(np.frombuffer(remainder, dtype=np.uint8), 1, stop)
+                skipped = first if first is not None else stop
+
+                logging.warning('Skipped %s damaged bytes of log.bin at byte %s', skipped, num_bytes)
+                num_bytes += skipped
+                remainder = remainder[skipped:]
+
+            if not block and not remainder:
+                break
+
+
+def _unpack_activity(payloads, sample_rate):
     """
-    Reads the metadata from a .gt3x file.
+    Unpack the 12-bit two's complement acceleration values of ACTIVITY records
+
+    All payloads are handled as one uint8 buffer. Every three bytes hold two 12-bit
+    values, so the first value are the upper 12 bits of the first two bytes and the
+    second value are the lower 12 bits of the last two bytes. The values are moved
+    into the upper bits of an unsigned 16-bit integer which is then reinterpreted as
+    a signed integer and shifted back, which takes care of the two's complement.
 
     Parameters
     ----------
-    file : string
-        file location of the .gt3x file
-    
+    payloads : np.array (n_records, payload_size)
+        uint8 array containing the raw bytes of the activity payloads
+    sample_rate : int
+        sample rate, i.e. the number of samples per axis in a single payload
+
     Returns
     -------
-    meta : dict
-        a dict containing all meta data produced by ActiGraph
-
+    log_data : np.array (n_records * sample_rate, num axes)
+        int16 array with the raw acceleration values in YXZ order
     """
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        # unzip .gt3x file and get the file location of the binary log.bin (which contains the raw data) and the info.txt which contains the meta-data
-        info_txt = _unzip_gt3x_file(file=file, save_location=tmpdirname, metadata_only=True)
 
-        # get meta data from info.txt file
-        meta = _extract_info(info_txt)
+    # number of axes, the GTX3 is tri-axial, so we hard code it here.
+    NUM_AXES = 3
+    # number of 12-bit values within one payload
+    num_values = sample_rate * NUM_AXES
+
+    payloads = np.asarray(payloads, dtype=np.uint8)
+    num_records, payload_size = payloads.shape
+
+    # an odd number of values per payload leaves half a byte at the end, pad the payload so it can be split into groups of three bytes
+    if payload_size % 3 != 0:
+        payloads = np.pad(payloads, ((0, 0), (0, 3 - payload_size % 3)))
+
+    # group the bytes in triplets which contain two 12-bit values each
+    triplets = payloads.reshape(num_records, -1, 3).astype(np.uint16)
+
+    log_data = np.empty((num_records, 2 * triplets.shape[1]), dtype=np.int16)
+    log_data[:, 0::2] = ((triplets[..., 0] << 8) | triplets[..., 1]).view(np.int16) >> 4
+    log_data[:, 1::2] = ((triplets[..., 1] << 12) | (triplets[..., 2] << 4)).view(np.int16) >> 4
+
+    return log_data[:, :num_values].reshape(-1, NUM_AXES)
 
-    meta = _format_meta_data(meta)
 
-    return meta
\ No newline at end of file
+def _read_activity(log_bin, index, sample_rate):
+    """
+    Read all ACTIVITY and ACTIVITY2 records listed in the record index
+
+    ACTIVITY records contain the samples packed into 12-bit values in YXZ order,
+    while ACTIVITY2 records of newer firmware contain little-endian 16-bit values
+    in XYZ order. Both are returned in YXZ order.
+
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
+    index : np.array (n_records,)
+        the record index as created by _build_record_index
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+
+    Returns
+    -------
+    log_data : np.array (time steps * sample_rate, num axes)
+        int16 array with the raw acceleration values in YXZ order
+    time_data : np.array (time steps, 1)
+        the timestamps of the records
+    """
+
+    payload_size, payload2_size = _payload_sizes(sample_rate)
+    activity = _activity_records(index, sample_rate)
+    packed = activity['type'] == ACTIVITY
+
+    if activity.size == 0:
+        return np.empty((0, 3), dtype=np.int16), activity['timestamp'].reshape(-1, 1)
+
+    data = np.frombuffer(log_bin, dtype=np.uint8)
+
+    # select the payloads as rows of a sliding window over the buffer, this copies only the payload bytes
+    if packed.all():
+        payloads = sliding_window_view(data, payload_size)[activity['offset'] + HEADER_SIZE]
+        log_data = _unpack_activity(payloads, sample_rate)
+    else:
+        log_data = np.empty((activity.size, sample_rate, 3), dtype=np.int16)
+
+        if packed.any():
+            payloads = sliding_window_view(data, payload_size)[activity['offset'][packed] + HEADER_SIZE]
+            log_data[packed] = _unpack_activity(payloads, sample_rate).reshape(-1, sample_rate, 3)
+
+        # the ACTIVITY2 payloads are reinterpreted as int16 without decoding, only the axes are reordered
+        payloads = sliding_window_view(data, payload2_size)[activity['offset'][~packed] + HEADER_SIZE]
+        log_data[~packed] = payloads.view('<i2').reshape(-1, sample_rate, 3)[..., [1, 0, 2]]
+
+        log_data = log_data.reshape(-1, 3)
+
+    time_data = activity['timestamp'].reshape(-1, 1)
+
+    return log_data, time_data
+
+
+def _payload_sizes(sample_rate):
+    """
+    Calculate the payload sizes of ACTIVITY and ACTIVITY2 records in bytes
+
+    Parameters
+    ----------
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+
+    Returns
+    -------
+    payload_size : int
+        size of one ACTIVITY payload, every sample contains 3 axes of 12 bit
+    payload2_size : int
+        size of one ACTIVITY2 payload, every sample contains 3 axes of 16 bit
+    """
+    return -(-sample_rate * 3 * 12 // 8), sample_rate * 3 * 2
+
+
+def _activity_records(index, sample_rate):
+    """
+    Select the ACTIVITY and ACTIVITY2 records that contain samples
+
+    Parameters
+    ----------
+    index : np.array (n_records,)
+        the record index as created by _build_record_index
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+
+    Returns
+    -------
+    activity : np.array (n_activity_records,)
+        the record index of the activity records
+    """
+    payload_size, payload2_size = _payload_sizes(sample_rate)
+
+    # an activity record with a different payload size is written when the device is connected to USB, it does not contain samples
+    return index[((index['type'] == ACTIVITY) & (index['size'] == payload_size))
+                 | ((index['type'] == ACTIVITY2) & (index['size'] == payload2_size))]
+
+
+def _read_activity_parallel(source, index, sample_rate, num_jobs):
+    """
+    Read all ACTIVITY and ACTIVITY2 records listed in the record index with a pool of processes
+
+    The activity records are split into contiguous ranges which are decoded by the
+    worker processes. Every range has a precomputed position within one output array
+    in shared memory, so the workers write their samples straight into the output and
+    no decoded data has to be pickled. The output is identical to _read_activity.
+
+    Parameters
+    ----------
+    source : tuple
+        the location of log.bin as given by _share_log_bin
+    index : np.array (n_records,)
+        the record index as created by _build_record_index
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+    num_jobs : int
+        the number of worker processes
+
+    Returns
+    -------
+    log_data : np.array (time steps * sample_rate, num axes)
+        int16 array with the raw acceleration values in YXZ order
+    time_data : np.array (time steps, 1)
+        the timestamps of the records
+    """
+    activity = _activity_records(index, sample_rate)
+    shape = (activity.size * sample_rate, 3)
+
+    # a few ranges per worker even out differences in the decoding speed of the ranges
+    bounds = np.linspace(0, activity.size, min(4 * num_jobs, activity.size) + 1).astype(np.int64)
+
+    output = SharedMemory(create=True, size=max(activity.size * sample_rate * 3 * 2, 1))
+    try:
+        with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+            futures = [executor.submit(_decode_activity_range, source, activity[first:last], sample_rate,
+                                       output.name, shape, first * sample_rate)
+                       for first, last in zip(bounds[:-1], bounds[1:])]
+            for future in futures:
+                future.result()
+
+        # copy the samples out of the shared memory, so the block can be released right away
+        log_data = np.ndarray(shape, dtype=np.int16, buffer=output.buf).copy()
+    finally:
+        output.close()
+        output.unlink()
+
+    time_data = activity['timestamp'].reshape(-1, 1)
+
+    return log_data, time_data
+
+
+def _decode_activity_range(source, activity, sample_rate, output_name, shape, first_sample, block_size=2 ** 16):
+    """
+    Decode a range of activity records into the shared output array of _read_activity_parallel
+
+    Parameters
+    ----------
+    source : tuple
+        the location of log.bin as given by _share_log_bin
+    activity : np.array (n_records,)
+        the record index of the activity records of this range
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+    output_name : str
+        the name of the shared memory block of the output array
+    shape : tuple
+        the shape of the output array
+    first_sample : int
+        the position of the first sample of this range within the output array
+    block_size : int (optional)
+        the number of records that are decoded at once, which bounds the temporary memory
+    """
+    output = SharedMemory(name=output_name)
+    try:
+        log_data = np.ndarray(shape, dtype=np.int16, buffer=output.buf)
+
+        with _attach_log_bin(source) as log_bin:
+            for first in range(0, activity.size, block_size):
+                block, _ = _read_activity(log_bin, activity[first:first + block_size], sample_rate)
+                position = first_sample + first * sample_rate
+                log_data[position:position + block.shape[0]] = block
+                del block
+
+        del log_data
+    finally:
+        output.close()
+
+
+def _read_records(log_bin, index):
+    """
+    Read the battery, event and parameter records listed in the record index
+
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
+    index : np.array (n_records,)
+        the record index as created by _build_record_index
+
+    Returns
+    -------
+    records : dict
+        a dict with the structured arrays 'battery' (voltage in mV), 'events' (event
+        codes, e.g. IDLE_SLEEP_MODE_STARTED) and 'parameters' (one entry per device
+        parameter with its address space, identifier and raw 32-bit value)
+    """
+    data = np.frombuffer(log_bin, dtype=np.uint8)
+
+    battery = index[(index['type'] == BATTERY) & (index['size'] >= 2)]
+    events = index[(index['type'] == EVENT) & (index['size'] >= 1)]
+    parameters = index[(index['type'] == PARAMETERS) & (index['size'] >= 8)]
+
+    records = {'battery': np.empty(battery.size, dtype=BATTERY_DTYPE),
+               'events': np.empty(events.size, dtype=EVENT_DTYPE)}
+
+    records['battery']['timestamp'] = battery['timestamp']
+    records['battery']['voltage'] = _read_uint(data, battery['offset'] + HEADER_SIZE, '<u2')
+
+    records['events']['timestamp'] = events['timestamp']
+    records['events']['event'] = data[events['offset'] + HEADER_SIZE]
+
+    # a parameter record contains a list of 8 byte entries: address space, identifier and value
+    num_entries = parameters['size'].astype(np.int64) // 8
+    first_entries = np.repeat(np.cumsum(num_entries) - num_entries, num_entries)
+    entry_offsets = (np.repeat(parameters['offset'] + HEADER_SIZE, num_entries)
+                     + 8 * (np.arange(first_entries.size) - first_entries))
+
+    records['parameters'] = np.empty(entry_offsets.size, dtype=PARAMETER_DTYPE)
+    records['parameters']['timestamp'] = np.repeat(parameters['timestamp'], num_entries)
+    records['parameters']['address'] = _read_uint(data, entry_offsets, '<u2')
+    records['parameters']['identifier'] = _read_uint(data, entry_offsets + 2, '<u2')
+    records['parameters']['value'] = _read_uint(data, entry_offsets + 4, '<u4')
+
+    return records
+
+
+def _find_corrupted_records(log_bin, index, positions=None):
+    """
+    Verify the checksums of the records listed in the record index
+
+    The checksum of a record is the 1's complement of the XOR of its header and
+    payload, so the XOR of all bytes of a valid record including the checksum is
+    0xFF. The XOR of every record is calculated at once with np.bitwise_xor.reduceat
+    over the byte ranges of the records.
+
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
+    index : np.array (n_records,)
+        the record index as created by _build_record_index
+    positions : np.array (n_records,) (optional)
+        the positions of the indexed records in log.bin, defaults to the positions in index
+
+    Returns
+    -------
+    corrupted : np.array
+        structured numpy array with the fields timestamp, record and type of every
+        record with a checksum that does not match
+    """
+    if positions is None:
+        positions = np.arange(index.size)
+
+    corrupted = np.empty(0, dtype=np.int64)
+
+    if index.size > 0:
+        data = np.frombuffer(log_bin, dtype=np.uint8)
+        checksums = _xor_records(data, index['offset'], index['offset'] + HEADER_SIZE + index['size'] + 1)
+
+        corrupted = np.flatnonzero(checksums != 0xFF)
+
+    records = np.empty(corrupted.size, dtype=CORRUPTED_RECORD_DTYPE)
+    records['timestamp'] = index['timestamp'][corrupted]
+    records['record'] = positions[corrupted]
+    records['type'] = index['type'][corrupted]
+
+    return records
+
+
+def _xor_records(data, offsets, ends):
+    """
+    Calculate the XOR of all bytes of every record, which is 0xFF for a record with a valid checksum
+
+    Parameters
+    ----------
+    data : np.array (n_bytes,)
+        the content of the log.bin file as uint8 array
+    offsets : np.array (n_records,)
+        the increasing offsets of the records
+    ends : np.array (n_records,)
+        the offset of the byte after each record
+
+    Returns
+    -------
+    checksums : np.array (n_records,)
+        the XOR of the bytes of every record
+    """
+    if offsets.size == 0:
+        return np.empty(0, dtype=np.uint8)
+
+    # the XOR is reduced over [start, end) of every record and over the bytes between records which are ignored
+    boundaries = np.stack((offsets, ends), axis=1).ravel()[:-1]
+    return np.bitwise_xor.reduceat(data[:ends[-1]], boundaries)[::2]
+
+
+def _select_records(records, start=None, end=None):
+    """
+    Select the battery, event and parameter records within [start, end)
+
+    Parameters
+    ----------
+    records : dict
+        the records as returned by _read_records
+    start : int (optional)
+        unix timestamp in seconds of the first record
+    end : int (optional)
+        unix timestamp in seconds until which records are selected (exclusive)
+
+    Returns
+    -------
+    records : dict
+        the selected records
+    """
+    selection = {}
+    for name, entries in records.items():
+        mask = np.ones(entries.size, dtype=bool)
+        if start is not None:
+            mask &= entries['timestamp'] >= start
+        if end is not None:
+            mask &= entries['timestamp'] < end
+        selection[name] = entries[mask]
+
+    return selection
+
+
+def _extract_log(log_bin, acceleration_scale, sample_rate, use_scaling=False, start=None, end=None, verify_checksums=False,
+                 num_jobs=1, source=None):
+    """
+    Extract acceleration data from the log.bin file within the raw .gt3x file
+    One second of raw activity samples packed into 12-bit values in YXZ order.
+
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
+    acceleration_scale : float
+        Scale the resultant by the scale factor (this gives us an acceleration value in g's).
+        Device serial numbers starting with NEO and CLE use a scale factor of 341 LSB/g (±6g).
+        MOS devices use a 256 LSB/g scale factor (±8g). If a LOG_PARAMETER record is preset,
+        then the ACCEL_SCALE value should be used.
+    sample_rate : int
+        sample rate, i.e. the number of Hz (how many values we obtain per second)
+        This value can also be inferred from the payload size when you know how many axis data you have.
+        So payload size of 450 bytes = 300 (12 bit sized ints). And when we have 3 axis, we have 300/3 = 100 values per 3-axis per second
+    use_scaling: Boolean (optional)
+        acceleration data is originally stored as a signed integer. To obtain the acceleration value we need to scale it with the acceleration_scale
+        this will give us the decimal numbers. However, this would also increase memory size of the array in which we store the values. We might not want to
+        scale if we only want to store the data in a smaller memory size format. Scaling can then be done at a later stage, for instance, when we want to pre-process the data
+    start : int (optional)
+        unix timestamp in seconds, only records with a timestamp at or after start are decoded
+    end : int (optional)
+        unix timestamp in seconds, only records with a timestamp before end are decoded
+    verify_checksums : boolean (optional)
+        boolean indicating whether the checksums of the decoded records should be verified
+    num_jobs : int (optional)
+        the number of processes decoding the activity records, see _read_activity_parallel
+    source : tuple (optional)
+        the location of log.bin for the worker processes as given by _share_log_bin,
+        required if num_jobs is larger than one
+
+    Returns
+    -------
+    log_data : numpy array (time steps * sample_rate, num axes)
+        log data contains the raw acceleration values in YXZ order
+    log_time : numpy array (time steps, 1)
+        log time contains the timestamps of measurements
+    records : dict
+        the battery, event and parameter records, see _read_records, and the damaged spans
+        of log.bin that were skipped as 'damaged', see _index_damaged_log_bin. If
+        verify_checksums is true, the records with a wrong checksum are added as
+        'corrupted', see _find_corrupted_records.
+    """
+
+    index, damaged = _index_damaged_log_bin(log_bin)
+
+    # select the records within the requested time range before decoding any payload
+    selected = np.ones(index.size, dtype=bool)
+    if start is not None:
+        selected &= index['timestamp'] >= start
+    if end is not None:
+        selected &= index['timestamp'] < end
+    positions = np.flatnonzero(selected)
+    index = index[positions]
+
+    if num_jobs > 1:
+        log_data, time_data = _read_activity_parallel(source, index, sample_rate, num_jobs)
+    else:
+        log_data, time_data = _read_activity(log_bin, index, sample_rate)
+    records = _read_records(log_bin, index)
+    records['damaged'] = _select_records({'damaged': damaged}, start, end)['damaged']
+
+    if verify_checksums:
+        records['corrupted'] = _find_corrupted_records(log_bin, index, positions)
+
+    logging.info('Finished processing activity data')
+
+    # raw data values are stored in ints, to obtain values in G, we need to scale them by a factor found in the acceleration_scale parameter within the info.txt file. For example, 256.0
+    # no scaling allows for a smaller numpy array because we can keep the int16 datatype
+    if use_scaling:
+        log_data = log_data * (1. / acceleration_scale)
+
+    # return acceleration data + time data + side records
+    return log_data, time_data, records
+
+
+def _count_payload_size(log_bin, count_payload=0):
+    """
+    Count the payload size of the log.bin file. The size of the payload is necessary to know how large
+    the numpy array needs to be that will be populated while reading the log.bin file.
+
+    Parameters
+    ----------
+    log_bin : buffer
+        the content of the log.bin file, e.g. as bytes or a memory map
+    count_payload : int (optional)
+        the payload type that we want to count. default is 0, which is the acceleration data.
+
+    Returns
+    -------
+    SIZE : int
+        the size (as in count) of the payload
+    """
+
+    SIZE = int(np.count_nonzero(_build_record_index(log_bin)['type'] == count_payload))
+
+    logging.info('Counted payload size: %s', SIZE)
+
+    return SIZE
+
+
+class TimeIndex:
+    """
+    Implicit time index of acceleration data recorded at a fixed sampling frequency
+
+    Instead of storing a timestamp for every sample, the index stores the origin, the
+    sample rate and the number of samples of each contiguous run of data. The timestamp
+    of the n-th sample of a run is calculated as origin + floor(n * 10^9 / sample_rate)
+    nanoseconds, which is exact for every sampling frequency. Timestamps are only
+    materialized when they are requested, e.g. by to_numpy() or to_pandas().
+
+    Parameters
+    ----------
+    start : int, str or np.datetime64
+        the time of the first sample. Integers are interpreted as milliseconds since
+        epoch like the Start_Time in the meta data returned by read_gt3x.
+    sample_rate : int
+        the sampling frequency in Hz
+    n_samples : int
+        the number of samples
+    """
+
+    __slots__ = ('sample_rate', '_origins', '_phases', '_offsets')
+
+    def __init__(self, start, sample_rate, n_samples):
+        if isinstance(start, (int, np.integer)):
+            start = np.datetime64(int(start), 'ms')
+
+        self.sample_rate = int(sample_rate)
+        self._origins = np.array([_to_datetime64(start).astype(np.int64)], dtype=np.int64)
+        self._phases = np.zeros(1, dtype=np.int64)
+        self._offsets = np.array([0, n_samples], dtype=np.int64)
+
+    @classmethod
+    def _from_runs(cls, sample_rate, origins, phases, counts):
+        """
+        Creates a time index from its runs
+
+        Parameters
+        ----------
+        sample_rate : int
+            the sampling frequency in Hz
+        origins : np.array (n_runs,)
+            nanoseconds since epoch of the sample the phase of a run is counted from
+        phases : np.array (n_runs,)
+            the number of samples between the origin and the first sample of a run
+        counts : np.array (n_runs,)
+            the number of samples of each run
+
+        Returns
+        -------
+        time_index : TimeIndex
+            the time index
+        """
+        time_index = cls.__new__(cls)
+        time_index.sample_rate = int(sample_rate)
+        time_index._origins = np.asarray(origins, dtype=np.int64)
+        time_index._phases = np.asarray(phases, dtype=np.int64)
+        time_index._offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        return time_index
+
+    @classmethod
+    def from_record_times(cls, time_data, sample_rate):
+        """
+        Creates a time index from the timestamps of the records of a .gt3x file, where
+        each record contains one second of data. Consecutive records form a run.
+
+        Parameters
+        ----------
+        time_data : np.array (n_records, 1)
+            unix timestamps of the records in seconds
+        sample_rate : int
+            the sampling frequency in Hz
+
+        Returns
+        -------
+        time_index : TimeIndex
+            the time index
+        """
+        time_data = np.asarray(time_data, dtype=np.int64).ravel()
+
+        # a new run starts whenever a record does not follow its predecessor by exactly one second
+        first_records = np.flatnonzero(np.diff(time_data, prepend=time_data[:1] - 2) != 1)
+        counts = np.diff(np.append(first_records, time_data.size)) * sample_rate
+
+        return cls._from_runs(sample_rate, time_data[first_records] * 10 ** 9, np.zeros(first_records.size), counts)
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def __repr__(self):
+        if len(self) == 0:
+            return f"TimeIndex(n_samples=0, sample_rate={self.sample_rate})"
+        return f"TimeIndex(start={self.start}, n_samples={len(self)}, sample_rate={self.sample_rate}, n_runs={self.n_runs})"
+
+    @property
+    def n_samples(self):
+        """The number of samples"""
+        return len(self)
+
+    @property
+    def n_runs(self):
+        """The number of contiguous runs of data"""
+        return int(np.count_nonzero(np.diff(self._offsets)))
+
+    @property
+    def start(self):
+        """The timestamp of the first sample"""
+        return self[0]
+
+    @property
+    def end(self):
+        """The timestamp of the last sample"""
+        return self[-1]
+
+    def _timestamps(self, positions):
+        """
+        Calculates the timestamps of the samples at the given positions
+
+        Parameters
+        ----------
+        positions : np.array
+            positions of the samples
+
+        Returns
+        -------
+        timestamps : np.array
+            nanoseconds since epoch of the samples
+        """
+        runs = np.searchsorted(self._offsets, positions, side='right') - 1
+        steps = positions - self._offsets[runs] + self._phases[runs]
+
+        return self._origins[runs] + (steps * 10 ** 9) // self.sample_rate
+
+    def _runs(self):
+        """
+        Returns the runs of the time index, see _from_runs
+
+        Returns
+        -------
+        runs : np.array (n_runs, 3)
+            the origin, phase and number of samples of every run
+        """
+        return np.stack((self._origins, self._phases, np.diff(self._offsets)), axis=1)
+
+    def _grid_positions(self):
+        """
+        Calculates the position of the first sample of every run on a uniform grid starting at the first sample
+
+        Returns
+        -------
+        positions : np.array (n_runs,)
+            the number of sampling intervals between the first sample and the first sample of each run
+        """
+        # rounded to the closest grid point, the origins of runs read from .gt3x files are full seconds
+        delta = (self._origins - self._origins[0]) * self.sample_rate
+        return (delta + 5 * 10 ** 8) // 10 ** 9 + self._phases - self._phases[0]
+
+    def segments(self):
+        """
+        Finds the contiguous segments of samples, i.e. the data between two gaps
+
+        A gap is any discontinuity of the timestamps, e.g. while the device was in
+        idle sleep mode or after a reset of its clock. The segments are derived from
+        the runs of the index, so finding them costs no memory for the gaps.
+
+        Returns
+        -------
+        segments : np.array (n_segments,)
+            structured numpy array with the fields start (timestamp of the first sample),
+            sample_rate, first (position of the first sample) and stop (position after
+            the last sample) of every segment
+        """
+        counts = np.diff(self._offsets)
+        runs = np.flatnonzero(counts)
+
+        # a run continues a segment if it starts exactly where the previous run ended
+        positions = self._grid_positions()[runs]
+        continues = np.diff(positions) == counts[runs[:-1]]
+        first_runs = runs[np.concatenate(([True], ~continues))] if runs.size > 0 else runs
+        stops = np.append(self._offsets[first_runs[1:]], len(self))
+
+        segments = np.empty(first_runs.size, dtype=SEGMENT_DTYPE)
+        segments['first'] = self._offsets[first_runs]
+        segments['stop'] = stops
+        segments['sample_rate'] = self.sample_rate
+        segments['start'] = self._timestamps(segments['first']).astype('datetime64[ns]')
+
+        return segments
+
+    def _take(self, starts, stops):
+        """
+        Creates a time index from ranges of samples. The ranges must not extend over more than one run.
+
+        Parameters
+        ----------
+        starts : np.array
+            the first position of each range
+        stops : np.array
+            the position after the last sample of each range
+
+        Returns
+        -------
+        time_index : TimeIndex
+            the time index of the samples in the ranges
+        """
+        runs = np.searchsorted(self._offsets, starts, side='right') - 1
+        phases = self._phases[runs] + starts - self._offsets[runs]
+
+        return TimeIndex._from_runs(self.sample_rate, self._origins[runs], phases, stops - starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if not -len(self) <= key < len(self):
+                raise IndexError(f"index {key} is out of bounds for TimeIndex with {len(self)} samples")
+            return np.datetime64(int(self._timestamps(np.array([key % len(self)]))[0]), 'ns')
+
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            starts = np.maximum(self._offsets[:-1], start)
+            stops = np.minimum(self._offsets[1:], max(start, stop))
+            keep = stops > starts
+            return self._take(starts[keep], stops[keep])
+
+        positions = np.arange(len(self))[key]
+        return self._timestamps(positions).astype('datetime64[ns]')
+
+    def __array__(self, dtype=None, copy=None):
+        time = self.to_numpy()
+        return time if dtype is None else time.astype(dtype)
+
+    def to_numpy(self):
+        """
+        Materializes the timestamps of all samples
+
+        Returns
+        -------
+        time : np.array (n_samples,)
+            a numpy array of np.datetime64 at nanosecond precision
+        """
+        time = np.empty(len(self), dtype=np.int64)
+        block_size = 2 ** 20
+
+        if len(self._origins) > 1000:
+            # many short runs, look up the run of every sample block by block
+            for block_start in range(0, len(self), block_size):
+                positions = np.arange(block_start, min(block_start + block_size, len(self)))
+                time[block_start:block_start + block_size] = self._timestamps(positions)
+        else:
+            # few long runs, fill each run block by block to keep the temporary arrays small
+            for origin, phase, run_start, run_stop in zip(self._origins, self._phases, self._offsets[:-1], self._offsets[1:]):
+                for block_start in range(run_start, run_stop, block_size):
+                    block_stop = min(block_start + block_size, run_stop)
+                    steps = np.arange(block_start - run_start + phase, block_stop - run_start + phase)
+                    steps *= 10 ** 9
+                    steps //= self.sample_rate
+                    steps += origin
+                    time[block_start:block_stop] = steps
+
+        return time.view('datetime64[ns]')
+
+    def to_pandas(self):
+        """
+        Materializes the timestamps of all samples as a pandas DatetimeIndex
+
+        Returns
+        -------
+        time : pd.DatetimeIndex
+            the timestamps of all samples
+        """
+        return pd.DatetimeIndex(self.to_numpy())
+
+    def locate(self, start=None, end=None):
+        """
+        Finds the samples within [start, end) without materializing the timestamps
+
+        Parameters
+        ----------
+        start : str, datetime or np.datetime64 (optional)
+            the first point in time
+        end : str, datetime or np.datetime64 (optional)
+            the end of the time range (exclusive)
+
+        Returns
+        -------
+        ranges : np.array (n_ranges, 2)
+            the first position and the position after the last sample of every
+            contiguous range of samples within [start, end)
+        """
+        counts = np.diff(self._offsets)
+        # every run ends before this many nanoseconds after its origin
+        limits = -((-(self._phases + counts) * 10 ** 9) // self.sample_rate)
+
+        def first_position(timestamp, default):
+            if timestamp is None:
+                return default
+            delta = np.clip(_to_datetime64(timestamp).astype(np.int64) - self._origins, 0, limits)
+            # the first step n with floor(n * 10^9 / sample_rate) >= delta
+            steps = -((-delta * self.sample_rate) // 10 ** 9)
+            return np.clip(steps - self._phases, 0, counts)
+
+        starts = self._offsets[:-1] + first_position(start, 0)
+        stops = self._offsets[:-1] + first_position(end, counts)
+        keep = stops > starts
+
+        return np.stack((starts[keep], stops[keep]), axis=1)
+
+
+def fill_gaps(time, values, method="last"):
+    """
+    Fills the gaps between the segments of a recording to obtain a uniform time grid
+
+    Parameters
+    ----------
+    time : TimeIndex
+        the time index of the values
+    values : np.array (n_samples x n_axes)
+        the values, e.g. the acceleration values returned by read_gt3x
+    method : str (optional)
+        'last' repeats the last value before a gap like ActiGraph does for the idle
+        sleep mode, 'zeros' fills the gaps with zeros
+
+    Returns
+    -------
+    time : TimeIndex
+        the time index of the filled values with a single run
+    values : np.array (n_filled_samples x n_axes)
+        the values with the gaps filled
+    """
+    if method not in FILL_METHODS:
+        raise ValueError(f"Unknown fill method {method}, expected one of {FILL_METHODS}")
+
+    if len(time) == 0:
+        return time, values
+
+    counts = np.diff(time._offsets)
+    runs = np.flatnonzero(counts)
+    positions = time._grid_positions()[runs]
+
+    if np.any(np.diff(positions) < counts[runs[:-1]]):
+        raise ValueError("The segments overlap, e.g. after a reset of the clock of the device, so the gaps can not be filled")
+
+    n_samples = int(positions[-1] + counts[runs[-1]])
+
+    # the position of every sample on the uniform grid
+    targets = np.repeat(positions - time._offsets[runs], counts[runs]) + np.arange(len(time))
+
+    if method == "zeros":
+        filled = np.zeros((n_samples,) + values.shape[1:], dtype=values.dtype)
+        filled[targets] = values
+    else:
+        # every grid position takes the last sample at or before it
+        sources = np.full(n_samples, -1, dtype=np.int64)
+        sources[targets] = np.arange(len(time))
+        np.maximum.accumulate(sources, out=sources)
+        filled = values[sources]
+
+    return TimeIndex._from_runs(time.sample_rate, time._origins[runs[:1]], time._phases[runs[:1]], [n_samples]), filled
+
+
+class Recording:
+    """
+    Compact in-memory representation of a recording of an accelerometer
+
+    The acceleration is kept as the raw int16 counts of the device together with the
+    acceleration scale, so a recording takes 6 bytes per sample, e.g. about 350 MB
+    for 7 days at 100 Hz. The timestamps are represented by a TimeIndex. Acceleration
+    values in g are only calculated when they are requested, e.g. by to_numpy(),
+    recording['X'] or to_pandas(). Slicing by positions or by time returns views on
+    the counts without copying them.
+
+    Parameters
+    ----------
+    counts : np.array (n_samples x 3)
+        int16 array with the raw acceleration values in YXZ order
+    acceleration_scale : float
+        the number of counts per g
+    time : TimeIndex
+        the time index of the samples
+    meta : dict (optional)
+        the meta data of the recording, e.g. as returned by read_gt3x
+    """
+
+    __slots__ = ('counts', 'acceleration_scale', 'time', 'meta')
+
+    # the order of the axes in counts
+    columns = ("Y", "X", "Z")
+
+    def __init__(self, counts, acceleration_scale, time, meta=None):
+        if counts.ndim != 2 or counts.shape[1] != len(self.columns):
+            raise ValueError(f"counts has to be an array of shape (n_samples, 3), got {counts.shape}")
+
+        if len(time) != len(counts):
+            raise ValueError(f"The time index has {len(time)} samples, but there are {len(counts)} counts")
+
+        self.counts = counts
+        self.acceleration_scale = float(acceleration_scale)
+        self.time = time
+        self.meta = {} if meta is None else meta
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __repr__(self):
+        return (f"Recording(start={self.start if len(self) > 0 else None}, n_samples={len(self)}, "
+                f"sample_rate={self.sample_rate}, n_segments={len(self.segments)})")
+
+    @property
+    def sample_rate(self):
+        """The sampling frequency in Hz"""
+        return self.time.sample_rate
+
+    @property
+    def start(self):
+        """The timestamp of the first sample"""
+        return self.time.start
+
+    @property
+    def end(self):
+        """The timestamp of the last sample"""
+        return self.time.end
+
+    @property
+    def segments(self):
+        """The contiguous segments of samples between gaps, see TimeIndex.segments"""
+        return self.time.segments()
+
+    @property
+    def nbytes(self):
+        """The number of bytes of the counts"""
+        return self.counts.nbytes
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.to_numpy(columns=(key,))[:, 0]
+
+        if isinstance(key, slice) and key.step in (None, 1):
+            if all(value is None or isinstance(value, (int, np.integer)) for value in (key.start, key.stop)):
+                return Recording(self.counts[key], self.acceleration_scale, self.time[key], self.meta)
+            return self.select(key.start, key.stop)
+
+        raise TypeError(f"Recording indices must be axes, slices of positions or slices of time, not {key!r}")
+
+    def select(self, start=None, end=None):
+        """
+        Selects the samples within [start, end)
+
+        Parameters
+        ----------
+        start : str, datetime or np.datetime64 (optional)
+            the first point in time that should be selected
+        end : str, datetime or np.datetime64 (optional)
+            the point in time until which the data should be selected (exclusive)
+
+        Returns
+        -------
+        recording : Recording
+            the recording within [start, end). The counts are a view if the
+            samples within [start, end) are contiguous.
+        """
+        time, counts = _select_time_range(self.time, self.counts, start, end)
+        return Recording(counts, self.acceleration_scale, time, self.meta)
+
+    def fill_gaps(self, method="last"):
+        """
+        Fills the gaps between the segments of the recording, see fill_gaps
+
+        Parameters
+        ----------
+        method : str (optional)
+            'last' repeats the last value before a gap, 'zeros' fills the gaps with zeros
+
+        Returns
+        -------
+        recording : Recording
+            the recording on a uniform time grid
+        """
+        time, counts = fill_gaps(self.time, self.counts, method=method)
+        return Recording(counts, self.acceleration_scale, time, self.meta)
+
+    def to_numpy(self, columns=("Y", "X", "Z"), dtype=np.float32):
+        """
+        Calculates the acceleration values in g
+
+        Parameters
+        ----------
+        columns : list of strings (optional)
+            the axes that should be returned
+        dtype : np.dtype (optional)
+            the floating point type of the acceleration values
+
+        Returns
+        -------
+        values : np.array (n_samples x len(columns))
+            the acceleration values in g
+        """
+        axes = [self.columns.index(column) for column in columns]
+        counts = self.counts if axes == [0, 1, 2] else self.counts[:, axes]
+
+        values = counts.astype(dtype)
+        values *= values.dtype.type(1. / self.acceleration_scale)
+        return values
+
+    def to_pandas(self, dtype=np.float64):
+        """
+        Creates a DataFrame with the acceleration values in g like it is returned by read_gt3x
+
+        Parameters
+        ----------
+        dtype : np.dtype (optional)
+            the floating point type of the acceleration values
+
+        Returns
+        -------
+        data : DataFrame
+            a DataFrame containg the acceleration data with the columns X, Y and Z
+        """
+        values = self.counts * np.dtype(dtype).type(1. / self.acceleration_scale)
+        return _format_output(self.time, values, dict(self.meta), pandas=True)[0]
+
+
+def _acceleration_values(data, columns=("X", "Y", "Z")):
+    """
+    Returns the acceleration values of a Recording or a DataFrame
+
+    Parameters
+    ----------
+    data : Recording or DataFrame
+        the acceleration data
+    columns : list of strings (optional)
+        the axes that should be returned
+
+    Returns
+    -------
+    values : np.array (n_samples x len(columns))
+        the acceleration values in g, float32 for a Recording
+    """
+    if isinstance(data, Recording):
+        return data.to_numpy(columns=columns)
+
+    return data[list(columns)].values
+
+
+def _create_time_array(time_data, hz=100):
+    """
+    Create a time array by adding the sub-second offsets of the sampling frequency.
+    The standard time array only accounts for full seconds. However, when the sampling
+    frequency is 100 hertz for instance, we need to add 10 milliseconds steps to the data
+
+    Parameters
+    ----------
+    time_data : np.array
+        numpy array containing unix timestamps (obtained by reading the raw .gt3x data)
+    hz : int (optional)
+        sampling frequency of the acceleration data (this is to know how many samples we need to add to the time series)
+
+    Returns
+    -------
+    time_data : np.array
+        numpy array of np.datetime64 at nanosecond precision with one timestamp per sample
+    """
+
+    return TimeIndex.from_record_times(time_data, hz).to_numpy()
+
+
+def _format_time(tstamp):
+    dt = np.datetime64('0001-01-01T00:00:00') + np.timedelta64(int(tstamp) // 10000000, 's')
+    return str(dt)
+
+
+def _format_meta_data(meta):
+    """
+    Formats the meta data dict that is extracted from the gt3x file
+
+    Parameters
+    ----------
+    meta : dict
+        the meta data dict from the gt3x file
+
+    Returns
+    -------
+    new_meta : dict
+        an updated meta data dict having the fields of meta in the correct format
+    """
+    new_meta = {}
+
+    # standard meta data fields of ActiGraph and their conversion functions
+    fields_and_formats = {'Serial_Number': str,
+                          'Device_Type': str,
+                          'Firmware': str,
+                          'Battery_Voltage': str,
+                          'Sample_Rate': int,
+                          'Start_Date': _format_time,
+                          'Stop_Date': _format_time,
+                          'Last_Sample_Time': _format_time,
+                          'TimeZone': str,
+                          'Download_Date': _format_time,
+                          'Board_Revision': int,
+                          'Unexpected_Resets': int,
+                          'Acceleration_Scale': float,
+                          'Acceleration_Min': float,
+                          'Acceleration_Max': float,
+                          'Subject_Name': str}
+
+    for field, dtype in fields_and_formats.items():
+        try:
+            new_meta[field] = dtype(meta[field])
+        except KeyError as msg:
+            logging.info(msg)
+
+    return new_meta
+
+
+def _create_time_vector(start, n_samples, hz):
+    """
+    Creates a time vector starting at point start until start + n_samples/hz
+    with a sampling frequency of hz
+
+    Parameters
+    ----------
+    start : int or np.datetime64
+        start point of the time vector. Integers are interpreted as milliseconds since epoch.
+    n_samples : int
+        number of samples
+    hz : int
+        sampling frequency
+
+    Returns
+    -------
+    time_data : np.array
+        a numpy array of np.datetime64 at nanosecond precision
+    """
+
+    return TimeIndex(start, hz, n_samples).to_numpy()
+
+
+def register_backend(name, reader, record_types, firmware=(None, None), priority=0):
+    """
+    Registers a reader backend for read_gt3x
+
+    A backend is a function reader(archive, meta, start=None, end=None, records=False,
+    verify_checksums=False, num_jobs=1) that reads the opened .gt3x archive. It returns the raw
+    acceleration values as int16 array in YXZ order, their TimeIndex and the battery,
+    event and parameter records as returned by _read_records (or None if records and
+    verify_checksums are false). If verify_checksums is true, the records have to
+    contain the corrupted records as returned by _find_corrupted_records. Start and end
+    are unix timestamps in seconds of the records that have to be read at least. num_jobs
+    is the number of processes the backend may use to decode a single file.
+
+    Parameters
+    ----------
+    name : str
+        the name of the backend
+    reader : callable
+        the reader function of the backend
+    record_types : iterable of int
+        the activity record types the backend can decode, e.g. ACTIVITY and ACTIVITY2
+    firmware : tuple (optional)
+        the oldest and newest firmware version supported by the backend, e.g. ('1.5.0', None).
+        None means that there is no limit.
+    priority : int (optional)
+        the backend with the highest priority among the backends supporting a file is
+        used by read_gt3x(backend='auto'), so faster backends should have higher priorities
+
+    """
+    BACKENDS[name] = {'reader': reader,
+                      'record_types': frozenset(record_types),
+                      'firmware': tuple(firmware),
+                      'priority': priority}
+
+
+def _select_backend(archive, meta):
+    """
+    Selects the backend with the highest priority that supports the activity record
+    types and the firmware of a .gt3x file
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    meta : dict
+        the formatted meta data of the file
+
+    Returns
+    -------
+    name : str
+        the name of the backend
+    """
+    # files of the V1 format store the samples in activity.bin instead of log.bin, only pygt3x reads them
+    if 'log.bin' not in archive.namelist():
+        logging.debug('Reading the file of the V1 format with the pygt3x backend')
+        return 'pygt3x'
+
+    record_types = _inspect_record_types(archive)
+    firmware = _parse_version(meta.get('Firmware', ''))
+
+    for name, backend in sorted(BACKENDS.items(), key=lambda item: -item[1]['priority']):
+        oldest, newest = backend['firmware']
+        if (record_types <= backend['record_types']
+                and (oldest is None or firmware >= _parse_version(oldest))
+                and (newest is None or firmware <= _parse_version(newest))):
+            logging.debug('Reading the file with the %s backend', name)
+            return name
+
+    raise ValueError(f"None of the backends {list(BACKENDS)} can read activity records of type "
+                     f"{sorted(record_types)} written by firmware {meta.get('Firmware')}")
+
+
+def _inspect_record_types(archive, num_bytes=2 ** 20):
+    """
+    Finds the activity record types of a .gt3x file from the record headers at the start of log.bin
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    num_bytes : int (optional)
+        the number of bytes at the start of log.bin that are inspected
+
+    Returns
+    -------
+    record_types : set
+        the activity record types
+    """
+    with archive.open('log.bin') as stream:
+        head = stream.read(num_bytes)
+
+    index, _ = _index_records(head)
+
+    # activity records with a payload of one byte are written on USB connections and do not contain samples
+    return set(np.unique(index['type'][index['size'] > 1]).tolist()) & ACTIVITY_TYPES
+
+
+def _parse_version(version):
+    """
+    Parses a firmware version like '1.9.2' into a tuple of integers that can be compared
+
+    Parameters
+    ----------
+    version : str
+        the version
+
+    Returns
+    -------
+    version : tuple
+        the numbers of the version
+    """
+    return tuple(int(number) for number in re.findall(r'\d+', version))
+
+
+def _read_native(archive, meta, start=None, end=None, records=False, verify_checksums=False, num_jobs=1):
+    """
+    Reads the raw acceleration data of a .gt3x file with the vectorized decoder of paat
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    meta : dict
+        the formatted meta data of the file
+    start : int (optional)
+        unix timestamp in seconds, only records with a timestamp at or after start are decoded
+    end : int (optional)
+        unix timestamp in seconds, only records with a timestamp before end are decoded
+    records : boolean (optional)
+        boolean indicating whether the battery, event and parameter records are needed
+    verify_checksums : boolean (optional)
+        boolean indicating whether the checksums of the records should be verified
+    num_jobs : int (optional)
+        the number of processes decoding the activity records
+
+    Returns
+    -------
+    values : np.array (n_samples x 3)
+        int16 array with the raw acceleration values in YXZ order
+    time : TimeIndex
+        the time index of the values
+    records : dict
+        the battery, event, parameter and corrupted records, see _extract_log
+    """
+    if num_jobs > 1:
+        with _share_log_bin(archive) as (log_bin, source):
+            values, time_data, log_records = _extract_log(log_bin, meta['Acceleration_Scale'], meta['Sample_Rate'], use_scaling=False,
+                                                          start=start, end=end, verify_checksums=verify_checksums,
+                                                          num_jobs=num_jobs, source=source)
+    else:
+        with _open_log_bin(archive) as log_bin:
+            values, time_data, log_records = _extract_log(log_bin, meta['Acceleration_Scale'], meta['Sample_Rate'], use_scaling=False,
+                                                          start=start, end=end, verify_checksums=verify_checksums)
+
+    return values, TimeIndex.from_record_times(time_data, meta['Sample_Rate']), log_records
+
+
+def _read_pygt3x(archive, meta, start=None, end=None, records=False, verify_checksums=False, num_jobs=1):
+    """
+    Reads the raw acceleration data of a .gt3x file with ActiGraph's pygt3x library
+
+    pygt3x always reads the whole file and fills the gaps of the idle sleep mode with
+    the last values before the device fell asleep. For devices that do not calibrate
+    the data themselves, the calibration of pygt3x is applied like by its to_pandas and
+    the calibrated values are rounded to the nearest count, i.e. to 1 / Acceleration_Scale g.
+
+    pygt3x also reads files of the older V1 format of the NHANES studies, which store
+    the samples in activity.bin instead of log.bin. pygt3x hands out their values in g,
+    so they are scaled back to the raw counts with the acceleration scale. Their time
+    stamps start at the Start_Date of the meta data and the files have no battery,
+    event or parameter records.
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    meta : dict
+        the formatted meta data of the file
+    start : int (optional)
+        unix timestamp in seconds of the first record of the battery, event and parameter records
+    end : int (optional)
+        unix timestamp in seconds until which the battery, event and parameter records are selected
+    records : boolean (optional)
+        boolean indicating whether the battery, event and parameter records are needed
+    verify_checksums : boolean (optional)
+        boolean indicating whether the checksums of the records should be verified
+    num_jobs : int (optional)
+        ignored, pygt3x decodes a file in a single process
+
+    Returns
+    -------
+    values : np.array (n_samples x 3)
+        int16 array with the raw acceleration values in YXZ order
+    time : TimeIndex
+        the time index of the values
+    records : dict or None
+        the battery, event, parameter and corrupted records, see _extract_log
+    """
+    nhanes = 'log.bin' not in archive.namelist()
+    if nhanes and (records or verify_checksums):
+        raise ValueError("Files of the V1 format have no log.bin, so there are no records and checksums")
+
+    # pygt3x reads the archive from the file object the archive was opened with
+    with FileReader(archive.fp) as reader:
+        acceleration = reader.acceleration
+        calibration = reader.calibration
+
+        # the X, Y and Z values of devices that do not calibrate the data themselves are calibrated to g
+        if not nhanes and calibration is not None and not calibration.get('isCalibrated', True):
+            logging.info('The data is not calibrated by the device, the calibration of pygt3x is applied')
+            acceleration = acceleration.copy()
+            acceleration[:, 1:4] = reader.calibrate_acceleration(acceleration[:, 1:4]) * meta['Acceleration_Scale']
+
+    sample_rate = meta['Sample_Rate']
+
+    if nhanes:
+        # the values of V1 files are in g, rounded to three decimals, which keeps the counts exact
+        meta.setdefault('Acceleration_Scale', float(NHANES_SCALE))
+        values = np.rint(acceleration[:, [2, 1, 3]] * meta['Acceleration_Scale']).astype(np.int16)
+        time = TimeIndex(np.datetime64(meta['Start_Date'], 'ns'), sample_rate, len(values))
+
+        return values, time, None
+
+    # the columns are the time in seconds and the raw X, Y and Z values
+    acceleration = acceleration[np.argsort(acceleration[:, 0], kind='stable')]
+    values = np.rint(acceleration[:, [2, 1, 3]]).astype(np.int16)
+
+    seconds = np.floor(acceleration[:, 0])
+
+    if len(seconds) % sample_rate == 0 and np.all(seconds.reshape(-1, sample_rate) == seconds[::sample_rate, None]):
+        time = TimeIndex.from_record_times(seconds[::sample_rate], sample_rate)
+    else:
+        logging.warning('Not all seconds contain %s samples, every sample gets its own time stamp', sample_rate)
+        timestamps = seconds.astype(np.int64) * 10 ** 9 + np.rint((acceleration[:, 0] - seconds) * 10 ** 9).astype(np.int64)
+        time = TimeIndex._from_runs(sample_rate, timestamps, np.zeros(len(timestamps)), np.ones(len(timestamps)))
+
+    # pygt3x does not hand out the battery, event and parameter records, so they are read from the record headers
+    log_records = None
+    if records or verify_checksums:
+        log_records = _select_records(_read_side_records(archive, verify_checksums=True), start, end)
+
+    return values, time, log_records
+
+
+def _read_side_records(archive, verify_checksums=False):
+    """
+    Reads the battery, event and parameter records of a .gt3x file without decoding the samples
+
+    Parameters
+    ----------
+    archive : zipfile.ZipFile
+        the opened .gt3x archive
+    verify_checksums : boolean (optional)
+        boolean indicating whether the records with a wrong checksum should be added as 'corrupted'
+
+    Returns
+    -------
+    records : dict
+        the battery, event, parameter and corrupted records, see _extract_log
+    """
+    with _open_log_bin(archive) as log_bin:
+        index = _build_record_index(log_bin)
+        log_records = _read_records(log_bin, index)
+        if verify_checksums:
+            log_records['corrupted'] = _find_corrupted_records(log_bin, index)
+
+    return log_records
+
+
+register_backend('native', _read_native, record_types=(ACTIVITY, ACTIVITY2), priority=10)
+register_backend('pygt3x', _read_pygt3x, record_types=ACTIVITY_TYPES, priority=0)
+
+
+def read_gt3x(file, rescale=True, pandas=True, metadata=False, use_pygt3x=False, start=None, end=None,
+              cache_dir=None, max_cache_size=CACHE_MAX_SIZE, records=False, verify_checksums=False, backend="auto",
+              num_jobs=1, fill=None, recording=False):
+    """
+    Reads a .gt3x file and returns the tri-axial acceleration values together
+    with the corresponding time stamps and all meta data.
+
+    If start or end are given, only the data within [start, end) is returned. The
+    record headers are used to decode only the records within this time range, so
+    reading a single day of a multi-week recording only decodes that day.
+
+    If a cache_dir is given, the decoded raw data is stored on disk the first time a
+    file is read. Later calls on a file with the same content load the data as
+    memory maps from the cache instead of decoding the file again. The cache is
+    limited to max_cache_size bytes and the least recently used files are removed
+    when the limit is exceeded. The records and checksums are only added to the cache
+    once they are requested.
+
+    Damaged parts of the file, e.g. corrupted or truncated records of an interrupted
+    download, do not stop the decoding. The decoder continues at the next valid record
+    and lists the byte ranges [start, stop) of log.bin it had to skip, if any, in the
+    meta data as Damaged_Spans.
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    rescale : boolean (optional)
+        boolean indicating whether raw acceleration data should be rescaled to g values
+    pandas : boolean (optional)
+        boolean indicating whether the data should be returned as a pandas DataFrame
+    metadata : boolean (optional)
+        boolean indicating whether the full metadata should be returned
+    use_pygt3x : boolean (optional)
+        boolean indicating whether to use ActiGraph's Pygt3x library to read the file.
+        This is the same as backend='pygt3x'.
+    start : str, datetime or np.datetime64 (optional)
+        the first point in time that should be read. Timestamps are given in the
+        local time of the recording like the returned time stamps.
+    end : str, datetime or np.datetime64 (optional)
+        the point in time until which the data should be read (exclusive)
+    cache_dir : string (optional)
+        directory of the cache for decoded files. Caching is disabled if not given.
+    max_cache_size : int (optional)
+        the maximum size of the cache in bytes
+    records : boolean (optional)
+        boolean indicating whether the battery, event and parameter records should be
+        returned. They are collected in the same pass over the file as the acceleration data.
+    verify_checksums : boolean (optional)
+        boolean indicating whether the checksums of the records should be verified. The
+        positions of the records in log.bin with a wrong checksum are added to the meta
+        data as Corrupted_Records. The data of these records is still returned.
+    backend : str (optional)
+        the name of the reader backend, see BACKENDS. With 'auto', the fastest backend
+        that supports the activity record types and the firmware of the file is used.
+        Files of the older V1 format without log.bin, e.g. of the NHANES studies, are
+        read with the 'pygt3x' backend and have no records or checksums.
+    num_jobs : int (optional)
+        the number of processes decoding the file. With more than one job, the records
+        are split into contiguous ranges that are decoded in parallel straight into
+        shared memory. This pays off for long recordings, the output is the same.
+    fill : str (optional)
+        by default, gaps in the recording, e.g. of the idle sleep mode, are kept and
+        can be found with time.segments(). With 'last' or 'zeros', the gaps are filled
+        with the last value before the gap or with zeros to obtain a uniform time grid,
+        see fill_gaps.
+    recording : boolean (optional)
+        boolean indicating whether the data should be returned as a compact Recording
+        with the raw counts instead of a DataFrame or arrays. rescale, pandas and
+        metadata are ignored in this case.
+
+    Returns
+    -------
+    data : DataFrame
+        a DataFrame containg the raw acceleration data
+    sample_freq : int
+        the sampling frequency in which the data was recorded
+    time : TimeIndex
+        the implicit time index of the observations in values. The time stamps are
+        only computed on request, e.g. by np.asarray(time) or time.to_pandas(). The
+        contiguous segments between gaps are given by time.segments().
+    values : np.array (n_samples x 3)
+        a numpy array with the tri-axial acceleration values. If rescale is true, data
+        is rescaled to units of g. Note, that this function returns the values in
+        the default order of ActiGraph which is ['Y','X','Z']. Depending on further
+        use, you might want to adjust that order.
+    meta : dict
+        a dict containing all meta data produced by ActiGraph
+    recording : Recording
+        the raw counts, time index and meta data, only returned instead of the above if
+        recording is true
+    records : dict
+        only returned if records is true. A dict with the structured arrays 'battery'
+        (timestamp and voltage in mV), 'events' (timestamp and event code, e.g.
+        IDLE_SLEEP_MODE_STARTED) and 'parameters' (timestamp, address space,
+        identifier and raw value of the device parameters).
+
+    """
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        file = BytesIO(file)
+
+    if use_pygt3x:
+        backend = 'pygt3x'
+
+    if backend != 'auto' and backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected 'auto' or one of {list(BACKENDS)}")
+
+    if num_jobs < 1:
+        raise ValueError(f"num_jobs has to be at least 1, got {num_jobs}")
+
+    if fill is not None and fill not in FILL_METHODS:
+        raise ValueError(f"Unknown fill method {fill}, expected None or one of {FILL_METHODS}")
+
+    # the records cover full seconds, so all records overlapping with [start, end) are decoded
+    start_record, end_record = _record_range(start, end)
+
+    if cache_dir is not None:
+        values, time, meta, log_records = _read_cached(file, cache_dir, max_cache_size, backend=backend, num_jobs=num_jobs,
+                                                       records=records, verify_checksums=verify_checksums)
+        if log_records is not None:
+            log_records = _select_records(log_records, start_record, end_record)
+    else:
+        # open the .gt3x file once, the binary log.bin contains the raw data and the info.txt contains the meta-data
+        with _open_gt3x(file) as archive:
+
+            # get meta data from info.txt file
+            meta = _extract_info(archive)
+            meta = _format_meta_data(meta)
+
+            if backend == 'auto':
+                backend = _select_backend(archive, meta)
+
+            values, time, log_records = BACKENDS[backend]['reader'](archive, meta, start=start_record, end=end_record,
+                                                                    records=records, verify_checksums=verify_checksums,
+                                                                    num_jobs=num_jobs)
+
+    # remove the samples outside of [start, end), e.g. of the first and last record
+    time, values = _select_time_range(time, values, start, end)
+
+    if fill is not None:
+        time, values = fill_gaps(time, values, method=fill)
+
+    # a recording keeps the raw counts
+    if recording:
+        rescale, pandas = False, False
+
+    # raw data values are stored in ints, to obtain values in G, we need to scale them by the acceleration scale
+    if rescale:
+        values = values * (1. / meta['Acceleration_Scale'])
+
+    if verify_checksums:
+        meta['Corrupted_Records'] = log_records['corrupted']['record'].tolist()
+        if meta['Corrupted_Records']:
+            logging.warning('Found %s records with a wrong checksum', len(meta['Corrupted_Records']))
+
+    if log_records is not None and log_records.get('damaged') is not None and log_records['damaged'].size > 0:
+        meta['Damaged_Spans'] = log_records['damaged'][['start', 'stop']].tolist()
+
+    if records:
+        log_records = {name: entries for name, entries in log_records.items() if name not in ('corrupted', 'damaged')}
+
+    output = _format_output(time, values, meta, pandas=pandas, metadata=metadata, records=log_records if records else None)
+
+    if recording:
+        recording = Recording(values, meta['Acceleration_Scale'], time, meta)
+        return (recording, output[-1]) if records else recording
+
+    return output
+
+
+def _hash_file(file):
+    """
+    Calculates a hash of the content of a .gt3x file
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+
+    Returns
+    -------
+    digest : str
+        hexadecimal digest of the file content
+    """
+    file_hash = hashlib.blake2b(digest_size=20)
+
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        file_hash.update(file)
+    elif isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as stream:
+            for block in iter(lambda: stream.read(2 ** 20), b''):
+                file_hash.update(block)
+    else:
+        position = file.tell()
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            file_hash.update(block)
+        file.seek(position)
+
+    return file_hash.hexdigest()
+
+
+def _cache_key(file, cache_dir, backend='auto'):
+    """
+    Creates the key of a .gt3x file within the cache from its content and the reader options
+
+    Hashing the content of large files takes a while, so the hash of a file on disk is
+    remembered together with its size and modification time.
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    cache_dir : string
+        directory of the cache
+    backend : str (optional)
+        the name of the backend decoding the file
+
+    Returns
+    -------
+    key : str
+        the key of the file within the cache
+    """
+    file_hash = None
+
+    if isinstance(file, (str, os.PathLike)):
+        path = os.path.abspath(file)
+        stat = os.stat(path)
+        path_file = os.path.join(cache_dir, 'paths', hashlib.blake2b(path.encode(), digest_size=20).hexdigest() + '.json')
+
+        try:
+            with open(path_file, 'r') as stream:
+                entry = json.load(stream)
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                file_hash = entry['hash']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    if file_hash is None:
+        file_hash = _hash_file(file)
+
+        if isinstance(file, (str, os.PathLike)):
+            os.makedirs(os.path.dirname(path_file), exist_ok=True)
+            with open(path_file, 'w') as stream:
+                json.dump({'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': file_hash}, stream)
+
+    # the options of the decoder that change the decoded data are part of the key
+    options = json.dumps({'version': CACHE_VERSION, 'backend': backend}, sort_keys=True)
+
+    return hashlib.blake2b((file_hash + options).encode(), digest_size=20).hexdigest()
+
+
+def _read_cached(file, cache_dir, max_cache_size=CACHE_MAX_SIZE, backend='auto', num_jobs=1, records=False,
+                 verify_checksums=False):
+    """
+    Reads the decoded raw data of a .gt3x file from the cache. Files that are not in the
+    cache yet are decoded and added to the cache.
+
+    The side records and the checksums are only computed when they are requested, so
+    filling the cache costs no more than reading the file. If a later call requests them,
+    they are read from the record headers without decoding the samples again and added
+    to the entry.
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    cache_dir : string
+        directory of the cache
+    max_cache_size : int (optional)
+        the maximum size of the cache in bytes
+    backend : str (optional)
+        the name of the backend decoding files that are not in the cache yet
+    num_jobs : int (optional)
+        the number of processes decoding a file that is not in the cache yet
+    records : boolean (optional)
+        boolean indicating whether the battery, event and parameter records are needed
+    verify_checksums : boolean (optional)
+        boolean indicating whether the checksums of the records should be verified
+
+    Returns
+    -------
+    values : np.memmap (n_samples x 3)
+        int16 memory map with the raw acceleration values in YXZ order
+    time : TimeIndex
+        the time index of the values
+    meta : dict
+        a dict containing all meta data produced by ActiGraph
+    records : dict or None
+        the battery, event, parameter and corrupted records, see _extract_log
+    """
+    key = _cache_key(file, cache_dir, backend)
+    entry = os.path.join(cache_dir, 'data', key)
+
+    if not os.path.exists(entry):
+        with _open_gt3x(file) as archive:
+            meta = _format_meta_data(_extract_info(archive))
+
+            if backend == 'auto':
+                backend = _select_backend(archive, meta)
+
+            values, time, log_records = BACKENDS[backend]['reader'](archive, meta, records=records,
+                                                                    verify_checksums=verify_checksums, num_jobs=num_jobs)
+
+        # write to a temporary directory first so other processes never see incomplete entries
+        os.makedirs(os.path.join(cache_dir, 'data'), exist_ok=True)
+        tmp_entry = tempfile.mkdtemp(dir=os.path.join(cache_dir, 'data'), prefix='.tmp')
+        np.save(os.path.join(tmp_entry, 'values.npy'), values)
+        np.save(os.path.join(tmp_entry, 'runs.npy'), time._runs())
+        if log_records is not None:
+            np.savez(os.path.join(tmp_entry, 'records.npz'), **log_records)
+        with open(os.path.join(tmp_entry, 'meta.json'), 'w') as stream:
+            json.dump(meta, stream)
+
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # another process added the same file in the meantime
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        _evict_cache(cache_dir, max_cache_size, keep=key)
+    else:
+        logging.debug('Reading %s from cache', key)
+
+        # mark the entry as recently used
+        os.utime(os.path.join(entry, 'meta.json'))
+
+    with open(os.path.join(entry, 'meta.json'), 'r') as stream:
+        meta = json.load(stream)
+
+    values = np.load(os.path.join(entry, 'values.npy'), mmap_mode='r')
+    time = TimeIndex._from_runs(meta['Sample_Rate'], *np.load(os.path.join(entry, 'runs.npy')).T)
+    log_records = None
+    if os.path.exists(os.path.join(entry, 'records.npz')):
+        with np.load(os.path.join(entry, 'records.npz')) as stream:
+            log_records = dict(stream)
+
+    # entries of calls that did not need the side records or the checksums lack them
+    if (records and log_records is None) or (verify_checksums and 'corrupted' not in (log_records or {})):
+        with _open_gt3x(file) as archive:
+            log_records = dict(log_records or {}, **_read_side_records(archive, verify_checksums=verify_checksums))
+
+        # replace the records of the entry at once so other processes never see an incomplete file
+        handle, tmp_file = tempfile.mkstemp(dir=entry, prefix='.tmp', suffix='.npz')
+        os.close(handle)
+        np.savez(tmp_file, **log_records)
+        os.replace(tmp_file, os.path.join(entry, 'records.npz'))
+
+    return values, time, meta, log_records
+
+
+def _evict_cache(cache_dir, max_cache_size, keep=None):
+    """
+    Removes the least recently used files from the cache until it is smaller than max_cache_size
+
+    Parameters
+    ----------
+    cache_dir : string
+        directory of the cache
+    max_cache_size : int
+        the maximum size of the cache in bytes
+    keep : string (optional)
+        key of an entry that should not be removed
+    """
+    data_dir = os.path.join(cache_dir, 'data')
+
+    entries = []
+    for key in os.listdir(data_dir):
+        entry = os.path.join(data_dir, key)
+        if key.startswith('.tmp'):
+            continue
+        try:
+            last_used = os.stat(os.path.join(entry, 'meta.json')).st_mtime
+            size = sum(os.stat(os.path.join(entry, name)).st_size for name in os.listdir(entry))
+        except OSError:
+            continue
+        entries.append((last_used, size, key))
+
+    cache_size = sum(size for _, size, _ in entries)
+
+    for _, size, key in sorted(entries):
+        if cache_size <= max_cache_size:
+            break
+        if key == keep:
+            continue
+
+        logging.debug('Removing %s from cache', key)
+        shutil.rmtree(os.path.join(data_dir, key), ignore_errors=True)
+        cache_size -= size
+
+
+def _to_datetime64(timestamp):
+    """
+    Converts a timestamp to a timezone naive np.datetime64 at nanosecond precision
+
+    Parameters
+    ----------
+    timestamp : str, datetime or np.datetime64
+        the timestamp to convert. Timezone aware timestamps are converted to their local time.
+
+    Returns
+    -------
+    timestamp : np.datetime64
+        the timestamp as np.datetime64[ns]
+    """
+    timestamp = pd.Timestamp(timestamp)
+
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+
+    return timestamp.as_unit('ns').to_datetime64()
+
+
+def _record_range(start=None, end=None):
+    """
+    Converts a time range to the range of record timestamps that overlap with it. Each
+    record contains one second of data, so the timestamps are rounded to full seconds.
+
+    Parameters
+    ----------
+    start : str, datetime or np.datetime64 (optional)
+        the first point in time of the range
+    end : str, datetime or np.datetime64 (optional)
+        the end of the range (exclusive)
+
+    Returns
+    -------
+    start_record : int
+        unix timestamp of the first record within the range or None
+    end_record : int
+        unix timestamp after the last record within the range or None
+    """
+    start_record, end_record = None, None
+
+    if start is not None:
+        start_record = int(_to_datetime64(start).astype('datetime64[s]').astype(np.int64))
+    if end is not None:
+        end_record = int((_to_datetime64(end) + np.timedelta64(999999999, 'ns')).astype('datetime64[s]').astype(np.int64))
+
+    return start_record, end_record
+
+
+def _select_time_range(time, values, start=None, end=None):
+    """
+    Selects the samples within [start, end)
+
+    Parameters
+    ----------
+    time : TimeIndex or np.array (n_samples x 1)
+        the time stamps for the observations in values
+    values : np.array (n_samples x 3)
+        a numpy array with the tri-axial acceleration values
+    start : str, datetime or np.datetime64 (optional)
+        the first point in time that should be selected
+    end : str, datetime or np.datetime64 (optional)
+        the point in time until which the data should be selected (exclusive)
+
+    Returns
+    -------
+    time : TimeIndex or np.array (n_samples x 1)
+        the time stamps within [start, end)
+    values : np.array (n_samples x 3)
+        the acceleration values within [start, end)
+    """
+    if start is None and end is None:
+        return time, values
+
+    if isinstance(time, TimeIndex):
+        ranges = time.locate(start, end)
+        if len(ranges) == 0:
+            logging.warning('No data found between %s and %s', start, end)
+            return time[:0], values[:0]
+        if len(ranges) == 1:
+            # a single contiguous range can be returned as a view
+            return time[ranges[0, 0]:ranges[0, 1]], values[ranges[0, 0]:ranges[0, 1]]
+        return (time._take(ranges[:, 0], ranges[:, 1]),
+                np.concatenate([values[first:stop] for first, stop in ranges]))
+
+    mask = np.ones(len(time), dtype=bool)
+    if start is not None:
+        mask &= time >= _to_datetime64(start)
+    if end is not None:
+        mask &= time < _to_datetime64(end)
+
+    if not mask.any():
+        logging.warning('No data found between %s and %s', start, end)
+
+    return time[mask], values[mask]
+
+
+def _format_output(time, values, meta, pandas=True, metadata=False, records=None, columns=("Y", "X", "Z")):
+    """
+    Formats the acceleration data in the way it is returned by read_gt3x
+
+    Parameters
+    ----------
+    time : np.array (n_samples x 1)
+        a numpy array with time stamps for the observations in values
+    values : np.array (n_samples x 3)
+        a numpy array with the tri-axial acceleration values in YXZ order
+    meta : dict
+        a dict containing all meta data produced by ActiGraph
+    pandas : boolean (optional)
+        boolean indicating whether the data should be returned as a pandas DataFrame
+    metadata : boolean (optional)
+        boolean indicating whether the full metadata should be returned
+    records : dict (optional)
+        the battery, event and parameter records, appended to the output if given
+    columns : list of strings (optional)
+        the axes of the columns of values
+
+    Returns
+    -------
+    output : tuple
+        see read_gt3x
+    """
+
+    # Add additional keys to meta (Note: they are important to later reconstruct the time vector)
+    meta["Number_Of_Samples"] = values.shape[0]
+    meta["Start_Time"] = int(np.datetime64(time[0], 'ms').astype(np.int64)) if len(time) > 0 else None
+
+    if pandas:
+        data = pd.DataFrame(values, columns=list(columns), index=pd.DatetimeIndex(np.asarray(time)))
+        data = data[[axis for axis in ("X", "Y", "Z") if axis in columns]]
+        if metadata:
+            output = data, meta['Sample_Rate'], meta
+        else:
+            output = data, meta['Sample_Rate']
+    else:
+        output = time, values, meta
+
+    if records is not None:
+        output += (records,)
+
+    return output
+
+
+def iter_gt3x(file, chunk_size="1h", rescale=True, pandas=True, metadata=False, block_size=2 ** 24):
+    """
+    Reads a .gt3x file chunk by chunk. The log.bin file is streamed from the .gt3x file
+    and the acceleration data is handed out in chunks of a fixed duration, so the memory
+    needed depends on the size of the chunks and not on the length of the recording.
+
+    The chunks are aligned to the first timestamp of the recording, i.e. the n-th chunk
+    contains the data recorded in [start + n * chunk_size, start + (n + 1) * chunk_size).
+    Chunks without any data are skipped. Concatenating all chunks gives the same data as
+    read_gt3x.
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    chunk_size : str or pd.Timedelta (optional)
+        the duration of the chunks, e.g. "1h" or "1D". Must be a multiple of seconds.
+    rescale : boolean (optional)
+        boolean indicating whether raw acceleration data should be rescaled to g values
+    pandas : boolean (optional)
+        boolean indicating whether the data should be returned as a pandas DataFrame
+    metadata : boolean (optional)
+        boolean indicating whether the full metadata should be returned
+    block_size : int (optional)
+        the number of bytes that are read from the log.bin file at once
+
+    Yields
+    ------
+    chunk : tuple
+        the acceleration data of one chunk in the same format as returned by read_gt3x. The
+        metadata contains the Number_Of_Samples and Start_Time of the chunk.
+
+    """
+    chunk_seconds = pd.Timedelta(chunk_size).total_seconds()
+
+    if chunk_seconds < 1 or not chunk_seconds.is_integer():
+        raise ValueError(f"chunk_size has to be a positive multiple of seconds, got {chunk_size}")
+
+    chunk_seconds = int(chunk_seconds)
+
+    with _open_gt3x(file) as archive:
+
+        # get meta data from info.txt file
+        meta = _extract_info(archive)
+        meta = _format_meta_data(meta)
+        sample_rate = meta['Sample_Rate']
+
+        first_timestamp = None
+        current_chunk = 0
+        values, time_data = [], []
+
+        for log_bin, index in _iter_log_bin(archive, block_size=block_size):
+
+            block_values, block_time = _read_activity(log_bin, index, sample_rate)
+
+            if block_time.size == 0:
+                continue
+
+            if first_timestamp is None:
+                first_timestamp = int(block_time[0, 0])
+
+            # assign each record to a chunk, records that jump back in time stay in the current chunk to keep the order of read_gt3x
+            chunk_ids = (block_time[:, 0].astype(np.int64) - first_timestamp) // chunk_seconds
+            chunk_ids = np.maximum.accumulate(np.maximum(chunk_ids, current_chunk))
+
+            boundaries = np.flatnonzero(np.diff(chunk_ids)) + 1
+            for start, stop in zip(np.r_[0, boundaries], np.r_[boundaries, chunk_ids.size]):
+
+                # the chunk is complete as soon as a record of a later chunk shows up
+                if chunk_ids[start] != current_chunk:
+                    yield _create_chunk(time_data, values, meta, rescale, pandas, metadata)
+                    values, time_data = [], []
+                    current_chunk = chunk_ids[start]
+
+                values.append(block_values[start * sample_rate:stop * sample_rate])
+                time_data.append(block_time[start:stop])
+
+        if values:
+            yield _create_chunk(time_data, values, meta, rescale, pandas, metadata)
+
+
+def _create_chunk(time_data, values, meta, rescale, pandas, metadata):
+    """
+    Combines the parts of a chunk read by iter_gt3x and formats it like read_gt3x
+
+    Parameters
+    ----------
+    time_data : list of np.array
+        the record timestamps of the parts of the chunk
+    values : list of np.array
+        the raw acceleration values of the parts of the chunk
+    meta : dict
+        a dict containing all meta data produced by ActiGraph
+    rescale : boolean
+        boolean indicating whether raw acceleration data should be rescaled to g values
+    pandas : boolean
+        boolean indicating whether the data should be returned as a pandas DataFrame
+    metadata : boolean
+        boolean indicating whether the full metadata should be returned
+
+    Returns
+    -------
+    output : tuple
+        see read_gt3x
+    """
+    values = np.concatenate(values)
+
+    if rescale:
+        values = values * (1. / meta['Acceleration_Scale'])
+
+    time = TimeIndex.from_record_times(np.concatenate(time_data), meta['Sample_Rate'])
+
+    return _format_output(time, values, dict(meta), pandas=pandas, metadata=metadata)
+
+
+def read_gt3x_many(files, num_jobs=cpu_count(), ordered=True, max_in_flight=None, **kwargs):
+    """
+    Reads multiple .gt3x files in parallel. The files are decoded by a pool of worker
+    processes and the results are yielded one by one, so a cohort can be processed
+    without keeping all recordings in memory at once.
+
+    A file that cannot be read does not stop the batch. Instead, the exception raised
+    while reading it is yielded in place of the data.
+
+    Parameters
+    ----------
+    files : iterable of strings
+        file locations of the .gt3x files
+    num_jobs : int (optional)
+        the number of worker processes. Defaults to the number of CPUs.
+    ordered : boolean (optional)
+        if True, the results are yielded in the order of files, otherwise they are
+        yielded as soon as they are ready
+    max_in_flight : int (optional)
+        the maximum number of files that are read, decoded or yielded and still being
+        worked on. A new file is only submitted once the next result is requested, so
+        at most max_in_flight decoded recordings are in memory if the previous result
+        is released before the next one is requested. Defaults to two times num_jobs.
+    **kwargs
+        further arguments passed on to read_gt3x, e.g. rescale, pandas or metadata
+
+    Yields
+    ------
+    file : string
+        the file location
+    output : tuple or None
+        the output of read_gt3x for this file, None if reading the file failed
+    error : Exception or None
+        the exception raised while reading this file, None if reading succeeded
+
+    """
+    if num_jobs < 1:
+        raise ValueError(f"num_jobs has to be at least 1, got {num_jobs}")
+
+    if max_in_flight is None:
+        max_in_flight = 2 * num_jobs
+
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight has to be at least 1, got {max_in_flight}")
+
+    with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+        yield from _map_bounded(executor, partial(read_gt3x, **kwargs), files, ordered=ordered, max_in_flight=max_in_flight)
+
+
+def _map_bounded(executor, function, items, ordered=True, max_in_flight=1):
+    """
+    Applies a function to all items with an executor while keeping the number of
+    results that are computed or not yet yielded bounded
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        the executor running the function
+    function : callable
+        the function that is called with every item
+    items : iterable
+        the items, they are only consumed when there is room for new results
+    ordered : boolean (optional)
+        if True, the results are yielded in the order of items, otherwise they are
+        yielded as soon as they are ready
+    max_in_flight : int (optional)
+        the maximum number of items that are processed, not yet yielded or held by the
+        consumer. The bound holds if the consumer releases an output before it asks for
+        the next one.
+
+    Yields
+    ------
+    item : object
+        the item
+    output : object or None
+        the return value of the function, None if the function raised an exception
+    error : Exception or None
+        the exception raised by the function, None if it succeeded
+    """
+    items = iter(items)
+    pending = deque()
+
+    def submit():
+        # keep at most max_in_flight results in the executor and the queue of unyielded results
+        for item in items:
+            future = executor.submit(function, item)
+            future.item = item
+            pending.append(future)
+            if len(pending) >= max_in_flight:
+                break
+
+    submit()
+
+    while pending:
+        if ordered:
+            future = pending.popleft()
+        else:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            future = next(future for future in pending if future in done)
+            pending.remove(future)
+            del done
+
+        item = future.item
+        try:
+            output, error = future.result(), None
+        except Exception as e:
+            logging.error('Could not process %s: %s', item, e)
+            output, error = None, e
+
+        # the finished future holds on to the output as well
+        del future
+
+        yield item, output, error
+
+        # new items are only submitted once the consumer asks for the next result, so
+        # the output it was working on counts towards max_in_flight as well
+        output = error = None
+        submit()
+
+
+def read_metadata(file):
+    """
+    Reads the metadata from a .gt3x file.
+
+    Parameters
+    ----------
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    
+    Returns
+    -------
+    meta : dict
+        a dict containing all meta data produced by ActiGraph
+
+    """
+    # only the info.txt file is read from the .gt3x file, log.bin is not touched
+    with _open_gt3x(file) as archive:
+
+        # get meta data from info.txt file
+        meta = _extract_info(archive)
+
+    meta = _format_meta_data(meta)
+
+    return meta
+
+
+def write_hdf5(hdf5_file, file, name=None, overwrite=False, complevel=5, complib='blosc:lz4', chunk_size="1h"):
+    """
+    Writes the raw acceleration data of a .gt3x file to a HDF5 store
+
+    Every recording is stored in its own group of the HDF5 file, so recordings can be
+    added to an existing store one after another. The raw int16 values of each axis
+    are stored as a compressed, chunked array where every chunk holds one minute of
+    data. The time stamps are not stored per sample, only the runs of the time index
+    are kept. The meta data, including the acceleration scale, is stored in the
+    attributes of the group. The .gt3x file is streamed, so the memory needed does not
+    depend on the length of the recording.
+
+    Parameters
+    ----------
+    hdf5_file : string
+        file location of the HDF5 file, it is created if it does not exist
+    file : string, file-like object or bytes
+        file location of the .gt3x file, an opened binary file or the content of the .gt3x file
+    name : string (optional)
+        name of the group of the recording, defaults to the file name without extension
+    overwrite : boolean (optional)
+        boolean indicating whether an existing recording with the same name should be replaced
+    complevel : int (optional)
+        the compression level from 0 (no compression) to 9
+    complib : string (optional)
+        the compression library, see tables.Filters. Blosc is fast but needs the HDF5
+        plugins to be read by other software, 'zlib' is slower but supported everywhere.
+    chunk_size : str or pd.Timedelta (optional)
+        the duration of the data that is read from the .gt3x file at once
+
+    Returns
+    -------
+    name : string
+        the name of the group of the recording
+
+    """
+    if name is None:
+        if not isinstance(file, (str, os.PathLike)):
+            raise ValueError("name has to be given if file is not a file location")
+        name = os.path.splitext(os.path.basename(file))[0]
+
+    meta = read_metadata(file)
+    filters = tables.Filters(complevel=complevel, complib=complib, shuffle=True)
+
+    with tables.open_file(hdf5_file, mode='a') as store:
+
+        if name in store.root:
+            if not overwrite:
+                raise ValueError(f"Recording {name} already exists in {hdf5_file}")
+            store.remove_node(store.root, name, recursive=True)
+
+        group = store.create_group(store.root, name)
+
+        try:
+            for axis in HDF5_AXES:
+                store.create_earray(group, axis, tables.Int16Atom(), shape=(0,), filters=filters,
+                                    chunkshape=(meta['Sample_Rate'] * HDF5_CHUNK_SECONDS,))
+
+            # origin, phase and number of samples of every run of the time index
+            store.create_earray(group, 'runs', tables.Int64Atom(), shape=(0, 3))
+
+            for time, values, meta in iter_gt3x(file, chunk_size=chunk_size, rescale=False, pandas=False, metadata=True):
+                for column, axis in enumerate(HDF5_AXES):
+                    group[axis].append(values[:, column])
+                group.runs.append(time._runs())
+
+            time = _read_hdf5_time(group, meta['Sample_Rate'])
+            meta['Number_Of_Samples'] = len(time)
+            meta['Start_Time'] = int(np.datetime64(time[0], 'ms').astype(np.int64)) if len(time) > 0 else None
+            for key, value in meta.items():
+                group._v_attrs[key] = value
+        except BaseException:
+            # do not leave an incomplete recording in the store
+            store.remove_node(store.root, name, recursive=True)
+            raise
+
+    return name
+
+
+def read_hdf5(hdf5_file, name, start=None, end=None, axes=None, rescale=True, pandas=True, metadata=False):
+    """
+    Reads a recording from a HDF5 store written by write_hdf5
+
+    Only the chunks of the requested axes that overlap with [start, end) are read
+    from the store, so a single day or a single axis of a long recording can be
+    loaded without reading the rest of the data.
+
+    Parameters
+    ----------
+    hdf5_file : string
+        file location of the HDF5 file
+    name : string
+        name of the group of the recording
+    start : str, datetime or np.datetime64 (optional)
+        the first point in time that should be read
+    end : str, datetime or np.datetime64 (optional)
+        the point in time until which the data should be read (exclusive)
+    axes : list of strings (optional)
+        the axes that should be read, e.g. ['X'] or ['X', 'Z']. Defaults to all axes in YXZ order.
+    rescale : boolean (optional)
+        boolean indicating whether raw acceleration data should be rescaled to g values
+    pandas : boolean (optional)
+        boolean indicating whether the data should be returned as a pandas DataFrame
+    metadata : boolean (optional)
+        boolean indicating whether the full metadata should be returned
+
+    Returns
+    -------
+    output : tuple
+        the acceleration data in the same format as returned by read_gt3x. The values
+        only contain the requested axes in the requested order.
+
+    """
+    if axes is None:
+        axes = list(HDF5_AXES)
+    elif set(axes) - set(HDF5_AXES):
+        raise ValueError(f"axes has to contain only {HDF5_AXES}, got {axes}")
+
+    with tables.open_file(hdf5_file, mode='r') as store:
+        group = store.get_node(store.root, name)
+
+        meta = {key: group._v_attrs[key] for key in group._v_attrs._f_list('user')}
+        meta = {key: value.item() if isinstance(value, np.generic) else value for key, value in meta.items()}
+
+        time = _read_hdf5_time(group, meta['Sample_Rate'])
+
+        if start is None and end is None:
+            ranges = np.array([[0, len(time)]])
+        else:
+            ranges = time.locate(start, end)
+            if len(ranges) == 0:
+                logging.warning('No data found between %s and %s', start, end)
+            time = time._take(ranges[:, 0], ranges[:, 1])
+
+        # read the slices of every axis directly into the result
+        values = np.empty((len(time), len(axes)), dtype=np.int16)
+        position = 0
+        for first, stop in ranges:
+            for column, axis in enumerate(axes):
+                values[position:position + stop - first, column] = group[axis].read(first, stop)
+            position += stop - first
+
+    if rescale:
+        values = values * (1. / meta['Acceleration_Scale'])
+
+    return _format_output(time, values, meta, pandas=pandas, metadata=metadata, columns=axes)
+
+
+def _read_hdf5_time(group, sample_rate):
+    """
+    Reads the time index of a recording in a HDF5 store
+
+    Parameters
+    ----------
+    group : tables.Group
+        the group of the recording
+    sample_rate : int
+        the sampling frequency in Hz
+
+    Returns
+    -------
+    time : TimeIndex
+        the time index of the recording
+    """
+    runs = group.runs.read()
+
+    return TimeIndex._from_runs(sample_rate, *runs.T)
+
+
+def build_catalog(directory, catalog_file, num_jobs=cpu_count(), pattern='*.gt3x', scan_records=False):
+    """
+    Builds a catalog of the meta data of all .gt3x files within a directory tree
+
+    The catalog is a SQLite database with one row per file in the table 'catalog'.
+    Besides the fields of info.txt, it contains the size of log.bin, the timestamp of
+    the first record and derived fields like the duration of the recording in seconds,
+    the expected number of samples and the expected size of the decoded int16 values
+    in bytes. Files that could not be read are listed with the error message.
+
+    The files are read by a pool of worker processes. Only the info.txt and the first
+    record header are read from each archive, unless scan_records is true, in which
+    case the headers of all records are indexed to count the records. If the catalog
+    exists already, only new or modified files are read and removed files are dropped.
+
+    Parameters
+    ----------
+    directory : string
+        the directory that is searched for .gt3x files including its subdirectories
+    catalog_file : string
+        file location of the SQLite database, it is created if it does not exist
+    num_jobs : int (optional)
+        the number of worker processes. Defaults to the number of CPUs.
+    pattern : string (optional)
+        the pattern of the file names of the .gt3x files
+    scan_records : boolean (optional)
+        boolean indicating whether all record headers should be read to count the records.
+        This needs to read all of log.bin and is therefore considerably slower.
+
+    Returns
+    -------
+    catalog : DataFrame
+        the catalog as returned by read_catalog
+
+    """
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in fnmatch.filter(names, pattern):
+            path = os.path.abspath(os.path.join(root, name))
+            files[path] = os.stat(path)
+
+    with closing(sqlite3.connect(catalog_file)) as connection, connection:
+        columns = ', '.join(f'{column} {sql_type}' for column, sql_type in CATALOG_COLUMNS.items())
+        connection.execute(f'CREATE TABLE IF NOT EXISTS catalog ({columns})')
+
+        known = {path: (mtime_ns, file_size, n_records) for path, mtime_ns, file_size, n_records
+                 in connection.execute('SELECT path, mtime_ns, file_size, n_records FROM catalog')}
+
+        connection.executemany('DELETE FROM catalog WHERE path = ?', [(path,) for path in known.keys() - files.keys()])
+
+        outdated = [path for path, stat in files.items()
+                    if path not in known
+                    or known[path][:2] != (stat.st_mtime_ns, stat.st_size)
+                    or (scan_records and known[path][2] is None)]
+
+        logging.info('Adding %s of %s files to the catalog', len(outdated), len(files))
+
+        insert = (f'INSERT OR REPLACE INTO catalog ({", ".join(CATALOG_COLUMNS)}) '
+                  f'VALUES ({", ".join(":" + column for column in CATALOG_COLUMNS)})')
+
+        if num_jobs > 1 and len(outdated) > 1:
+            with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+                entries = executor.map(_catalog_entry, outdated, [scan_records] * len(outdated),
+                                       chunksize=max(1, len(outdated) // (4 * num_jobs)))
+                connection.executemany(insert, entries)
+        else:
+            connection.executemany(insert, (_catalog_entry(path, scan_records) for path in outdated))
+
+    return read_catalog(catalog_file)
+
+
+def read_catalog(catalog_file):
+    """
+    Reads a catalog created by build_catalog
+
+    Parameters
+    ----------
+    catalog_file : string
+        file location of the SQLite database
+
+    Returns
+    -------
+    catalog : DataFrame
+        a DataFrame with one row per file, see build_catalog
+
+    """
+    with closing(sqlite3.connect(catalog_file)) as connection:
+        return pd.read_sql_query('SELECT * FROM catalog ORDER BY path', connection)
+
+
+def _catalog_entry(path, scan_records=False):
+    """
+    Reads the catalog entry of a .gt3x file
+
+    Parameters
+    ----------
+    path : string
+        file location of the .gt3x file
+    scan_records : boolean (optional)
+        boolean indicating whether all record headers should be read to count the records
+
+    Returns
+    -------
+    entry : dict
+        the values of all columns of the catalog for this file
+    """
+    stat = os.stat(path)
+    entry = dict.fromkeys(CATALOG_COLUMNS)
+    entry.update(path=path, mtime_ns=stat.st_mtime_ns, file_size=stat.st_size)
+
+    try:
+        with _open_gt3x(path) as archive:
+            meta = _format_meta_data(_extract_info(archive))
+            entry['log_bin_size'] = archive.getinfo('log.bin').file_size
+
+            if scan_records:
+                with _open_log_bin(archive) as log_bin:
+                    index = _build_record_index(log_bin)
+                timestamps = index['timestamp']
+                entry['n_records'] = index.size
+                # the same activity records as decoded by read_gt3x
+                if 'Sample_Rate' in meta:
+                    entry['n_activity_records'] = int(_activity_records(index, meta['Sample_Rate']).size)
+            else:
+                # only the header of the first record is read
+                with archive.open('log.bin') as stream:
+                    header = stream.read(HEADER_SIZE)
+                timestamps = [unpack_from('<I', header, 2)[0]] if len(header) == HEADER_SIZE else []
+
+        entry.update({key.lower(): value for key, value in meta.items()})
+
+        if len(timestamps) > 0:
+            entry['first_record_time'] = _format_timestamp(timestamps[0])
+        if scan_records and len(timestamps) > 0:
+            entry['last_record_time'] = _format_timestamp(timestamps[-1])
+
+        if 'Start_Date' in meta and 'Last_Sample_Time' in meta and 'Sample_Rate' in meta:
+            duration = (pd.Timestamp(meta['Last_Sample_Time']) - pd.Timestamp(meta['Start_Date'])).total_seconds()
+            entry['duration'] = max(duration, 0)
+            entry['expected_samples'] = int(entry['duration'] * meta['Sample_Rate'])
+            # three int16 values per sample
+            entry['expected_decoded_size'] = entry['expected_samples'] * 3 * 2
+    except Exception as e:
+        logging.error('Could not read %s: %s', path, e)
+        entry['error'] = f'{type(e).__name__}: {e}'
+
+    return entry
+
+
+def _format_timestamp(timestamp):
+    """
+    Formats a record timestamp in the same way as the times of the meta data
+
+    Parameters
+    ----------
+    timestamp : int
+        the timestamp of a record in seconds
+
+    Returns
+    -------
+    timestamp : str
+        the timestamp in ISO format
+    """
+    return str(np.datetime64(int(timestamp), 's'))
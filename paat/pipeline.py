@@ -0,0 +1,148 @@
+"""
+Pipeline Module
+---------------
+
+*paat.pipeline* provides functions to run an analysis over many .gt3x files
+while the next files are already read and decoded in the background.
+
+"""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from .io import _map_bounded, read_gt3x
+
+
+def process_files(files, function, prefetch=2, num_jobs=1, use_processes=False,
+                  ordered=True, **kwargs):
+    """
+    Runs an analysis function over many .gt3x files. While the analysis of the current
+    file is running, the next files are read and decoded by a pool of background
+    threads or processes, so reading from disk and computing overlap.
+
+    At most prefetch files are read, decoded or waiting for the analysis at the same
+    time, which bounds the memory needed to prefetch + 1 decoded recordings.
+
+    The analysis function is called with the output of read_gt3x, e.g. as
+    function(data, sample_freq) with the default arguments of read_gt3x or as
+    function(recording) with recording=True. It runs in
+    the thread consuming the results. A file that cannot be read or analysed does
+    not stop the batch, the raised exception is yielded instead of the result.
+
+    Parameters
+    ----------
+    files : iterable of strings
+        file locations of the .gt3x files
+    function : callable
+        the analysis function that is called with the output of read_gt3x
+    prefetch : int (optional)
+        the maximum number of files that are read ahead of the analysis
+    num_jobs : int (optional)
+        the number of background threads or processes reading the files
+    use_processes : boolean (optional)
+        if True, the files are read by worker processes instead of threads. The
+        decoding then does not compete with the analysis for the interpreter, but
+        the decoded data has to be copied between the processes.
+    ordered : boolean (optional)
+        if True, the results are yielded in the order of files, otherwise the files
+        are analysed in the order in which they finish decoding
+    **kwargs
+        further arguments passed on to read_gt3x, e.g. rescale, pandas or metadata
+
+    Yields
+    ------
+    file : string
+        the file location
+    result : object or None
+        the return value of the analysis function, None if the file could not be
+        read or analysed
+    error : Exception or None
+        the exception raised while reading or analysing the file, None on success
+
+    """
+    if num_jobs < 1:
+        raise ValueError(f"num_jobs has to be at least 1, got {num_jobs}")
+
+    if prefetch < 1:
+        raise ValueError(f"prefetch has to be at least 1, got {prefetch}")
+
+    pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    with pool(max_workers=num_jobs) as executor:
+        # the file under analysis counts towards max_in_flight, prefetch files are read
+        # ahead of it
+        outputs = _map_bounded(executor, partial(read_gt3x, **kwargs), files,
+                               ordered=ordered, max_in_flight=prefetch + 1)
+        for file, output, error in outputs:
+            if error is None:
+                try:
+                    # read_gt3x returns a tuple except for a Recording without records
+                    if isinstance(output, tuple):
+                        result = function(*output)
+                    else:
+                        result = function(output)
+                except Exception as e:
+                    logging.error('Could not analyse %s: %s', file, e)
+                    result, error = None, e
+            else:
+                result = None
+
+            # release the decoded data before the next file is handed out
+            output = None
+
+            yield file, result, error
+
+
+async def process_files_async(files, function, prefetch=2, num_jobs=1,
+                              use_processes=False, ordered=True, **kwargs):
+    """
+    Asynchronous version of process_files that can be used within an asyncio event loop
+
+    The files are read and analysed in the same way as by process_files, but the
+    analysis runs in a worker thread, so the event loop is not blocked while the
+    files are processed.
+
+    Parameters
+    ----------
+    files : iterable of strings
+        file locations of the .gt3x files
+    function : callable
+        the analysis function that is called with the output of read_gt3x
+    prefetch : int (optional)
+        the maximum number of files that are read ahead of the analysis
+    num_jobs : int (optional)
+        the number of background threads or processes reading the files
+    use_processes : boolean (optional)
+        if True, the files are read by worker processes instead of threads
+    ordered : boolean (optional)
+        if True, the results are yielded in the order of files
+    **kwargs
+        further arguments passed on to read_gt3x, e.g. rescale, pandas or metadata
+
+    Yields
+    ------
+    file : string
+        the file location
+    result : object or None
+        the return value of the analysis function, None if the file could not be
+        read or analysed
+    error : Exception or None
+        the exception raised while reading or analysing the file, None on success
+
+    """
+    loop = asyncio.get_running_loop()
+    results = process_files(files, function, prefetch=prefetch, num_jobs=num_jobs,
+                            use_processes=use_processes, ordered=ordered, **kwargs)
+    end = object()
+
+    # advance the pipeline in a single worker thread, only one step is running at a time
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while True:
+                result = await loop.run_in_executor(executor, next, results, end)
+                if result is end:
+                    break
+                yield result
+        finally:
+            await loop.run_in_executor(executor, results.close)
@@ -0,0 +1,289 @@
+"""
+Quality Control Module
+----------------------
+
+*paat.quality* provides functions to screen recordings for clipping, stuck axes,
+gaps, resets of the clock and drops of the battery voltage before the analysis.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import cpu_count
+
+import numpy as np
+import pandas as pd
+
+from .io import Recording, _map_bounded, read_gt3x
+
+
+def check_quality(data, records=None, stuck_seconds=10, battery_drop=100,
+                  block_size=2 ** 18):
+    """
+    Creates a quality control report of a recording
+
+    The report is calculated on the raw int16 counts in a single pass over blocks
+    of samples, so no DataFrame or acceleration values in g are created. The checks
+    are
+
+        1. Clipping: samples of any axis at the limit of the measurement range given
+           by Acceleration_Max
+        2. Stuck axes: runs of at least stuck_seconds in which an axis does not change
+           at all, which does not happen for a working sensor even if it lies still
+        3. Gaps: discontinuities of the timestamps, e.g. of the idle sleep mode
+        4. Resets: timestamps jumping backwards, e.g. after a reset of the clock
+        5. Battery drops: decreases of the battery voltage between two consecutive
+           battery records of at least battery_drop mV
+
+    Parameters
+    ----------
+    data : string, file-like object, bytes or Recording
+        a .gt3x file or a Recording
+    records : dict (optional)
+        the battery records of a Recording as returned by read_gt3x(records=True).
+        The battery is not checked for a Recording without records.
+    stuck_seconds : float (optional)
+        the minimum duration in seconds an axis has to be constant to be reported as
+        stuck
+    battery_drop : int (optional)
+        the minimum decrease of the battery voltage in mV to be reported as a drop
+    block_size : int (optional)
+        the number of samples that are checked at once, which bounds the temporary
+        memory
+
+    Returns
+    -------
+    report : dict
+        the quality control report with the keys
+
+        - start, end: the timestamps of the first and the last sample
+        - n_samples, duration: the number of samples and their duration in seconds
+        - clipped_samples, clipped_fraction: the number and fraction of samples with
+          at least one clipped axis
+        - stuck_axes, stuck_duration, longest_stuck: the number of axes with stuck
+          runs, the longest total duration of the stuck runs of an axis and the
+          duration of the longest stuck run in seconds
+        - n_gaps, gap_duration, longest_gap: the number of gaps, their total and
+          longest duration in seconds
+        - n_resets: the number of times the timestamps jump backwards
+        - battery_start, battery_end, battery_min: the first, last and lowest battery
+          voltage in mV
+        - battery_largest_drop, n_battery_drops: the largest decrease of the battery
+          voltage in mV and the number of drops
+        - corrupted_records: the number of records with a wrong checksum
+
+    """
+    if not isinstance(data, Recording):
+        data, records = read_gt3x(data, recording=True, records=True,
+                                  verify_checksums=True)
+
+    recording = data
+    sample_rate = recording.sample_rate
+
+    report = {'start': recording.start if len(recording) > 0 else None,
+              'end': recording.end if len(recording) > 0 else None,
+              'n_samples': len(recording),
+              'duration': len(recording) / sample_rate}
+
+    min_run = int(round(stuck_seconds * sample_rate))
+    report.update(_check_counts(recording, min_run, block_size))
+    report.update(_check_time(recording))
+    report.update(_check_battery(records, battery_drop))
+
+    corrupted = recording.meta.get('Corrupted_Records')
+    report['corrupted_records'] = len(corrupted) if corrupted is not None else None
+
+    return report
+
+
+def check_quality_many(files, num_jobs=cpu_count(), **kwargs):
+    """
+    Creates quality control reports of multiple .gt3x files in parallel
+
+    Only the small reports are sent back from the worker processes, so the files are
+    checked at close to the speed of decoding them. A file that cannot be read does
+    not stop the batch, the exception is reported in the error column instead.
+
+    Parameters
+    ----------
+    files : iterable of strings
+        file locations of the .gt3x files
+    num_jobs : int (optional)
+        the number of worker processes. Defaults to the number of CPUs.
+    **kwargs
+        further arguments passed on to check_quality, e.g. stuck_seconds or battery_drop
+
+    Returns
+    -------
+    reports : DataFrame
+        a DataFrame with one row per file containing the report of check_quality and
+        the column error with the exception raised while checking the file
+
+    """
+    if num_jobs < 1:
+        raise ValueError(f"num_jobs has to be at least 1, got {num_jobs}")
+
+    rows, index = [], []
+    with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+        reports = _map_bounded(executor, partial(check_quality, **kwargs), files,
+                               ordered=True, max_in_flight=2 * num_jobs)
+        for file, report, error in reports:
+            error = repr(error) if error is not None else None
+            rows.append(dict(report or {}, error=error))
+            index.append(file)
+
+    return pd.DataFrame(rows, index=pd.Index(index, name='file'))
+
+
+def _check_counts(recording, min_run, block_size):
+    """
+    Counts the clipped samples and finds the stuck runs of every axis
+
+    Every run of at least min_run equal values contains a whole window of
+    ceil(min_run / 2) samples aligned to multiples of the window length. So only the
+    windows with a constant axis are searched for the exact boundaries of the runs,
+    which keeps the pass over the counts to a few vectorized comparisons.
+
+    Parameters
+    ----------
+    recording : Recording
+        the recording
+    min_run : int
+        the minimum number of samples of a stuck run
+    block_size : int
+        the number of samples that are checked at once
+
+    Returns
+    -------
+    report : dict
+        the clipping and stuck axes part of the report, see check_quality
+    """
+    counts = recording.counts
+    n_samples, n_axes = counts.shape
+
+    # the largest count that can be measured, e.g. 2048 at ±8 g with 256 counts per g,
+    # the last count before it is clipped as well
+    acceleration_max = recording.meta.get('Acceleration_Max')
+    if acceleration_max:
+        limit = int(acceleration_max * recording.acceleration_scale) - 1
+    else:
+        limit = np.iinfo(np.int16).max
+
+    window = max((min_run + 1) // 2, 1)
+    block_size = max(block_size // window, 1) * window
+
+    clipped = 0
+    constant = []
+    for first in range(0, n_samples, block_size):
+        # the axes of the block as contiguous rows make the reductions below fast
+        block = np.ascontiguousarray(counts[first:first + block_size].T)
+
+        is_clipped = (block >= limit) | (block <= -limit)
+        if is_clipped.any():
+            clipped += np.count_nonzero(is_clipped.any(axis=0))
+
+        n_windows = block.shape[1] // window
+        windows = block[:, :n_windows * window].reshape(n_axes, n_windows, window)
+        constant.append(windows.max(axis=2) == windows.min(axis=2))
+
+    if constant:
+        constant = np.concatenate(constant, axis=1).T
+    else:
+        constant = np.zeros((0, n_axes), dtype=bool)
+
+    stuck_axes, stuck_duration, longest_stuck = 0, 0, 0
+    for axis in range(n_axes):
+        candidates = np.flatnonzero(constant[:, axis])
+
+        # consecutive constant windows with the same value belong to the same run
+        starts = candidates * window
+        is_break = (np.diff(candidates) != 1) | (np.diff(counts[starts, axis]) != 0)
+        breaks = np.flatnonzero(is_break) + 1
+        runs = [(group[0] * window, (group[-1] + 1) * window)
+                for group in np.split(candidates, breaks) if group.size > 0]
+
+        total = 0
+        for start, stop in runs:
+            value = counts[start, axis]
+
+            # the run extends into the neighbouring windows by less than a window
+            before = counts[max(start - window, 0):start, axis]
+            changed = np.flatnonzero(before != value)
+            start = max(start - window, 0)
+            start += changed[-1] + 1 if changed.size > 0 else 0
+
+            after = counts[stop:stop + window, axis]
+            changed = np.flatnonzero(after != value)
+            stop = stop + (changed[0] if changed.size > 0 else after.size)
+
+            if stop - start >= min_run:
+                total += stop - start
+                longest_stuck = max(longest_stuck, stop - start)
+
+        stuck_axes += total > 0
+        stuck_duration = max(stuck_duration, total)
+
+    return {'clipped_samples': int(clipped),
+            'clipped_fraction': clipped / n_samples if n_samples > 0 else 0.,
+            'stuck_axes': int(stuck_axes),
+            'stuck_duration': stuck_duration / recording.sample_rate,
+            'longest_stuck': longest_stuck / recording.sample_rate}
+
+
+def _check_time(recording):
+    """
+    Finds the gaps and resets between the segments of a recording
+
+    Parameters
+    ----------
+    recording : Recording
+        the recording
+
+    Returns
+    -------
+    report : dict
+        the gaps and resets part of the report, see check_quality
+    """
+    segments = recording.segments
+
+    starts = segments['start'].astype(np.int64)
+    n_samples = segments['stop'] - segments['first']
+    ends = starts + (n_samples * 10 ** 9) // recording.sample_rate
+
+    # the time between the end of a segment and the start of the next one in seconds
+    between = (starts[1:] - ends[:-1]) / 10 ** 9
+    gaps = between[between > 0]
+
+    return {'n_gaps': int(gaps.size),
+            'gap_duration': float(gaps.sum()),
+            'longest_gap': float(gaps.max()) if gaps.size > 0 else 0.,
+            'n_resets': int(np.count_nonzero(between < 0))}
+
+
+def _check_battery(records, battery_drop):
+    """
+    Finds the drops of the battery voltage
+
+    Parameters
+    ----------
+    records : dict or None
+        the records with the battery voltages
+    battery_drop : int
+        the minimum decrease of the battery voltage in mV to be reported as a drop
+
+    Returns
+    -------
+    report : dict
+        the battery part of the report, see check_quality
+    """
+    if records is None or records['battery'].size == 0:
+        return {'battery_start': None, 'battery_end': None, 'battery_min': None,
+                'battery_largest_drop': None, 'n_battery_drops': None}
+
+    voltage = records['battery']['voltage'].astype(np.int64)
+    drops = -np.diff(voltage)
+
+    return {'battery_start': int(voltage[0]),
+            'battery_end': int(voltage[-1]),
+            'battery_min': int(voltage.min()),
+            'battery_largest_drop': int(max(drops.max(), 0)) if drops.size > 0 else 0,
+            'n_battery_drops': int(np.count_nonzero(drops >= battery_drop))}
@@ -12,11 +12,12 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
 import pandas as pd
 import numpy as np
-import tensorflow as tf
-import keras
 
+from . import inference
+from .io import Recording
 
-def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min", means=None, stds=None, model=None):
+
+def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min", means=None, stds=None, model=None, engine="tensorflow"):
     """
     Infer time in bed from raw acceleration signal using the method of Weitz et al. (2025).
 
@@ -28,8 +29,8 @@ def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min",
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     sample_freq : int
         the sampling frequency in which the data was recorded
     resampled_frequency : str (optional)
@@ -42,7 +43,11 @@ def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min",
         a numpy array with the channel stds, will be calculated for the sample
         if not specified
     model : keras.Model (optional)
-        a loaded keras custom model.
+        a loaded keras custom model. Defaults to the bundled model, which is loaded once
+        per process and taken from the cache of paat.inference afterwards.
+    engine : str (optional)
+        the engine running the bundled model, 'tensorflow' or 'numpy'. The NumPy engine
+        does not need TensorFlow and matches its output up to rounding errors.
 
     Returns
     -------
@@ -52,6 +57,9 @@ def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min",
     """
     n_data = len(data)
 
+    if isinstance(data, Recording):
+        data = data.to_pandas(dtype=np.float32)
+
     if resampled_frequency:
         data = data[['X', 'Y', 'Z']].resample(resampled_frequency).mean()
 
@@ -66,12 +74,11 @@ def detect_time_in_bed_weitz2024(data, sample_freq, resampled_frequency="1min",
     # Normalize input
     X = (X - means) / stds        
 
-    # Load model if not specified
+    # Load model if not specified, it is only loaded once per process
     if not model:
-        model_path = os.path.join(os.path.pardir, os.path.dirname(__file__), 'models', 'TIB_model.pb')
-        model= keras.layers.TFSMLayer(model_path, call_endpoint='serving_default')
+        model = inference.load_model('TIB_model', engine=engine)
 
-    predictions = (model(X[np.newaxis])["output_0"].numpy().squeeze() >= .5)
+    predictions = (np.asarray(model(X[np.newaxis])["output_0"]).squeeze() >= .5)
 
     seconds = pd.Timedelta(resampled_frequency).seconds
     # Slices the predictions to the length of the provided data
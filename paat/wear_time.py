@@ -7,6 +7,7 @@ raw acceleration signals.
 
 """
 import logging
+import math
 import os
 import sys
 
@@ -14,16 +15,19 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
 import numpy as np
 import pandas as pd
-# from tensorflow.keras import models
-import keras
+from numpy.lib.stride_tricks import sliding_window_view
 
-from . import preprocessing, features
+from . import features, inference, preprocessing
+from .io import _acceleration_values
 
 
 def _find_candidate_non_wear_segments_from_raw(acc_data, std_threshold, hz, min_segment_length=1, sliding_window=1, use_vmu=False):
     """
     Find segements within the raw acceleration data that can potentially be non-wear time (finding the candidates)
 
+    The standard deviations of all windows are calculated at once on a reshape of the data into full windows, and the candidates are kept as
+    start and stop indexes of their runs instead of a vector or a list of indexes with the size of the raw data.
+
     Parameters
     ----------
     acc_data : np.array(samples, axes)
@@ -41,8 +45,8 @@ def _find_candidate_non_wear_segments_from_raw(acc_data, std_threshold, hz, min_
 
     Returns
     -------
-    nw_vector_final: array_like
-        a numpy array with candidate non-wear time periods
+    starts, stops : np.array (n_segments,)
+        the first index and the index after the last sample of each candidate non-wear segment, sorted and not overlapping
     """
 
     # adjust the sliding window to match the samples per second (this is encoded in the samplign frequency)
@@ -50,78 +54,93 @@ def _find_candidate_non_wear_segments_from_raw(acc_data, std_threshold, hz, min_
     # adjust the minimum segment lenght to reflect minutes
     min_segment_length *= hz * 60
 
-    # define new non wear time vector that we initiale to all 1s, so we only have the change when we have non wear time as it is encoded as 0
-    nw_vector = np.ones((len(acc_data), 1), dtype=np.uint8)
-    nw_vector_final = np.ones((len(acc_data), 1), dtype=np.uint8)
-
-    # loop over slices of the data
-    for ii in range(0, len(acc_data), sliding_window):
+    # check which windows have a standard deviation below the threshold for all of the axes (or for the VMU)
+    std = _window_std(acc_data, sliding_window, use_vmu=use_vmu)
+    is_non_wear = np.all(std <= std_threshold, axis=1)
 
-        # slice the data
-        data = acc_data[ii:ii + sliding_window]
+    # consecutive non-wear windows form a single range, a range ends at the end of the data at the latest
+    changes = np.flatnonzero(np.diff(is_non_wear.astype(np.int8), prepend=0, append=0))
+    range_starts = changes[0::2] * sliding_window
+    range_stops = np.minimum(changes[1::2] * sliding_window, len(acc_data))
 
-        # calculate VMU if set to true
-        if use_vmu:
-            # calculate the VMU of XYZ
-            data = features.calculate_vector_magnitude(data)
+    starts, stops = [], []
+    for start_slice, end_slice in zip(range_starts, range_stops - 1):
 
-        # calculate the standard deviation of each column (YXZ)
-        std = np.std(data, axis=0)
+        # backwards search to find the edge of non-wear time vector
+        start_slice = _backward_search_non_wear_time(data=acc_data, start_slice=start_slice, end_slice=end_slice, std_max=std_threshold, hz=hz)
+        # forward search to find the edge of non-wear time vector
+        end_slice = _forward_search_non_wear_time(data=acc_data, start_slice=start_slice, end_slice=end_slice, std_max=std_threshold, hz=hz)
 
-        # check if all of the standard deviations are below the standard deviation threshold
-        if np.all(std <= std_threshold):
+        # minimum length of the non-wear time
+        if end_slice - start_slice >= min_segment_length:
+            starts.append(start_slice)
+            stops.append(end_slice)
 
-            # add the non-wear time encoding to the non-wear-vector for the correct time slices
-            nw_vector[ii:ii + sliding_window] = 0
+    return _merge_ranges(np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64))
 
-    # find all indexes of the numpy array that have been labeled non-wear time
-    non_wear_indexes = np.where(nw_vector == 0)[0]
 
-    # find the min and max of those ranges, and increase incrementally to find the edges of the non-wear time
-    for row in _find_consecutive_index_ranges(non_wear_indexes):
-
-        # check if not empty
-        if row.size != 0:
+def _window_std(acc_data, window, use_vmu=False, chunk_size=2 ** 22):
+    """
+    Calculate the standard deviation of consecutive windows of the acceleration data
 
-            # define the start and end of the index range
-            start_slice, end_slice = np.min(row), np.max(row)
+    Parameters
+    ----------
+    acc_data : np.array(samples, axes)
+        numpy array with acceleration data
+    window : int
+        number of samples of each window, the last window contains the remaining samples
+    use_vmu : bool (optional)
+        if True, the standard deviation of the vector magnitude is calculated instead of the one of each axis
+    chunk_size : int (optional)
+        the approximate number of samples that are processed at once, which bounds the temporary memory of the vector magnitude
 
-            # backwards search to find the edge of non-wear time vector
-            start_slice = _backward_search_non_wear_time(data=acc_data, start_slice=start_slice, end_slice=end_slice, std_max=std_threshold, hz=hz)
-            # forward search to find the edge of non-wear time vector
-            end_slice = _forward_search_non_wear_time(data=acc_data, start_slice=start_slice, end_slice=end_slice, std_max=std_threshold, hz=hz)
+    Returns
+    -------
+    std : np.array (n_windows, n_axes)
+        the standard deviation of each window, n_axes is 1 for the vector magnitude
+    """
+    def std_of(data, num_windows):
+        if use_vmu:
+            data = features.calculate_vector_magnitude(data)
+        return np.std(data.reshape(num_windows, -1, data.shape[1]), axis=1)
 
-            # calculate the length of the slice (or segment)
-            length_slice = end_slice - start_slice
+    num_full = len(acc_data) // window
+    step = max(chunk_size // window, 1)
 
-            # minimum length of the non-wear time
-            if length_slice >= min_segment_length:
+    stds = [std_of(acc_data[first * window:min(first + step, num_full) * window], min(step, num_full - first))
+            for first in range(0, num_full, step)]
 
-                # update numpy array by setting the start and end of the slice to zero (this is a non-wear candidate)
-                nw_vector_final[start_slice:end_slice] = 0
+    # the remaining samples at the end form a shorter window
+    if num_full * window < len(acc_data):
+        stds.append(std_of(acc_data[num_full * window:], 1))
 
-    # return non wear vector with 0= non-wear and 1 = wear
-    return nw_vector_final
+    return np.concatenate(stds) if stds else np.zeros((0, 1 if use_vmu else acc_data.shape[1]))
 
 
-def _find_consecutive_index_ranges(vector, increment=1):
+def _merge_ranges(starts, stops):
     """
-    Find ranges of consequetive indexes in numpy array
+    Merge overlapping or bordering ranges
 
     Parameters
     ----------
-    vector: numpy vector
-        numpy vector of integer values
-    increment: int (optional)
-        difference between two values (typically 1)
+    starts, stops: np.array (n_ranges,)
+        the first index and the index after the last one of each range
 
     Returns
     -------
-    indexes: list
-        list of ranges, for instance [1,2,3,4],[8,9,10], [44]
+    starts, stops : np.array (n_merged,)
+        the sorted and merged ranges
     """
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], stops[order]
 
-    return np.split(vector, np.where(np.diff(vector) != increment)[0] + 1)
+    # a range starts a new merged range if it begins after all previous ranges ended
+    ends = np.maximum.accumulate(stops)
+    first = np.ones(starts.size, dtype=bool)
+    first[1:] = starts[1:] > ends[:-1]
+
+    last = np.append(np.flatnonzero(first)[1:] - 1, starts.size - 1).astype(np.int64) if starts.size > 0 else np.zeros(0, dtype=np.int64)
+    return starts[first], ends[last]
 
 
 def _forward_search_non_wear_time(data, start_slice, end_slice, std_max, hz, time_step=60):
@@ -152,24 +171,10 @@ def _forward_search_non_wear_time(data, start_slice, end_slice, std_max, hz, tim
     # adjust time step on number of samples per time step window
     time_step *= hz
 
-    # define the end of the range
-    end_of_data = len(data)
-
-    # Do-while loop
-    while True:
+    # number of time steps that can be added before the end of the data is reached
+    num_steps = _count_still_steps(data, start_slice, end_slice, time_step, std_max, (len(data) - end_slice) // time_step)
 
-        # define temporary end_slice variable with increase by step
-        temp_end_slice = end_slice + time_step
-
-        # check condition range still contains non-wear time
-        if temp_end_slice <= end_of_data and np.all(np.std(data[start_slice:temp_end_slice], axis=0) <= std_max):
-
-            # update the end_slice with the temp end slice value
-            end_slice = temp_end_slice
-
-        else:
-            # here we have found that the additional time we added is not non-wear time anymore, stop and break from the loop by returning the updated slice
-            return end_slice
+    return end_slice + num_steps * time_step
 
 
 def _backward_search_non_wear_time(data, start_slice, end_slice, std_max, hz, time_step=60):
@@ -200,23 +205,82 @@ def _backward_search_non_wear_time(data, start_slice, end_slice, std_max, hz, ti
     # adjust time step on number of samples per time step window
     time_step *= hz
 
-    # Do-while loop
-    while True:
+    # number of time steps that can be added before the start of the data is reached
+    num_steps = _count_still_steps(data, start_slice, end_slice, time_step, std_max, start_slice // time_step, backward=True)
 
-        # define temporary end_slice variable with increase by step
-        temp_start_slice = start_slice - time_step
+    return start_slice - num_steps * time_step
 
-        # logging.debug('Decreasing temp_start_slice to: {}'.format(temp_start_slice))
 
-        # check condition range still contains non-wear time
-        if temp_start_slice >= 0 and np.all(np.std(data[temp_start_slice:end_slice], axis=0) <= std_max):
+def _count_still_steps(data, start_slice, end_slice, time_step, std_max, max_steps, backward=False, chunk_steps=1):
+    """
+    Count the time steps by which a range can be extended while the standard deviation of the whole extended range stays below the threshold
 
-            # update the start slice with the new temp value
-            start_slice = temp_start_slice
+    The statistics of each time step are calculated once and merged into the statistics of the growing range with the parallel algorithm of
+    Chan et al., so the data of the range is not processed again for every time step. The time steps are processed in chunks that double in
+    size, which keeps the work close to the length of the extension.
 
+    Parameters
+    ----------
+    data: numpy array of time x 3 axis
+        raw log data
+    start_slice: int
+        start of known non-wear time range
+    end_slice: int
+        end of known non-wear time range
+    time_step: int
+        the number of samples of each time step
+    std_max: int or float
+        the standard deviation threshold in g
+    max_steps: int
+        the maximum number of time steps before the start or the end of the data is reached
+    backward: bool (optional)
+        if True, the range is extended before start_slice, otherwise after end_slice
+    chunk_steps: int (optional)
+        the number of time steps of the first chunk
+
+    Returns
+    -------
+    num_steps: int
+        the number of time steps the range can be extended by
+    """
+
+    # statistics of the known range, the means of the time steps are taken relative to its mean to avoid cancellation
+    base = data[start_slice:end_slice].astype(np.float64)
+    base_mean = base.mean(axis=0) if len(base) > 0 else np.zeros(data.shape[1])
+    count, total, total_sq, m2 = len(base), 0., 0., ((base - base_mean) ** 2).sum(axis=0)
+
+    num_steps = 0
+    while num_steps < max_steps:
+        num_chunk = min(chunk_steps, max_steps - num_steps)
+
+        if backward:
+            stop = start_slice - num_steps * time_step
+            mean, step_m2, _, _ = _block_statistics(data[stop - num_chunk * time_step:stop], time_step)
+            # the time step closest to the range comes first
+            mean, step_m2 = mean[::-1], step_m2[::-1]
         else:
-            # here we have found that the additional time we added is not non-wear time anymore, stop and break from the loop by returning the updated slice
-            return start_slice
+            first = end_slice + num_steps * time_step
+            mean, step_m2, _, _ = _block_statistics(data[first:first + num_chunk * time_step], time_step)
+
+        # merge the time steps one after the other into the statistics of the range
+        deviation = mean - base_mean
+        counts = count + time_step * np.arange(1, num_chunk + 1)[:, None]
+        totals = total + time_step * np.cumsum(deviation, axis=0)
+        totals_sq = total_sq + time_step * np.cumsum(deviation ** 2, axis=0)
+        m2s = m2 + np.cumsum(step_m2, axis=0)
+
+        std = np.sqrt(np.maximum(m2s + totals_sq - totals ** 2 / counts, 0) / counts)
+
+        # the search stops at the first time step for which the standard deviation of the range exceeds the threshold
+        exceeded = np.flatnonzero(~np.all(std <= std_max, axis=1))
+        if exceeded.size > 0:
+            return num_steps + exceeded[0]
+
+        num_steps += num_chunk
+        count, total, total_sq, m2 = counts[-1, 0], totals[-1], totals_sq[-1], m2s[-1]
+        chunk_steps *= 2
+
+    return num_steps
 
 
 def _group_episodes(episodes, distance_in_min=3, correction=3, hz=100, training=False):
@@ -329,7 +393,7 @@ def _group_episodes(episodes, distance_in_min=3, correction=3, hz=100, training=
 
 
 def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_threshold=0.004, distance_in_min=5, episode_window_sec=7, edge_true_or_false=True,
-                                  start_stop_label_decision='and', min_segment_length=1, sliding_window=1, verbose=False):
+                                  start_stop_label_decision='and', min_segment_length=1, sliding_window=1, verbose=False, engine="tensorflow"):
     """
     Infer non-wear time from raw 100Hz triaxial data based on the method proposed by Syed et al. (2021). 
     Data at different sample frequencies will be resampled to 100hz.
@@ -369,12 +433,13 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     sample_freq : int
         sample frequency of the data. The CNN model was trained for 100Hz of data. If the data is at a different sampling frequency it will be resampled to 100Hz
     cnn_model_file: os.path (optional)
-        file location of the trained CNN model. On default, the corresponding pretrained model is used.
+        file location of the trained CNN model or the name of a bundled model (see paat.inference.MODELS). On default, the corresponding pretrained model is used.
+        The model is loaded once per process and taken from the cache of paat.inference afterwards.
     std_threshold: float (optional)
         standard deviation threshold to find candidate non-wear episodes. Default 0.004 g
     distance_in_min: int (optional)
@@ -399,6 +464,9 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
         sliding window in minutes that will go over the acceleration data to find candidate non-wear segments
     verbose: Bool (optional)
         set to True if debug messages should be printed to the console and log file. Default False.
+    engine: str (optional)
+        the engine running the CNN model, 'tensorflow' or 'numpy'. The NumPy engine does not need TensorFlow and matches its output up to rounding
+        errors. With the numpy engine, cnn_model_file has to be a file exported by paat.inference.export_model.
 
     Returns
     -------
@@ -411,11 +479,11 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
     -    CNN models were trained with a hip worn accelerometer.
     """
 
-    raw_acc = data[["X", "Y", "Z"]].values
+    raw_acc = _acceleration_values(data, ("X", "Y", "Z"))
 
     # use one of the default models if no model file is given
     if cnn_model_file is None:
-        cnn_model_file = os.path.join(os.path.pardir, os.path.dirname(__file__), 'models', f'cnn_v2_{str(episode_window_sec)}.pb')
+        cnn_model_file = f'cnn_v2_{episode_window_sec}'
 
     # check if data is triaxial
     if raw_acc.shape[1] != 3:
@@ -434,30 +502,19 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
     # create new non-wear vector that is prepopulated with wear-time encoding. This way we only have to record the non-wear time
     nw_vector = np.zeros(raw_acc.shape[0], dtype=bool)
 
-    # get candidate non-wear episodes (note that these are on a minute resolution). Also note that it returns wear time as 1 and non-wear time as 0
-    nw_episodes = _find_candidate_non_wear_segments_from_raw(acc_data=raw_acc, std_threshold=std_threshold,
-                                                             min_segment_length=min_segment_length,
-                                                             sliding_window=sliding_window, hz=sample_freq)
-
-    # find all indexes of the numpy array that have been labeled non-wear time
-    nw_indexes = np.where(nw_episodes == 0)[0]
-    # find consecutive ranges
-    non_wear_segments = _find_consecutive_index_ranges(nw_indexes)
+    # get candidate non-wear episodes (note that these are on a minute resolution) as the start and stop indexes of each episode
+    starts, stops = _find_candidate_non_wear_segments_from_raw(acc_data=raw_acc, std_threshold=std_threshold,
+                                                               min_segment_length=min_segment_length,
+                                                               sliding_window=sliding_window, hz=sample_freq)
     # empty dictionary where we can store the start and stop times
     dic_segments = {}
 
-    # check if segments are found
-    if len(non_wear_segments[0]) > 0:
-
-        # find start and stop times (the indexes of the edges and find corresponding time)
-        for ii, row in enumerate(non_wear_segments):
-
-            # find start and stop
-            start, stop = np.min(row), np.max(row)
+    # find start and stop times (the stop is the index of the last sample of the episode)
+    for ii, (start, stop) in enumerate(zip(starts, stops - 1)):
 
-            # add the start and stop times to the dictionary
-            # note that start and stop timestamps are not given.
-            dic_segments[ii] = {'counter': ii, 'start': start, 'start_index': start, 'stop': stop, 'stop_index': stop}
+        # add the start and stop times to the dictionary
+        # note that start and stop timestamps are not given.
+        dic_segments[ii] = {'counter': ii, 'start': start, 'start_index': start, 'stop': stop, 'stop_index': stop}
 
     # create dataframe from segments
     episodes = pd.DataFrame.from_dict(dic_segments)
@@ -465,10 +522,14 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
     # Merge episodes that are close to each other
     grouped_episodes = _group_episodes(episodes=episodes.T, distance_in_min=distance_in_min, correction=3, hz=sample_freq, training=False).T
 
-    # load CNN model
-    cnn_model = keras.layers.TFSMLayer(cnn_model_file, call_endpoint='serving_default')
+    # load CNN model, it is only loaded once per process
+    cnn_model = inference.load_model(cnn_model_file, engine=engine)
 
-    # For each episode, extend the edges, create features and infer label
+    # number of samples of the windows at the start and the stop of an episode
+    episode_window = episode_window_sec * sample_freq
+
+    # For each episode, extend the edges and collect the windows at the start and the stop of the episode, so the labels of all windows can be inferred at once
+    edges, windows = [], []
     for _, row in grouped_episodes.iterrows():
 
         start_index = int(row.loc['start_index'])
@@ -483,49 +544,24 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
         start_index = _backward_search_episode(raw_acc, start_index, hz=sample_freq, max_search_min=5, std_threshold=std_threshold, verbose=verbose)
 
         # get start episode
-        start_episode = raw_acc[start_index - (episode_window_sec * sample_freq): start_index]
+        start_episode = raw_acc[start_index - episode_window: start_index]
         # get stop episode
-        stop_episode = raw_acc[stop_index: stop_index + (episode_window_sec * sample_freq)]
-
-        # default label for start and stop combined. The first False will turn into True if the start of the episode is inferred as non-wear time. The same happens to the
-        # second False when the end is inferred as non-weaer time
-        start_stop_label = [False, False]
-
-        # Start episode
-        if start_episode.shape[0] == episode_window_sec * sample_freq:
+        stop_episode = raw_acc[stop_index: stop_index + episode_window]
 
-            # reshape into num feature x time x axes
-            start_episode = start_episode.reshape(1, start_episode.shape[0], start_episode.shape[1])
+        # an episode right at the start or the end of the data has no full window there, its label is given by edge_true_or_false instead
+        has_start, has_stop = start_episode.shape[0] == episode_window, stop_episode.shape[0] == episode_window
+        windows.extend(episode for episode, is_full in ((start_episode, has_start), (stop_episode, has_stop)) if is_full)
+        edges.append((start_index, stop_index, has_start, has_stop))
 
-            # get binary class from model
-            start_label = (cnn_model(start_episode)["output_0"].numpy().squeeze() >= .5).astype("int32")
+    # get binary class from model for all windows, True (1) for non-wear time
+    labels = iter(_predict_windows(cnn_model, windows))
 
-            # if the start label is 1, this means that it is wear time, and we set the first start_stop_label to 1
-            if start_label == 1:
-                start_stop_label[0] = True
+    for start_index, stop_index, has_start, has_stop in edges:
 
-        else:
-            # there is an episode right at the start of the data, since we cannot obtain a full epsisode_window_sec array
-            # here we say that True for nw-time and False for wear time
-            start_stop_label[0] = edge_true_or_false
-
-        # Stop episode
-        if stop_episode.shape[0] == episode_window_sec * sample_freq:
-
-            # reshape into num feature x time x axes
-            stop_episode = stop_episode.reshape(1, stop_episode.shape[0], stop_episode.shape[1])
-
-            # get binary class from model
-            stop_label = (cnn_model(stop_episode)["output_0"].numpy().squeeze() >= .5).astype("int32")
-            
-
-            # if the start label is 1, this means that it is wear time, and we set the first start_stop_label to 1
-            if stop_label == 1:
-                start_stop_label[1] = True
-        else:
-            # there is an episode right at the END of the data, since we cannot obtain a full epsisode_window_sec array
-            # here we say that True for nw-time and False for wear time
-            start_stop_label[1] = edge_true_or_false
+        # label for start and stop combined. The first is True if the start of the episode is inferred as non-wear time, the second if the end is inferred as non-wear time.
+        # If there is no full window at the start or the end of the data, we say that True for nw-time and False for wear time
+        start_stop_label = [bool(next(labels)) if has_start else edge_true_or_false,
+                            bool(next(labels)) if has_stop else edge_true_or_false]
 
         # check the start_stop_label.
         if start_stop_label_decision == 'or':
@@ -554,6 +590,34 @@ def detect_non_wear_time_syed2021(data, sample_freq, cnn_model_file=None, std_th
     return nw_vector
 
 
+def _predict_windows(cnn_model, windows, batch_size=1024):
+    """
+    Infer the labels of windows of acceleration data with a few batched calls of the CNN model
+
+    Parameters
+    ----------
+    cnn_model : keras.layers.TFSMLayer or paat.inference.NumpyModel
+        the CNN model
+    windows : list of np.array (n_samples, 3)
+        the windows of acceleration data, all of the same length
+    batch_size : int (optional)
+        the maximum number of windows that are inferred in a single call, which bounds the memory of the model
+
+    Returns
+    -------
+    labels : np.array (n_windows,)
+        True for the windows that are inferred as non-wear time
+    """
+    if len(windows) == 0:
+        return np.zeros(0, dtype=bool)
+
+    # stack the windows into num feature x time x axes
+    windows = np.stack(windows)
+
+    return np.concatenate([np.asarray(cnn_model(windows[first:first + batch_size])["output_0"]).reshape(-1) >= .5
+                           for first in range(0, len(windows), batch_size)])
+
+
 def detect_non_wear_time_hees2011(data, sample_freq, min_non_wear_time_window=60, window_overlap=15, std_mg_threshold=3.0, std_min_num_axes=2,
                                   value_range_mg_threshold=50.0, value_range_min_num_axes=2):
     """
@@ -583,8 +647,8 @@ def detect_non_wear_time_hees2011(data, sample_freq, min_non_wear_time_window=60
 
     Parameters
     ----------
-    data : DataFrame
-        a DataFrame containg the raw acceleration data
+    data : DataFrame or Recording
+        a DataFrame containg the raw acceleration data or a Recording
     sample_freq : int
         sample frequency in hertz. Indicates the number of samples per 1 second. Default to 100 for 100hz. The sample frequency is necessary to
         know how many samples there are in a specific window. So let's say we have a window of 15 minutes, then there are hz * 60 * 15 samples
@@ -610,7 +674,7 @@ def detect_non_wear_time_hees2011(data, sample_freq, min_non_wear_time_window=60
         a numpy array indicating whether the values of the acceleration data are non-wear time
     """
 
-    raw_acc = data[["X", "Y", "Z"]].values
+    raw_acc = _acceleration_values(data, ("X", "Y", "Z"))
 
     # number of data samples in 1 minute
     num_samples_per_min = sample_freq * 60
@@ -628,42 +692,91 @@ def detect_non_wear_time_hees2011(data, sample_freq, min_non_wear_time_window=60
     # deal with non-wear time, since everything else is already set as wear-time.
     nw_vector = np.zeros(raw_acc.shape[0], dtype=bool)
 
-    # loop over the data, start from the beginning with a step size of window overlap
-    for ii in range(0, len(raw_acc), window_overlap):
+    # the windows start every window_overlap samples, windows which are not full at the end of the data are skipped
+    num_windows = (len(raw_acc) - min_non_wear_time_window) // window_overlap + 1
+    if num_windows < 1:
+        return nw_vector
 
-        # define the start of the sequence
-        start = ii
-        # define the end of the sequence
-        end = ii + min_non_wear_time_window
+    # every window consists of whole blocks whose length divides both the window and the window overlap, so the statistics of each block are
+    # calculated only once and then merged into the statistics of the overlapping windows
+    block_size = math.gcd(min_non_wear_time_window, window_overlap)
+    blocks_per_window = min_non_wear_time_window // block_size
+    blocks_per_step = window_overlap // block_size
+    num_blocks = (num_windows - 1) * blocks_per_step + blocks_per_window
 
-        # slice the data from start to end
-        subset_data = raw_acc[start:end]
+    mean, m2, minimum, maximum = _block_statistics(raw_acc[:num_blocks * block_size], block_size)
 
-        # check if the data sequence has been exhausted, meaning that there are no full windows left in the data sequence (this happens at the end of the sequence)
-        # comment out if you want to use all the data
-        if len(subset_data) < min_non_wear_time_window:
-            break
+    # merge the means and the sums of squared deviations of the blocks of every window (parallel algorithm of Chan et al. for blocks of equal size),
+    # which avoids the cancellation of the naive sum of squares
+    def windows(block_values):
+        # the blocks of each window as the last axis
+        return sliding_window_view(block_values, blocks_per_window, axis=0)[::blocks_per_step]
 
-        # calculate the standard deviation of each column (YXZ)
-        std = np.std(subset_data, axis=0)
+    window_mean = windows(mean).mean(axis=2)
+    window_m2 = windows(m2).sum(axis=2) + block_size * ((windows(mean) - window_mean[..., None]) ** 2).sum(axis=2)
+    std = np.sqrt(window_m2 / min_non_wear_time_window)
 
-        # check if the standard deviation is below the threshold, and if the number of axes the standard deviation is below equals the std_min_num_axes threshold
-        if (std < std_mg_threshold).sum() >= std_min_num_axes:
+    # the value range of each window from the sliding minimum and maximum of the blocks
+    value_range = windows(maximum).max(axis=2) - windows(minimum).min(axis=2)
 
-            # at least 'std_min_num_axes' are below the standard deviation threshold of 'std_min_num_axes', now set this subset of the data to the non-wear time encoding.
-            # Note that the full 'new_wear_vector' is pre-populated with the wear time encoding, so we only have to set the non-wear time.
-            nw_vector[start:end] = True
+    # a window is non-wear time if the standard deviation or the value range is below the threshold for enough axes
+    non_wear = (((std < std_mg_threshold).sum(axis=1) >= std_min_num_axes)
+                | ((value_range < value_range_mg_threshold).sum(axis=1) >= value_range_min_num_axes))
 
-        # calculate the value range (difference between the min and max) (here the point-to-point numpy method is used) for each column
-        value_range = np.ptp(subset_data, axis=0)
+    # set the samples of all non-wear windows at once by counting the windows which start and end before each sample
+    starts = np.flatnonzero(non_wear) * window_overlap
+    changes = np.zeros(len(raw_acc) + 1, dtype=np.int64)
+    np.add.at(changes, starts, 1)
+    np.add.at(changes, starts + min_non_wear_time_window, -1)
+    nw_vector = np.cumsum(changes[:-1]) > 0
 
-        # check if the value range, for at least 'value_range_min_num_axes' (e.g. 2) out of three axes, was less than 'value_range_mg_threshold' (e.g. 50) mg
-        if (value_range < value_range_mg_threshold).sum() >= value_range_min_num_axes:
+    return nw_vector
 
-            # set the non wear vector to non-wear time for the start to end slice of the data
-            nw_vector[start:end] = True
 
-    return nw_vector
+def _block_statistics(values, block_size, chunk_size=2 ** 18):
+    """
+    Calculates the mean, sum of squared deviations from the mean, minimum and maximum of consecutive blocks of samples
+
+    The samples are transposed chunk by chunk while they are in the cache, so that all reductions run over contiguous rows of a single axis.
+
+    Parameters
+    ----------
+    values : np.array (n_samples, n_axes)
+        the acceleration values, n_samples has to be a multiple of block_size
+    block_size : int
+        the number of samples of each block
+    chunk_size : int (optional)
+        the approximate number of samples that are processed at once, which bounds the temporary memory
+
+    Returns
+    -------
+    mean, m2, minimum, maximum : np.array (n_blocks, n_axes)
+        the statistics of each block
+    """
+    num_blocks, num_axes = len(values) // block_size, values.shape[1]
+
+    mean = np.empty((num_blocks, num_axes))
+    m2 = np.empty_like(mean)
+    minimum = np.empty_like(mean)
+    maximum = np.empty_like(mean)
+
+    step = max(chunk_size // block_size, 1)
+    for first in range(0, num_blocks, step):
+        last = min(first + step, num_blocks)
+        chunk = np.ascontiguousarray(values[first * block_size:last * block_size].T).reshape(num_axes, -1, block_size)
+
+        minimum[first:last] = chunk.min(axis=2).T
+        maximum[first:last] = chunk.max(axis=2).T
+
+        # the squared deviations from the mean of each block replace the chunk in place
+        chunk_mean = chunk.mean(axis=2)
+        chunk -= chunk_mean[..., None]
+        chunk *= chunk
+
+        mean[first:last] = chunk_mean.T
+        m2[first:last] = chunk.sum(axis=2).T
+
+    return mean, m2, minimum, maximum
 
 
 def detect_non_wear_time_naive(data, sample_freq, std_threshold, min_interval, use_vmu=False, min_segment_length=1, sliding_window=1):
@@ -673,8 +786,8 @@ def detect_non_wear_time_naive(data, sample_freq, std_threshold, min_interval, u
 
         Parameters
         ----------
-        data : DataFrame
-            a DataFrame containg the raw acceleration data
+        data : DataFrame or Recording
+            a DataFrame containg the raw acceleration data or a Recording
         sample_freq : int
             sample frequency of the data
         std_threshold: int or float
@@ -694,7 +807,7 @@ def detect_non_wear_time_naive(data, sample_freq, std_threshold, min_interval, u
             a numpy array indicating whether the values of the acceleration data are non-wear time
     """
 
-    raw_acc = data[["X", "Y", "Z"]].values
+    raw_acc = _acceleration_values(data, ("X", "Y", "Z"))
 
     # make sure hz is int
     sample_freq = int(sample_freq)
@@ -706,35 +819,23 @@ def detect_non_wear_time_naive(data, sample_freq, std_threshold, min_interval, u
         FIND CANDIDATE NON-WEAR SEGMENTS ACTIGRAPH ACCELERATION DATA
     """
 
-    # get candidate non-wear episodes (note that these are on a minute resolution)
-    nw_episodes = _find_candidate_non_wear_segments_from_raw(acc_data=raw_acc, std_threshold=std_threshold, min_segment_length=min_segment_length, sliding_window=sliding_window, hz=sample_freq, use_vmu=use_vmu)
+    # get candidate non-wear episodes (note that these are on a minute resolution) as the start and stop indexes of each episode
+    starts, stops = _find_candidate_non_wear_segments_from_raw(acc_data=raw_acc, std_threshold=std_threshold, min_segment_length=min_segment_length, sliding_window=sliding_window, hz=sample_freq, use_vmu=use_vmu)
 
     """
         GET START AND END TIME OF NON WEAR SEGMENTS
     """
 
-    # find all indexes of the numpy array that have been labeled non-wear time. Note that the function _find_candidate_non_wear_segments_from_raw returns
-    # non-wear episodes as 1, and wear time as 1
-    nw_indexes = np.where(nw_episodes == 0)[0]
-    # find consecutive ranges
-    non_wear_segments = _find_consecutive_index_ranges(nw_indexes)
-
-    # check if segments are found
-    if len(non_wear_segments[0]) > 0:
-
-        # find start and stop times (the indexes of the edges and find corresponding time)
-        for _, row in enumerate(non_wear_segments):
-
-            # find start and stop
-            start, stop = np.min(row), np.max(row)
+    # find start and stop times (the stop is the index of the last sample of the episode)
+    for start, stop in zip(starts, stops - 1):
 
-            # calculate lenght of episode in minutes
-            length = int((stop - start) / sample_freq / 60)
+        # calculate lenght of episode in minutes
+        length = int((stop - start) / sample_freq / 60)
 
-            # check if length exceeds threshold, if so, then this is non-wear time
-            if length >= min_interval:
-                # now update nw vector
-                nw_vector[start:stop] = True
+        # check if length exceeds threshold, if so, then this is non-wear time
+        if length >= min_interval:
+            # now update nw vector
+            nw_vector[start:stop] = True
 
     # return values
     return nw_vector
@@ -745,42 +846,15 @@ def _forward_search_episode(acc_data, index, hz, max_search_min, std_threshold,
     When we have an episode, this was created on a minute resolution, here we do a forward search to find the edges of the episode with a second resolution
     """
 
-    # calculate max slice index
-    max_slice_index = acc_data.shape[0]
-
-    for ii in range(hz * 60 * max_search_min):
-
-        # create new slices
-        new_start_slice = index
-        new_stop_slice = index + hz
-
-        if verbose:
-            logging.info('i: %s, new_start_slice: %s, new_stop_slice: %s', ii, new_start_slice, new_stop_slice)
-
-        # check if the new stop slice exceeds the max_slice_index
-        if new_stop_slice > max_slice_index:
-            if verbose:
-                logging.info('Max slice index reached: %s', max_slice_index)
-            break
-
-        # slice out new activity data
-        slice_data = acc_data[new_start_slice:new_stop_slice]
-
-        # calculate the standard deviation of each column (YXZ)
-        std = np.std(slice_data, axis=0)
+    # calculate the maximum number of seconds before the end of the data is reached
+    max_seconds = min(hz * 60 * max_search_min, (acc_data.shape[0] - index) // hz)
 
-        # check if all of the standard deviations are below the standard deviation threshold
-        if np.all(std <= std_threshold):
-
-            # update index
-            index = new_stop_slice
-        else:
-            break
+    num_seconds = _count_still_seconds(acc_data, index, hz, max_seconds, std_threshold)
 
     if verbose:
-        logging.info('New index: %s, number of loops: %s', index, ii)
+        logging.info('New index: %s, number of loops: %s', index + num_seconds * hz, num_seconds)
 
-    return index
+    return index + num_seconds * hz
 
 
 def _backward_search_episode(acc_data, index, hz, max_search_min, std_threshold, verbose=False):
@@ -788,38 +862,63 @@ def _backward_search_episode(acc_data, index, hz, max_search_min, std_threshold,
     When we have an episode, this was created on a minute resolution, here we do a backward search to find the edges of the episode with a second resolution
     """
 
-    # calculate min slice index
-    min_slice_index = 0
+    # calculate the maximum number of seconds before the start of the data is reached
+    max_seconds = min(hz * 60 * max_search_min, index // hz)
 
-    for ii in range(hz * 60 * max_search_min):
+    num_seconds = _count_still_seconds(acc_data, index, hz, max_seconds, std_threshold, backward=True)
 
-        # create new slices
-        new_start_slice = index - hz
-        new_stop_slice = index
+    if verbose:
+        logging.info('New index: %s, number of loops: %s', index - num_seconds * hz, num_seconds)
 
-        if verbose:
-            logging.info('i: %s, new_start_slice: %s, new_stop_slice: %s', ii, new_start_slice, new_stop_slice)
+    return index - num_seconds * hz
 
-        # check if the new start slice exceeds the max_slice_index
-        if new_start_slice < min_slice_index:
-            if verbose:
-                logging.debug('Minimum slice index reached: %s', min_slice_index)
-            break
 
-        # slice out new activity data
-        slice_data = acc_data[new_start_slice:new_stop_slice]
+def _count_still_seconds(acc_data, index, hz, max_seconds, std_threshold, backward=False, chunk_seconds=64):
+    """
+    Count the consecutive seconds after or before an index in which the standard deviation of all axes is below the threshold
 
-        # calculate the standard deviation of each column (YXZ)
-        std = np.std(slice_data, axis=0)
+    The standard deviations of the seconds are calculated for a whole chunk of seconds at once on a reshape of the data. The chunks double in size,
+    so only little more data than the found seconds is processed.
 
-        # check if all of the standard deviations are belowii the standard deviation threshold
-        if np.all(std <= std_threshold):
+    Parameters
+    ----------
+    acc_data : np.array(samples, axes)
+        numpy array with acceleration data
+    index : int
+        the index at which the seconds start (or end if backward is True)
+    hz : int
+        sample frequency of the acceleration data, i.e. the number of samples of a second
+    max_seconds : int
+        the maximum number of seconds to search
+    std_threshold : float
+        the standard deviation threshold in g
+    backward : bool (optional)
+        if True, the seconds before index are searched, otherwise the seconds after index
+    chunk_seconds : int (optional)
+        the number of seconds of the first chunk
 
-            # update index
-            index = new_start_slice
+    Returns
+    -------
+    num_seconds : int
+        the number of consecutive seconds with a standard deviation below the threshold
+    """
+    num_seconds = 0
+    while num_seconds < max_seconds:
+        num_chunk = min(chunk_seconds, max_seconds - num_seconds)
+
+        if backward:
+            stop = index - num_seconds * hz
+            # the second closest to the index comes first
+            std = np.std(acc_data[stop - num_chunk * hz:stop].reshape(num_chunk, hz, -1), axis=1)[::-1]
         else:
-            break
+            first = index + num_seconds * hz
+            std = np.std(acc_data[first:first + num_chunk * hz].reshape(num_chunk, hz, -1), axis=1)
 
-    if verbose:
-        logging.info('New index: %s, number of loops: %s', index, ii)
-    return index
+        exceeded = np.flatnonzero(~np.all(std <= std_threshold, axis=1))
+        if exceeded.size > 0:
+            return num_seconds + exceeded[0]
+
+        num_seconds += num_chunk
+        chunk_seconds *= 2
+
+    return num_seconds
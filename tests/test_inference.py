@@ -0,0 +1,118 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from paat import inference
+
+
+@pytest.fixture
+def empty_cache():
+    inference.clear_models()
+    yield
+    inference.set_max_models(None)
+    inference.clear_models()
+
+
+def test_load_model(empty_cache):
+    model = inference.load_model('cnn_v2_2')
+
+    # the model is only loaded once, also by the path of its directory
+    assert inference.load_model('cnn_v2_2') is model
+    assert inference.load_model(os.path.join(inference.MODEL_DIRECTORY, 'cnn_v2_2.pb')) is model
+    assert inference.cached_models() == [os.path.join(inference.MODEL_DIRECTORY, 'cnn_v2_2.pb')]
+
+    inference.clear_models('cnn_v2_2')
+    assert inference.cached_models() == []
+    assert inference.load_model('cnn_v2_2') is not model
+
+
+def test_load_model_from_threads(empty_cache):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        models = list(executor.map(inference.load_model, ['cnn_v2_3'] * 8))
+
+    assert all(model is models[0] for model in models)
+    assert len(inference.cached_models()) == 1
+
+
+def test_max_models(empty_cache):
+    inference.load_model('cnn_v2_2')
+    inference.load_model('cnn_v2_3')
+    inference.load_model('cnn_v2_2')
+
+    # the least recently used model is removed first
+    inference.set_max_models(1)
+    assert inference.cached_models() == [os.path.join(inference.MODEL_DIRECTORY, 'cnn_v2_2.pb')]
+
+    inference.load_model('cnn_v2_4')
+    assert inference.cached_models() == [os.path.join(inference.MODEL_DIRECTORY, 'cnn_v2_4.pb')]
+
+    with pytest.raises(ValueError):
+        inference.set_max_models(0)
+
+
+def test_warm_up(empty_cache):
+    inference.warm_up(['cnn_v2_2', 'cnn_v2_5'])
+
+    assert len(inference.cached_models()) == 2
+
+    output = inference.load_model('cnn_v2_5')(np.zeros((2, 500, 3), dtype=np.float32))["output_0"].numpy()
+    assert output.shape == (2, 1)
+
+
+@pytest.mark.parametrize("model", ['cnn_v2_2', 'TIB_model'])
+def test_numpy_engine(empty_cache, model):
+    numpy_model = inference.load_model(model, engine="numpy")
+    tf_model = inference.load_model(model)
+
+    rng = np.random.default_rng(0)
+    if numpy_model.input_shape[1] is None:
+        # a sequence with masked time steps at the end
+        inputs = rng.normal(size=(1, 300, numpy_model.input_shape[2])).astype(np.float32)
+        inputs[:, 250:] = 0
+    else:
+        inputs = rng.normal(size=(70,) + numpy_model.input_shape[1:]).astype(np.float32)
+
+    output = numpy_model(inputs)["output_0"]
+    assert output.shape == tf_model(inputs)["output_0"].shape
+    assert np.allclose(output, tf_model(inputs)["output_0"].numpy(), atol=1e-4)
+
+    # the models of both engines are cached separately
+    assert inference.load_model(model, engine="numpy") is numpy_model
+    assert len(inference.cached_models()) == 2
+
+    with pytest.raises(ValueError):
+        inference.load_model(model, engine="torch")
+
+
+@pytest.mark.parametrize("dtype,atol", [("float16", 1e-3), ("int8", 1e-2)])
+def test_export_model(empty_cache, tmp_path, dtype, atol):
+    file = inference.export_model('TIB_model', os.path.join(tmp_path, f"TIB_model_{dtype}.npz"), dtype=dtype)
+
+    model = inference.load_model(file, engine="numpy")
+    assert model.dtype == dtype
+    assert os.path.getsize(file) < os.path.getsize(inference._model_path('TIB_model', "numpy"))
+
+    inputs = np.random.default_rng(0).normal(size=(1, 200, model.input_shape[2])).astype(np.float32)
+    assert np.allclose(model(inputs)["output_0"], inference.load_model('TIB_model', engine="numpy")(inputs)["output_0"], atol=atol)
+
+    with pytest.raises(ValueError):
+        inference.export_model('TIB_model', os.path.join(tmp_path, "TIB_model.npz"), dtype="float64")
+
+
+def test_export_model_without_metadata(monkeypatch, tmp_path):
+    # TensorFlow versions without the protobuf definition of the Keras metadata
+    monkeypatch.setitem(sys.modules, "tensorflow.python.keras.protobuf", None)
+
+    with pytest.raises(ImportError, match="TensorFlow 2.16 and 2.17"):
+        inference.export_model('cnn_v2_2', os.path.join(tmp_path, "cnn_v2_2.npz"))
+
+
+def test_benchmark_engines(empty_cache):
+    benchmark = inference.benchmark_engines(['cnn_v2_2', 'TIB_model'], batch_size=4, sequence_length=60, repeats=1)
+
+    assert list(benchmark.index) == ['cnn_v2_2', 'TIB_model']
+    assert {'tensorflow', 'numpy', 'speedup', 'max_difference'} <= set(benchmark.columns)
+    assert (benchmark['max_difference'] < 1e-4).all()
@@ -1,8 +1,17 @@
+import json
 import os
 import tempfile
+import threading
+import weakref
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from struct import unpack_from
+from time import sleep
 
 import numpy as np
 import numpy.testing as npt
+import pandas as pd
 import pytest
 from pygt3x.reader import FileReader
 
@@ -66,17 +75,672 @@ def test_paat_vs_pygt3x_loading():
     assert ref_sample_freq == sample_freq
 
 
-def test_exceptions():
-    with pytest.raises(NotImplementedError) as e_info:
-        time_data = np.arange(10)
-        hz = 33
-        io._create_time_array(time_data, hz)
-        assert e_info
+@pytest.mark.parametrize("sample_rate", [30, 33, 100])
+def test_create_time_array(sample_rate):
+    time_data = np.arange(1641201600, 1641201610)
+    time = io._create_time_array(time_data, sample_rate)
 
-    with pytest.raises(NotImplementedError) as e_info:
-        start = np.asarray(np.datetime64('today'), dtype='datetime64[ms]')
-        n_samples = 330
-        hz = 33
-        io._create_time_vector(start, n_samples, hz)
-        assert e_info
+    steps = np.arange(10 * sample_rate)
+    expected = 1641201600 * 10 ** 9 + (steps // sample_rate) * 10 ** 9 + (steps % sample_rate) * 10 ** 9 // sample_rate
 
+    assert time.dtype == np.dtype('datetime64[ns]')
+    npt.assert_array_equal(time.astype(np.int64), expected)
+
+    vector = io._create_time_vector(np.datetime64(1641201600000, 'ms'), 10 * sample_rate, sample_rate)
+    npt.assert_array_equal(vector, time)
+
+
+def test_time_index():
+    # two runs of 3 and 2 seconds with a gap of 5 seconds in between
+    time_data = np.array([100, 101, 102, 108, 109])
+    time = io.TimeIndex.from_record_times(time_data, 30)
+    expected = io._create_time_array(time_data, 30)
+
+    assert len(time) == 150
+    assert time.n_runs == 2
+    assert time.start == np.datetime64(100, 's')
+    npt.assert_array_equal(np.asarray(time), expected)
+    npt.assert_array_equal(time[[0, 89, 90, -1]], expected[[0, 89, 90, -1]])
+
+    # slicing is lazy and keeps the exact time stamps
+    sub_index = time[45:120]
+    assert isinstance(sub_index, io.TimeIndex)
+    npt.assert_array_equal(sub_index.to_numpy(), expected[45:120])
+
+    ranges = time.locate("1970-01-01 00:01:41.5", "1970-01-01 00:01:48.5")
+    npt.assert_array_equal(ranges, [[45, 90], [90, 105]])
+    npt.assert_array_equal(time._take(ranges[:, 0], ranges[:, 1]).to_numpy(),
+                           expected[(expected >= np.datetime64("1970-01-01T00:01:41.5")) & (expected < np.datetime64("1970-01-01T00:01:48.5"))])
+
+
+@pytest.mark.parametrize("sample_rate", [25, 30, 100])
+def test_unpack_activity(sample_rate):
+    payload_size = -(-sample_rate * 3 * 12 // 8)
+    payloads = np.random.default_rng(0).integers(0, 256, (4, payload_size), dtype=np.uint8)
+
+    # reference implementation reading the payload bit by bit
+    bits = ''.join(f'{byte:08b}' for byte in payloads.tobytes())
+    bits_per_payload = payload_size * 8
+    expected = []
+    for ii in range(len(payloads)):
+        payload_bits = bits[ii * bits_per_payload:(ii + 1) * bits_per_payload]
+        for jj in range(0, sample_rate * 3 * 12, 12):
+            value = int(payload_bits[jj:jj + 12], 2)
+            expected.append(value - 4096 if value > 2047 else value)
+    expected = np.array(expected).reshape(-1, 3)
+
+    log_data = io._unpack_activity(payloads, sample_rate)
+
+    assert log_data.dtype == np.int16
+    assert np.array_equal(log_data, expected)
+
+
+def test_build_record_index(file_path):
+    with zipfile.ZipFile(file_path) as archive:
+        log_bin = archive.read("log.bin")
+
+    # walk the headers one by one as reference
+    expected = []
+    offset = 0
+    while offset < len(log_bin):
+        _, payload_type, timestamp, size = unpack_from("<BBLH", log_bin, offset)
+        expected.append((offset, payload_type, timestamp, size))
+        offset += 9 + size
+
+    index = io._build_record_index(log_bin)
+
+    assert index.tolist() == expected
+
+    # an incomplete record at the end of the file is not part of the index
+    truncated = io._build_record_index(log_bin[:-10])
+    assert truncated.tolist() == expected[:-1]
+
+
+def test_reading_activity2(file_path):
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+    sample_rate = meta['Sample_Rate']
+
+    # convert the ACTIVITY records to ACTIVITY2 records with 16-bit values in XYZ order, the first half alternates with ACTIVITY records
+    with zipfile.ZipFile(file_path) as archive:
+        log_bin = archive.read("log.bin")
+        info = archive.read("info.txt")
+
+    converted = bytearray()
+    offset, n_activity = 0, 0
+    while offset < len(log_bin):
+        _, payload_type, timestamp, size = unpack_from("<BBLH", log_bin, offset)
+        record = log_bin[offset:offset + 9 + size]
+        if payload_type == io.ACTIVITY and size == 450:
+            if n_activity % 2 == 0 or n_activity > 300:
+                payload = values[n_activity * sample_rate:(n_activity + 1) * sample_rate][:, [1, 0, 2]].astype('<i2').tobytes()
+                record = bytes([0x1E, io.ACTIVITY2]) + timestamp.to_bytes(4, 'little') + len(payload).to_bytes(2, 'little') + payload
+                record += bytes([~np.bitwise_xor.reduce(np.frombuffer(record, dtype=np.uint8)) & 0xFF])
+            n_activity += 1
+        converted += record
+        offset += 9 + size
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(gt3x_file, "w") as archive:
+        archive.writestr("info.txt", info)
+        archive.writestr("log.bin", bytes(converted))
+
+    _, converted_values, _, records = io.read_gt3x(gt3x_file.getvalue(), rescale=False, pandas=False, records=True)
+
+    assert np.array_equal(converted_values, values)
+    assert records['battery'].size > 0
+    assert records['events'].size > 0
+    # the parameter records contain 8 byte entries
+    assert records['parameters'].size == sum(record['size'] // 8 for record in io._build_record_index(log_bin)
+                                             if record['type'] == io.PARAMETERS)
+
+
+def test_gaps(file_path):
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+    sample_rate = meta['Sample_Rate']
+
+    # remove two ranges of activity records to create gaps of 60 and 10 seconds
+    with zipfile.ZipFile(file_path) as archive:
+        log_bin = archive.read("log.bin")
+        info = archive.read("info.txt")
+
+    index = io._build_record_index(log_bin)
+    activity = np.flatnonzero(index['type'] == io.ACTIVITY)
+    removed = set(activity[100:160]) | set(activity[300:310])
+    log_bin = b"".join(log_bin[record['offset']:record['offset'] + 9 + record['size']]
+                       for position, record in enumerate(index) if position not in removed)
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(gt3x_file, "w") as archive:
+        archive.writestr("info.txt", info)
+        archive.writestr("log.bin", log_bin)
+
+    time, gap_values, _ = io.read_gt3x(gt3x_file.getvalue(), rescale=False, pandas=False)
+    segments = time.segments()
+
+    assert segments['first'].tolist() == [0, 100 * sample_rate, 240 * sample_rate]
+    assert segments['stop'].tolist() == [100 * sample_rate, 240 * sample_rate, 530 * sample_rate]
+    assert (segments['sample_rate'] == sample_rate).all()
+    assert segments['start'][1] == time.start + np.timedelta64(160, 's')
+    assert segments['start'][2] == time.start + np.timedelta64(310, 's')
+
+    # the gaps are not part of the data unless they are filled
+    assert len(gap_values) == 530 * sample_rate
+    assert len(io.read_gt3x(file_path, pandas=False)[0].segments()) == 1
+
+    gaps = [(100 * sample_rate, 160 * sample_rate), (300 * sample_rate, 310 * sample_rate)]
+    for method in io.FILL_METHODS:
+        filled_time, filled, _ = io.read_gt3x(gt3x_file.getvalue(), rescale=False, pandas=False, fill=method)
+
+        assert np.array_equal(np.asarray(filled_time), np.asarray(io.read_gt3x(file_path, pandas=False)[0]))
+        assert len(filled_time.segments()) == 1
+
+        keep = np.ones(len(values), dtype=bool)
+        for first, stop in gaps:
+            keep[first:stop] = False
+            expected = values[first - 1] if method == "last" else np.zeros(3)
+            assert (filled[first:stop] == expected).all()
+        assert np.array_equal(filled[keep], values[keep])
+
+    with pytest.raises(ValueError):
+        io.read_gt3x(file_path, fill="nearest")
+
+    # overlapping segments, e.g. after a reset of the clock, can not be filled
+    overlapping = io.TimeIndex._from_runs(sample_rate, [0, 10 ** 9], [0, 0], [2 * sample_rate, sample_rate])
+    assert len(overlapping.segments()) == 2
+    with pytest.raises(ValueError):
+        io.fill_gaps(overlapping, np.zeros((3 * sample_rate, 3)))
+
+
+def test_recording(file_path, load_gt3x_file):
+    data, sample_freq = load_gt3x_file
+
+    recording = io.read_gt3x(file_path, recording=True)
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+
+    assert isinstance(recording, io.Recording)
+    assert recording.counts.dtype == np.int16
+    assert np.array_equal(recording.counts, values)
+    assert recording.nbytes == len(data) * 3 * 2
+    assert recording.sample_rate == sample_freq
+    assert recording.start == data.index[0]
+    assert len(recording.segments) == 1
+    assert recording.meta == meta
+    assert recording.to_pandas().equals(data)
+
+    # the acceleration values in g are calculated on request
+    assert recording["X"].dtype == np.float32
+    npt.assert_allclose(recording["X"], data["X"].values, rtol=1e-6)
+    npt.assert_allclose(recording.to_numpy(columns=("X", "Y", "Z")), data[["X", "Y", "Z"]].values, rtol=1e-6)
+
+    # slicing by positions and by time returns views
+    assert np.shares_memory(recording[100:200].counts, recording.counts)
+    assert recording[100:200].to_pandas().equals(data[100:200])
+    start, end = "2022-01-03 10:22:30.25", "2022-01-03T10:25:00"
+    selection = recording[start:end]
+    assert np.shares_memory(selection.counts, recording.counts)
+    assert selection.to_pandas().equals(io.read_gt3x(file_path, start=start, end=end)[0])
+
+    with pytest.raises(TypeError):
+        recording[[1, 2, 3]]
+    with pytest.raises(ValueError):
+        io.Recording(values[:10], meta['Acceleration_Scale'], io.TimeIndex(0, sample_freq, 20))
+
+    recording, records = io.read_gt3x(file_path, recording=True, records=True)
+    assert isinstance(recording, io.Recording)
+    assert records['battery'].size > 0
+
+
+def test_damaged_files(file_path):
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+    sample_rate = meta['Sample_Rate']
+
+    with zipfile.ZipFile(file_path) as archive:
+        log_bin = archive.read("log.bin")
+        info = archive.read("info.txt")
+
+    index = io._build_record_index(log_bin)
+    activity = index[index['type'] == io.ACTIVITY]
+    rng = np.random.default_rng(42)
+
+    # overwrite the end of the 100th and the header of the 101st activity record, insert random bytes
+    # starting with separators in front of the 300th activity record and truncate the file
+    first, inserted = activity['offset'][100] + 100, activity['offset'][300]
+    damaged = bytearray(log_bin)
+    damaged[first:first + 500] = rng.integers(0, 256, 500, dtype=np.uint8).tobytes()
+    garbage = bytes([0x1E] * 3) + rng.integers(0, 256, 2000, dtype=np.uint8).tobytes()
+    damaged = bytes(damaged[:inserted] + garbage + damaged[inserted:-1000])
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(gt3x_file, "w") as archive:
+        archive.writestr("info.txt", info)
+        archive.writestr("log.bin", damaged)
+
+    time, damaged_values, damaged_meta = io.read_gt3x(gt3x_file.getvalue(), rescale=False, pandas=False)
+
+    # all complete records outside of the damaged spans are kept
+    kept = np.ones(activity.size, dtype=bool)
+    kept[[100, 101]] = False
+    kept &= activity['offset'] + 9 + activity['size'] <= len(log_bin) - 1000
+    expected = values.reshape(-1, sample_rate, 3)[kept].reshape(-1, 3)
+
+    assert np.array_equal(damaged_values, expected)
+    assert len(time.segments()) == 2
+    spans = damaged_meta['Damaged_Spans']
+    assert len(spans) == 3
+    assert spans[0][0] <= first and tuple(spans[1]) == (inserted, inserted + len(garbage)) and spans[2][1] == len(damaged)
+    assert 'Damaged_Spans' not in meta
+
+    # streaming resynchronizes in the same way
+    chunks = list(io.iter_gt3x(gt3x_file.getvalue(), chunk_size="1D", rescale=False, pandas=False, block_size=4096))
+    assert np.array_equal(np.concatenate([chunk[1] for chunk in chunks]), expected)
+
+    # random bytes at the start of log.bin
+    index, damaged_spans = io._index_damaged_log_bin(garbage[3:] + log_bin)
+    assert np.array_equal(index['offset'] - len(garbage) + 3, io._build_record_index(log_bin)['offset'])
+    assert damaged_spans[['start', 'stop']].tolist() == [(0, len(garbage) - 3)]
+
+
+def test_decoding_errors(file_path, monkeypatch):
+    def _read_activity(*args, **kwargs):
+        raise ValueError("real decode error")
+
+    # errors while decoding are not hidden behind a failure of the time index
+    monkeypatch.setattr(io, "_read_activity", _read_activity)
+    with pytest.raises(ValueError, match="real decode error"):
+        io.read_gt3x(file_path)
+
+
+def test_loading_from_memory(file_path, load_gt3x_file):
+    data, _ = load_gt3x_file
+
+    with open(file_path, "rb") as file:
+        content = file.read()
+
+    # compress the archive to read log.bin through the zip decompression
+    deflated = BytesIO()
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(deflated, "w", zipfile.ZIP_DEFLATED) as target:
+        for name in source.namelist():
+            target.writestr(name, source.read(name))
+
+    with open(file_path, "rb") as file:
+        from_file_object, _ = io.read_gt3x(file)
+
+    for data_from_memory in (from_file_object, io.read_gt3x(content)[0], io.read_gt3x(deflated.getvalue())[0]):
+        assert data_from_memory.equals(data)
+
+    assert io.read_metadata(content) == io.read_metadata(file_path)
+
+
+def test_parallel_decoding(file_path):
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+
+    # a deflated archive is decompressed into shared memory, a stored archive on disk is memory mapped by the workers
+    deflated = BytesIO()
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(deflated, "w", zipfile.ZIP_DEFLATED) as target:
+        for name in source.namelist():
+            target.writestr(name, source.read(name))
+
+    for file in (file_path, deflated.getvalue()):
+        time, parallel_values, parallel_meta = io.read_gt3x(file, rescale=False, pandas=False, num_jobs=2)
+        assert np.array_equal(parallel_values, values)
+        assert parallel_meta == meta
+
+    with zipfile.ZipFile(file_path) as archive:
+        index = io._build_record_index(archive.read("log.bin"))
+        with io._share_log_bin(archive) as (log_bin, source):
+            expected = io._read_activity(log_bin, index, meta['Sample_Rate'])
+            for num_jobs in (1, 3):
+                result = io._read_activity_parallel(source, index, meta['Sample_Rate'], num_jobs)
+                assert all(np.array_equal(a, b) for a, b in zip(result, expected))
+
+    with pytest.raises(ValueError):
+        io.read_gt3x(file_path, num_jobs=0)
+
+
+def test_iter_gt3x(file_path, load_gt3x_file):
+    data, sample_freq = load_gt3x_file
+
+    # a small block size makes records span several blocks
+    chunks = list(io.iter_gt3x(file_path, chunk_size="3min", block_size=4096))
+
+    assert len(chunks) == 4
+    assert all(chunk_freq == sample_freq for _, chunk_freq in chunks)
+    assert all(len(chunk) == 3 * 60 * sample_freq for chunk, _ in chunks[:-1])
+    assert pd.concat([chunk for chunk, _ in chunks]).equals(data)
+
+    _, values, _ = io.read_gt3x(file_path, rescale=False, pandas=False)
+    chunks = list(io.iter_gt3x(file_path, chunk_size="1D", rescale=False, pandas=False))
+
+    assert len(chunks) == 1
+    assert np.array_equal(chunks[0][1], values)
+
+
+def test_loading_time_range(file_path, load_gt3x_file):
+    data, _ = load_gt3x_file
+
+    start, end = "2022-01-03 10:22:30.25", "2022-01-03T10:25:00"
+    selection, _ = io.read_gt3x(file_path, start=start, end=end)
+
+    expected = data[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+    assert len(expected) == 2.5 * 60 * 100 - 25
+    assert selection.equals(expected)
+
+    # open ended ranges
+    assert io.read_gt3x(file_path, start=start)[0].equals(data[data.index >= pd.Timestamp(start)])
+    assert io.read_gt3x(file_path, end=end)[0].equals(data[data.index < pd.Timestamp(end)])
+
+
+def test_loading_from_cache(file_path, load_gt3x_file):
+    data, _ = load_gt3x_file
+    _, values, meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # first call decodes the file and fills the cache, second call reads from the cache
+        for _ in range(2):
+            assert io.read_gt3x(file_path, cache_dir=cache_dir)[0].equals(data)
+
+        _, cached_values, cached_meta = io.read_gt3x(file_path, rescale=False, pandas=False, cache_dir=cache_dir)
+        assert isinstance(cached_values, np.memmap)
+        assert np.array_equal(cached_values, values)
+        assert cached_meta == meta
+
+        start, end = "2022-01-03 10:22:30.25", "2022-01-03T10:25:00"
+        selection, _ = io.read_gt3x(file_path, start=start, end=end, cache_dir=cache_dir)
+        assert selection.equals(io.read_gt3x(file_path, start=start, end=end)[0])
+
+        # the same content is found in the cache independent of how the file is passed
+        with open(file_path, "rb") as file:
+            assert io.read_gt3x(file.read(), cache_dir=cache_dir)[0].equals(data)
+        assert len(os.listdir(os.path.join(cache_dir, "data"))) == 1
+
+        # the records of the entry are the same as of an uncached read, also for the pygt3x backend
+        for backend in ["native", "pygt3x"]:
+            with tempfile.TemporaryDirectory() as backend_cache_dir:
+                io.read_gt3x(file_path, backend=backend, cache_dir=backend_cache_dir)
+                log_records = io.read_gt3x(file_path, backend=backend, records=True)[-1]
+                cached_records = io.read_gt3x(file_path, backend=backend, records=True, cache_dir=backend_cache_dir)[-1]
+                assert log_records.keys() == cached_records.keys()
+                assert all(np.array_equal(log_records[name], cached_records[name]) for name in log_records)
+
+        # an entry that exceeds the cache size is kept until the next file is added
+        io.read_gt3x(file_path, cache_dir=cache_dir, max_cache_size=0)
+        nwt_file_path = os.path.join(os.path.dirname(file_path), "nwt_recording.gt3x")
+        io.read_gt3x(nwt_file_path, cache_dir=cache_dir, max_cache_size=0)
+        assert len(os.listdir(os.path.join(cache_dir, "data"))) == 1
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_loading_many_files(file_path, load_gt3x_file, ordered):
+    data, _ = load_gt3x_file
+    nwt_file_path = os.path.join(os.path.dirname(file_path), "nwt_recording.gt3x")
+    files = [file_path, "does/not/exist.gt3x", nwt_file_path]
+
+    results = list(io.read_gt3x_many(files, num_jobs=2, ordered=ordered, max_in_flight=2))
+
+    assert len(results) == 3
+    if ordered:
+        assert [file for file, _, _ in results] == files
+
+    results = {file: (output, error) for file, output, error in results}
+    assert results[file_path][0][0].equals(data)
+    assert results[file_path][1] is None
+    assert results["does/not/exist.gt3x"][0] is None
+    assert isinstance(results["does/not/exist.gt3x"][1], FileNotFoundError)
+    assert results[nwt_file_path][0][0].equals(io.read_gt3x(nwt_file_path)[0])
+
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_map_bounded(ordered):
+    class Output:
+        pass
+
+    alive, peak, lock = weakref.WeakSet(), [0], threading.Lock()
+
+    def function(item):
+        output = Output()
+        with lock:
+            alive.add(output)
+            peak[0] = max(peak[0], len(alive))
+        return output
+
+    # the outputs of the finished items and the output held by the consumer count towards max_in_flight
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for item, output, error in io._map_bounded(executor, function, range(20), ordered=ordered, max_in_flight=3):
+            sleep(0.01)
+            del output
+
+    assert peak[0] <= 3
+
+def test_verify_checksums(file_path):
+    with zipfile.ZipFile(file_path) as archive:
+        log_bin = bytearray(archive.read("log.bin"))
+        info = archive.read("info.txt")
+
+    _, _, meta = io.read_gt3x(file_path, pandas=False, verify_checksums=True)
+    assert meta['Corrupted_Records'] == []
+
+    # flip a bit in the payloads of two records
+    index = io._build_record_index(log_bin)
+    for record in [3, 100]:
+        log_bin[index['offset'][record] + io.HEADER_SIZE] ^= 0x01
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(gt3x_file, "w") as archive:
+        archive.writestr("info.txt", info)
+        archive.writestr("log.bin", bytes(log_bin))
+
+    _, _, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, verify_checksums=True)
+    assert meta['Corrupted_Records'] == [3, 100]
+
+    # only the records within the time range are verified
+    start = pd.to_datetime(index['timestamp'][50], unit='s')
+    _, _, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, start=start, verify_checksums=True)
+    assert meta['Corrupted_Records'] == [100]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for _ in range(2):
+            _, _, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, verify_checksums=True, cache_dir=cache_dir)
+            assert meta['Corrupted_Records'] == [3, 100]
+
+    # the checksums of an entry that was added without them are verified once they are requested
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _, _, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, cache_dir=cache_dir)
+        assert 'Corrupted_Records' not in meta
+
+        for _ in range(2):
+            _, _, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, verify_checksums=True, cache_dir=cache_dir)
+            assert meta['Corrupted_Records'] == [3, 100]
+
+
+def test_hdf5_store(file_path, load_gt3x_file):
+    data, _ = load_gt3x_file
+    nwt_file_path = os.path.join(os.path.dirname(file_path), "nwt_recording.gt3x")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        hdf5_file = os.path.join(tmp_dir, "store.h5")
+
+        # recordings are added one after another
+        assert io.write_hdf5(hdf5_file, file_path, name="first") == "first"
+        io.write_hdf5(hdf5_file, nwt_file_path, name="second")
+
+        with pytest.raises(ValueError):
+            io.write_hdf5(hdf5_file, nwt_file_path, name="second")
+
+        stored, sample_freq, meta = io.read_hdf5(hdf5_file, "first", metadata=True)
+        assert stored.equals(data)
+        assert meta == io.read_gt3x(file_path, metadata=True)[2]
+        assert io.read_hdf5(hdf5_file, "second")[0].equals(io.read_gt3x(nwt_file_path)[0])
+
+        start, end = "2022-01-03 10:22:30.25", "2022-01-03T10:25:00"
+        time, values, _ = io.read_hdf5(hdf5_file, "first", start=start, end=end, axes=["Z", "X"], rescale=False, pandas=False)
+        expected_time, expected_values, _ = io.read_gt3x(file_path, start=start, end=end, rescale=False, pandas=False)
+        npt.assert_array_equal(np.asarray(time), np.asarray(expected_time))
+        npt.assert_array_equal(values, expected_values[:, [2, 1]])
+
+
+def test_build_catalog(file_path):
+    nwt_file_path = os.path.join(os.path.dirname(file_path), "nwt_recording.gt3x")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, "cohort")
+        os.makedirs(os.path.join(directory, "subdirectory"))
+        catalog_file = os.path.join(tmp_dir, "catalog.db")
+
+        with open(file_path, "rb") as source, open(os.path.join(directory, "first.gt3x"), "wb") as target:
+            target.write(source.read())
+        with open(nwt_file_path, "rb") as source, open(os.path.join(directory, "subdirectory", "second.gt3x"), "wb") as target:
+            target.write(source.read())
+        with open(os.path.join(directory, "broken.gt3x"), "wb") as target:
+            target.write(b"not a zip file")
+
+        catalog = io.build_catalog(directory, catalog_file, num_jobs=2).set_index("path")
+        first = catalog.loc[os.path.join(directory, "first.gt3x")]
+
+        assert len(catalog) == 3
+        assert first["serial_number"] == "MOS2C06152277"
+        assert first["sample_rate"] == 100
+        assert first["duration"] == 600
+        assert first["expected_decoded_size"] == 600 * 100 * 3 * 2
+        assert first["first_record_time"] == "2022-01-03T10:16:57"
+        assert pd.isna(first["n_records"])
+        assert catalog.loc[os.path.join(directory, "broken.gt3x"), "error"].startswith("BadZipFile")
+
+        # removed files are dropped and the records are counted for files without counts
+        os.remove(os.path.join(directory, "broken.gt3x"))
+        catalog = io.build_catalog(directory, catalog_file, num_jobs=1, scan_records=True).set_index("path")
+
+        assert len(catalog) == 2
+        assert catalog.loc[os.path.join(directory, "first.gt3x"), "n_activity_records"] == 600
+        assert catalog.loc[os.path.join(directory, "first.gt3x"), "last_record_time"] == "2022-01-03T10:29:59"
+
+        # activity records written on USB connections do not contain samples and are not counted
+        with zipfile.ZipFile(file_path) as archive:
+            log_bin = archive.read("log.bin")
+            info = archive.read("info.txt")
+        index = io._build_record_index(log_bin)
+        timestamp = log_bin[index['offset'][-1] + 2:index['offset'][-1] + 6]
+        usb_record = bytes([0x1E, io.ACTIVITY]) + timestamp + (2).to_bytes(2, "little") + bytes(3)
+        with zipfile.ZipFile(os.path.join(directory, "usb.gt3x"), "w") as archive:
+            archive.writestr("info.txt", info)
+            archive.writestr("log.bin", log_bin + usb_record)
+
+        entry = io._catalog_entry(os.path.join(directory, "usb.gt3x"), scan_records=True)
+        _, values, _ = io.read_gt3x(os.path.join(directory, "usb.gt3x"), rescale=False, pandas=False)
+        assert entry["n_records"] == index.size + 1
+        assert entry["n_activity_records"] * entry["sample_rate"] == len(values) == 600 * 100
+
+
+def test_backends(file_path):
+    with zipfile.ZipFile(file_path) as archive:
+        meta = io._format_meta_data(io._extract_info(archive))
+        assert io._inspect_record_types(archive) == {io.ACTIVITY}
+        assert io._select_backend(archive, meta) == "native"
+
+    _, native_values, native_meta = io.read_gt3x(file_path, rescale=False, pandas=False)
+    _, pygt3x_values, pygt3x_meta = io.read_gt3x(file_path, rescale=False, pandas=False, backend="pygt3x")
+    assert np.array_equal(native_values, pygt3x_values)
+    assert native_meta == pygt3x_meta
+
+    # a faster backend is preferred for the files it supports
+    calls = []
+
+    def read_fast(archive, meta, **kwargs):
+        calls.append(meta['Firmware'])
+        return io._read_native(archive, meta, **kwargs)
+
+    try:
+        io.register_backend("fast", read_fast, record_types=[io.ACTIVITY], firmware=("1.9.0", "1.9.9"), priority=100)
+        assert io.read_gt3x(file_path)[0].equals(io.read_gt3x(file_path, backend="native")[0])
+        assert calls == ["1.9.2"]
+
+        io.register_backend("fast", read_fast, record_types=[io.ACTIVITY], firmware=("2.0.0", None), priority=100)
+        io.read_gt3x(file_path)
+        assert calls == ["1.9.2"]
+    finally:
+        del io.BACKENDS["fast"]
+
+    with pytest.raises(ValueError):
+        io.read_gt3x(file_path, backend="unknown")
+
+
+
+def test_pygt3x_calibration(file_path):
+    # a device that does not calibrate the data itself, with the calibration of the 100 Hz sample rate
+    calibration = {"isCalibrated": False, "calibrationMethod": 2,
+                   "offsetX_100": 10, "offsetY_100": -5, "offsetZ_100": 3,
+                   "sensitivityXX_100": 25000, "sensitivityYY_100": 26000, "sensitivityZZ_100": 25600,
+                   "sensitivityXY_100": 100, "sensitivityXZ_100": -50, "sensitivityYZ_100": 0}
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(gt3x_file, "w") as archive:
+        for name in source.namelist():
+            archive.writestr(name, source.read(name))
+        archive.writestr("calibration.json", json.dumps(calibration))
+
+    with FileReader(BytesIO(gt3x_file.getvalue())) as reader:
+        expected = reader.to_pandas()[["Y", "X", "Z"]].values
+
+    # the calibrated values are rounded to the nearest count
+    _, values, meta = io.read_gt3x(gt3x_file.getvalue(), pandas=False, backend="pygt3x")
+    npt.assert_allclose(values, expected, atol=.5 / meta["Acceleration_Scale"] + 1e-6)
+    assert not np.allclose(values, io.read_gt3x(file_path, pandas=False)[1])
+
+@pytest.fixture
+def v1_file(file_path):
+    # a file of the V1 format of the NHANES studies with the 12-bit samples in YXZ order in activity.bin
+    with zipfile.ZipFile(file_path) as archive:
+        info = archive.read("info.txt").decode("utf-8-sig")
+    info = "\n".join(line for line in info.splitlines() if not line.startswith("Acceleration"))
+    info = info.replace("MOS2C06152277", "NEO1C06152277").replace("Device Type: wGT3XBT", "Device Type: GT3X")
+
+    counts = np.random.default_rng(0).integers(-2047, 2048, size=(60 * 100, 3), dtype=np.int16)
+    twelve_bits = counts.reshape(-1, 2).astype(np.uint16) & 0xFFF
+    packed = np.stack([twelve_bits[:, 0] >> 4, ((twelve_bits[:, 0] & 0xF) << 4) | (twelve_bits[:, 1] >> 8),
+                       twelve_bits[:, 1] & 0xFF], axis=1).astype(np.uint8)
+
+    gt3x_file = BytesIO()
+    with zipfile.ZipFile(gt3x_file, "w") as archive:
+        archive.writestr("info.txt", info)
+        archive.writestr("log.txt", "")
+        archive.writestr("activity.bin", packed.tobytes())
+
+    return gt3x_file.getvalue(), counts
+
+
+def test_reading_v1_files(v1_file):
+    content, counts = v1_file
+
+    # pygt3x hands out the values of V1 files in g, they are scaled back to the raw counts
+    time, values, meta = io.read_gt3x(content, rescale=False, pandas=False, backend="pygt3x")
+    assert np.array_equal(values, counts)
+    assert meta["Acceleration_Scale"] == 341
+    assert time[0] == np.datetime64(meta["Start_Date"]) and len(time) == len(counts)
+
+    _, rescaled, _ = io.read_gt3x(content, pandas=False, use_pygt3x=True)
+    npt.assert_allclose(rescaled, counts / 341, atol=5e-4)
+
+    # the records of V1 files cannot be read
+    with pytest.raises(ValueError, match="V1 format"):
+        io.read_gt3x(content, backend="pygt3x", records=True)
+
+
+def test_files_without_log_bin(v1_file):
+    content, counts = v1_file
+
+    # files without log.bin are read with the pygt3x backend
+    with zipfile.ZipFile(BytesIO(content)) as archive:
+        assert io._select_backend(archive, io._format_meta_data(io._extract_info(archive))) == "pygt3x"
+    assert np.array_equal(io.read_gt3x(content, rescale=False, pandas=False)[1], counts)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for _ in range(2):
+            assert np.array_equal(io.read_gt3x(content, rescale=False, pandas=False, cache_dir=cache_dir)[1], counts)
+
+        with pytest.raises(ValueError, match="V1 format"):
+            io.read_gt3x(content, cache_dir=cache_dir, records=True)
+
+    with pytest.raises(ValueError, match="V1 format"):
+        io.read_gt3x(content, backend="native")
+    with pytest.raises(ValueError, match="V1 format"):
+        io.read_gt3x(content, verify_checksums=True)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 
 import pytest
@@ -45,6 +46,52 @@ def test_pipeline():
     data.loc[:, ["Y_counts", "X_counts", "Z_counts"]] = counts
 
 
+def _count_mvpa(data, sample_freq):
+    if len(data) == 30000:
+        raise ValueError("analysis failed")
+    mvpa, _ = paat.calculate_pa_levels(data, sample_freq, mvpa_cutpoint=.069, sb_cutpoint=.015).T
+    return mvpa.sum()
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_process_files(use_processes):
+    file_path_nwt = os.path.join(TEST_ROOT, 'resources/nwt_recording.gt3x')
+    files = [FILE_PATH_SIMPLE, "does/not/exist.gt3x", file_path_nwt, FILE_PATH_SIMPLE]
+
+    data, sample_freq = paat.read_gt3x(FILE_PATH_SIMPLE)
+    expected = _count_mvpa(data, sample_freq)
+
+    results = list(paat.process_files(files, _count_mvpa, prefetch=2, num_jobs=2, use_processes=use_processes))
+
+    assert [file for file, _, _ in results] == files
+    assert results[0][1:] == (expected, None)
+    assert results[3][1:] == (expected, None)
+    # errors while reading and analysing the files are handed out per file
+    assert isinstance(results[1][2], FileNotFoundError)
+    assert isinstance(results[2][2], ValueError)
+
+
+def test_process_files_with_recordings():
+    results = list(paat.process_files([FILE_PATH_SIMPLE], len, recording=True))
+    assert results == [(FILE_PATH_SIMPLE, 60000, None)]
+
+    # with records, the recording and the records are passed on
+    results = list(paat.process_files([FILE_PATH_SIMPLE], lambda recording, records: len(recording),
+                                      recording=True, records=True))
+    assert results == [(FILE_PATH_SIMPLE, 60000, None)]
+
+
+def test_process_files_async():
+    file_path_nwt = os.path.join(TEST_ROOT, 'resources/nwt_recording.gt3x')
+
+    async def collect():
+        return [result async for result in paat.process_files_async([FILE_PATH_SIMPLE, file_path_nwt], lambda *output: len(output), metadata=True)]
+
+    results = asyncio.run(collect())
+
+    assert [(file, result) for file, result, _ in results] == [(FILE_PATH_SIMPLE, 3), (file_path_nwt, 3)]
+
+
 @pytest.mark.slow
 def test_against_v1_0_0b8():
     data, sample_freq = pd.read_csv(FILE_PATH, compression="gzip"), 100
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paat import io, quality
+
+
+def test_check_quality(file_path):
+    report = quality.check_quality(file_path)
+
+    assert report['n_samples'] == 60000
+    assert report['duration'] == 600
+    assert report['clipped_samples'] == 0
+    assert report['stuck_axes'] == 0
+    assert report['n_gaps'] == 0
+    assert report['n_resets'] == 0
+    assert report['battery_start'] > report['battery_end'] == report['battery_min']
+    assert report['n_battery_drops'] == 0
+    assert report['corrupted_records'] == 0
+
+    recording, records = io.read_gt3x(file_path, recording=True, records=True)
+    counts = recording.counts.copy()
+    sample_rate = recording.sample_rate
+
+    # clip 150 samples, the X axis is stuck for 30 and 12 seconds and the Z axis for 5 seconds
+    counts[1000:1100, 0] = 2047
+    counts[1050:1150, 2] = -2048
+    counts[2003:5003, 1] = 17
+    counts[10000:11200, 1] = -3
+    counts[20000:20500, 2] = 5
+
+    # gaps of 60 and 10 seconds and a reset of the clock by one minute
+    runs = np.array([[0, 0, 100], [160, 0, 200], [370, 0, 200], [510, 0, 100]]) * [10 ** 9, 1, sample_rate]
+    time = io.TimeIndex._from_runs(sample_rate, *runs.T)
+
+    records = dict(records, battery=records['battery'].copy())
+    records['battery']['voltage'][[3, 7]] -= 300
+
+    report = quality.check_quality(io.Recording(counts, recording.acceleration_scale, time, recording.meta), records,
+                                   block_size=1000)
+
+    assert report['clipped_samples'] == 150
+    assert report['clipped_fraction'] == 150 / 60000
+    assert report['stuck_axes'] == 1
+    assert report['stuck_duration'] == 42
+    assert report['longest_stuck'] == 30
+    assert report['n_gaps'] == 2
+    assert report['gap_duration'] == 70
+    assert report['longest_gap'] == 60
+    assert report['n_resets'] == 1
+    assert report['n_battery_drops'] == 2
+    assert report['battery_largest_drop'] >= 300
+
+    assert quality.check_quality(io.Recording(counts, recording.acceleration_scale, time, recording.meta),
+                                 stuck_seconds=5)['stuck_axes'] == 2
+
+
+def test_check_quality_many(file_path):
+    reports = quality.check_quality_many([file_path, "missing.gt3x"], num_jobs=2)
+
+    assert reports.index.tolist() == [file_path, "missing.gt3x"]
+    assert reports.loc[file_path].drop("error").to_dict() == quality.check_quality(file_path)
+    assert pd.isna(reports.loc[file_path, "error"])
+    assert "FileNotFoundError" in reports.loc["missing.gt3x", "error"]
+
+    with pytest.raises(ValueError):
+        quality.check_quality_many([file_path], num_jobs=0)
@@ -2,9 +2,10 @@ import os
 import pickle
 
 import numpy as np
+import pandas as pd
 import pytest
 
-from paat import io, wear_time
+from paat import inference, io, wear_time
 
 
 @pytest.fixture
@@ -23,12 +24,40 @@ def test_detect_non_wear_time_syed2021(nwt_data, test_root_path):
 
     assert np.array_equal(nw_vector, nw_vector_ref)
 
+    # the compact recording gives the same result
+    recording = io.read_gt3x(os.path.join(test_root_path, 'resources/nwt_recording.gt3x'), recording=True)
+    assert np.array_equal(wear_time.detect_non_wear_time_syed2021(recording, sample_freq)[:-100], nw_vector_ref)
+
+    # the NumPy engine does not change the result
+    assert np.array_equal(wear_time.detect_non_wear_time_syed2021(data, sample_freq, engine="numpy")[:-100], nw_vector_ref)
+
 
 def test_detect_non_wear_time_hees2011(nwt_data):
     data, sample_freq = nwt_data
 
     nw_vector = wear_time.detect_non_wear_time_hees2011(data, sample_freq)
 
+    assert nw_vector.shape == (len(data),)
+
+    # the merged statistics of the blocks give the same windows as calculating them for each window,
+    # also if the window length is not a multiple of the window overlap
+    values = data[["X", "Y", "Z"]].values.copy()
+    values[2 * len(values) // 5:] = values[2 * len(values) // 5:] * 0.01 + 1
+
+    for window, overlap in [(2, 1), (3, 2)]:
+        expected = np.zeros(len(values), dtype=bool)
+        num_samples = window * 60 * sample_freq
+        for start in range(0, len(values) - num_samples + 1, overlap * 60 * sample_freq):
+            subset = values[start:start + num_samples]
+            if (subset.std(axis=0) < .003).sum() >= 2 or (np.ptp(subset, axis=0) < .05).sum() >= 2:
+                expected[start:start + num_samples] = True
+
+        nw_vector = wear_time.detect_non_wear_time_hees2011(data.assign(X=values[:, 0], Y=values[:, 1], Z=values[:, 2]), sample_freq,
+                                                            min_non_wear_time_window=window, window_overlap=overlap)
+
+        assert expected.any() and not expected.all()
+        assert np.array_equal(nw_vector, expected)
+
 
 def test_detect_non_wear_time_naive(nwt_data):
     data, sample_freq = nwt_data
@@ -38,3 +67,73 @@ def test_detect_non_wear_time_naive(nwt_data):
 
     nw_vector = wear_time.detect_non_wear_time_naive(data, sample_freq,
                                                      std_threshold, min_interval)
+
+
+def test_find_candidate_non_wear_segments():
+    sample_freq = 10
+    rng = np.random.default_rng(0)
+
+    # moving data with two still periods, the second one reaching the end of the data, which is not a full minute
+    acc_data = rng.normal(0, .1, (125 * 60 * sample_freq + 123, 3)).astype(np.float32)
+    acc_data[10 * 60 * sample_freq + 5:40 * 60 * sample_freq] = 0
+    acc_data[100 * 60 * sample_freq:] = 1
+
+    for use_vmu in (False, True):
+        starts, stops = wear_time._find_candidate_non_wear_segments_from_raw(acc_data, .004, sample_freq, use_vmu=use_vmu)
+
+        # the still minutes are extended by whole minutes as long as the standard deviation stays below the threshold,
+        # which includes the few moving samples at the start of the 11th minute
+        assert starts.tolist() == [10 * 60 * sample_freq, 100 * 60 * sample_freq]
+        # as before, the forward search starts from the last sample of the still minutes, which leaves out the last sample
+        assert stops.tolist() == [40 * 60 * sample_freq - 1, len(acc_data) - 1]
+
+    starts, stops = wear_time._find_candidate_non_wear_segments_from_raw(acc_data, .004, sample_freq, min_segment_length=26)
+    assert starts.tolist() == [10 * 60 * sample_freq]
+
+    nw_vector = wear_time.detect_non_wear_time_naive(pd.DataFrame(acc_data, columns=["X", "Y", "Z"]), sample_freq, .004, 20)
+    assert np.flatnonzero(np.diff(nw_vector)).tolist() == [10 * 60 * sample_freq - 1, 40 * 60 * sample_freq - 3,
+                                                           100 * 60 * sample_freq - 1, len(acc_data) - 3]
+
+
+def test_edge_searches():
+    hz = 10
+    rng = np.random.default_rng(1)
+
+    # a still period with a slowly increasing noise level within moving data
+    acc_data = rng.normal(0, .1, (60 * 60 * hz, 3)).astype(np.float32)
+    acc_data[10 * 60 * hz + 3:50 * 60 * hz - 7] = rng.normal(0, np.linspace(0, .006, 40 * 60 * hz - 10)[:, None], (40 * 60 * hz - 10, 3)) + 1
+
+    def search_seconds(index, step):
+        while 0 <= index + min(step, 0) and index + max(step, 0) <= len(acc_data) \
+                and np.all(np.std(acc_data[min(index, index + step):max(index, index + step)], axis=0) <= .004):
+            index += step
+        return index
+
+    for index in (20 * 60 * hz, 20 * 60 * hz + 5, 10 * 60 * hz + 4):
+        assert wear_time._forward_search_episode(acc_data, index, hz, 60, .004) == search_seconds(index, hz)
+        assert wear_time._backward_search_episode(acc_data, index, hz, 60, .004) == search_seconds(index, -hz)
+
+    # the standard deviation of the whole growing range is checked
+    start, end = 15 * 60 * hz, 20 * 60 * hz
+    stop = end
+    while stop + 60 * hz <= len(acc_data) and np.all(np.std(acc_data[start:stop + 60 * hz].astype(np.float64), axis=0) <= .004):
+        stop += 60 * hz
+
+    assert stop > search_seconds(end, hz)
+    assert wear_time._forward_search_non_wear_time(acc_data, start, end, .004, hz) == stop
+    assert wear_time._backward_search_non_wear_time(acc_data, start, end, .004, hz) == 11 * 60 * hz
+
+
+def test_predict_windows(nwt_data):
+    data, sample_freq = nwt_data
+
+    cnn_model = inference.load_model('cnn_v2_7')
+    windows = [data[["X", "Y", "Z"]].values[first:first + 700] for first in range(0, len(data) - 700, 1000)]
+
+    # the labels do not depend on the size of the batches
+    labels = wear_time._predict_windows(cnn_model, windows)
+    assert labels.dtype == bool and labels.shape == (len(windows),)
+    assert np.array_equal(wear_time._predict_windows(cnn_model, windows, batch_size=4), labels)
+    assert np.array_equal([cnn_model(window[None])["output_0"].numpy().squeeze() >= .5 for window in windows], labels)
+
+    assert wear_time._predict_windows(cnn_model, []).shape == (0,)